@@ -0,0 +1,478 @@
+"""
+Microbenchmarks for the mobile broadband model kernels.
+
+Every kernel is timed at batch sizes from a single row up to 10^7 rows on
+synthetic inputs drawn from the ranges in mobile_inputs.parameters. Kernels
+working on arrays are called once per batch, while scalar kernels are called
+once per row. Results are saved and compared to a saved baseline to flag
+regressions.
+
+Written by Bonface Osoro & Ed Oughton.
+
+September 2024
+
+"""
+import configparser
+import json
+import os
+import platform
+import time
+import timeit
+import itertools
+import numpy as np
+import pandas as pd
+import geosafi_consav.mobile as mb
+from shapely.geometry import Polygon
+from mobile_inputs import lut, parameters
+
+CONFIG = configparser.ConfigParser()
+CONFIG.read(os.path.join(os.path.dirname(__file__), 'script_config.ini'))
+BASE_PATH = CONFIG['file_locations']['base_path']
+BENCHMARKS = os.path.join(BASE_PATH, '..', 'results', 'benchmarks')
+
+SIZES = [1, 100, 10 ** 4, 10 ** 6, 10 ** 7]
+MAX_SCALAR_SIZE = 10 ** 5
+MAX_INPUT_BYTES = 2e9
+REPEAT = 3
+TOLERANCE = 0.25
+MIN_SLOWDOWN_SECONDS = 1e-5
+
+mobile_params = parameters['4G']
+se_table = mb.SpectralEfficiencyTable(lut)
+
+
+def uniform(rng, n, key):
+    """
+    Draw n values between the low and high values of a parameter.
+    """
+
+    return rng.uniform(mobile_params['{}_low{}'.format(*key)],
+                       mobile_params['{}_high{}'.format(*key)], n)
+
+
+def frequencies(rng, n):
+    """
+    Draw n frequencies from the 4G and 5G frequency lists.
+    """
+    options = sorted(set(parameters['4G']['frequencies_mhz']
+                         + parameters['5G']['frequencies_mhz']))
+
+    return rng.choice(options, n).astype(float)
+
+
+def radio_inputs(rng, n):
+    """
+    Synthetic radio inputs of n rows.
+    """
+    return {
+        'frequency_mhz' : frequencies(rng, n),
+        'transmitter_height_m' : rng.integers(
+            mobile_params['transmitter_height_low_m'],
+            mobile_params['transmitter_height_high_m'] + 1, n).astype(float),
+        'user_antenna_height_m' : rng.integers(
+            mobile_params['user_antenna_height_low_m'],
+            mobile_params['user_antenna_height_high_m'] + 1, n).astype(float),
+        'distance_km' : uniform(rng, n, ('trans_user_dist', '_km')),
+        'sinr_db' : rng.uniform(-10, 30, n),
+    }
+
+
+def capacity_inputs(rng, n):
+    """
+    Synthetic UQ capacity rows, as produced by mobi_preprocess.
+    """
+    radio = radio_inputs(rng, n)
+    grid = mobile_params['grid_length']
+
+    return pd.DataFrame({
+        'transmitter_x' : rng.uniform(0, grid, n),
+        'transmitter_y' : rng.uniform(0, grid, n),
+        'receiver_x' : rng.uniform(0, grid + 5, n),
+        'receiver_y' : rng.uniform(0, grid + 5, n),
+        'interference_x' : rng.uniform(0, grid, n),
+        'interference_y' : rng.uniform(0, grid, n),
+        'iteration' : rng.integers(0, mobile_params['iterations'], n),
+        'mu' : mobile_params['mu'],
+        'sigma' : mobile_params['sigma'],
+        'seed_value' : mobile_params['seed_value'],
+        'draws' : mobile_params['draws'],
+        'frequency_MHz' : radio['frequency_mhz'],
+        'transmitter_height_m' : radio['transmitter_height_m'],
+        'user_antenna_height_m' : radio['user_antenna_height_m'],
+        'transmitter_power_dbm' : uniform(rng, n, ('transmitter_power',
+                                                   '_dbm')),
+        'trans_antenna_gain_dbi' : uniform(rng, n, ('trans_antenna_gain',
+                                                    '_dbi')),
+        'user_antenna_gain_dbi' : uniform(rng, n, ('user_antenna_gain',
+                                                   '_dbi')),
+        'user_antenna_loss_db' : uniform(rng, n, ('user_antenna_loss', '_db')),
+        'shadow_fading_db' : mobile_params['shadow_fading_db'],
+        'building_penetration_loss_db' : (
+            mobile_params['building_penetration_loss_db']),
+        'antenna_sectors' : mobile_params['antenna_sectors'],
+        'mean_monthly_demand_GB' : rng.choice(
+            mobile_params['mean_monthly_demand_GB'], n),
+        'traffic_busy_hour' : rng.uniform(5, 20, n),
+        'smartphone_penetration' : rng.uniform(20, 80, n),
+        'decile' : 'Decile 1',
+    })
+
+
+def manufacturing_inputs(rng, n):
+    """
+    Synthetic inputs of lca_manufacturing.
+    """
+    masses = [uniform(rng, n, (key, '_kg')) for key in ['bbu_rru_pcb',
+              'bbu_rru_aluminium', 'copper_antenna', 'aluminium_antenna',
+              'pvc_antenna', 'iron_antenna', 'steel_antenna', 'steel_tower',
+              'aluminium_frame', 'steel_pole', 'machine_concrete',
+              'machine_steel', 'basic_aluminium_device']]
+    factors = [mobile_params[key] for key in ['pcb_kg_co2e',
+               'aluminium_kg_co2e', 'copper_kg_co2e', 'pvc_kg_co2e',
+               'iron_kg_co2e', 'steel_kg_co2e', 'concrete_kg_co2e']]
+    devices = [uniform(rng, n, (key, '_kg')) for key in ['smartphone',
+               'ict_equipment', 'power_supply', 'lithium_battery']]
+
+    return masses + factors + devices + [rng.uniform(1e3, 1e5, n)]
+
+
+def eolt_inputs(rng, n):
+    """
+    Synthetic inputs of lca_eolt.
+    """
+    masses = [uniform(rng, n, (key, '_kg')) for key in ['bbu_rru_pcb',
+              'bbu_rru_aluminium', 'copper_antenna', 'aluminium_antenna',
+              'pvc_antenna', 'iron_antenna', 'steel_antenna', 'steel_tower',
+              'aluminium_frame', 'steel_pole', 'machine_steel',
+              'basic_aluminium_device']]
+
+    return masses + [mobile_params['metals_factor_kgco2'],
+                     mobile_params['plastics_factor_kgco2']]
+
+
+def operations_inputs(rng, n):
+    """
+    Synthetic inputs of lca_operations.
+    """
+    return [uniform(rng, n, ('smartphone', '_kwh')),
+            uniform(rng, n, ('ict', '_kwh')),
+            uniform(rng, n, ('base_band_unit', '_kwh')),
+            rng.uniform(1e3, 1e5, n),
+            uniform(rng, n, ('radio_frequency', '_kwh')),
+            uniform(rng, n, ('epc_center', '_kwh')),
+            rng.uniform(0.01, 1, n),
+            mobile_params['electricity_kg_co2e'],
+            rng.uniform(1, 1e4, n)]
+
+
+def cost_inputs(rng, n):
+    """
+    Synthetic inputs of total_cost_ownership.
+    """
+    capex = sum(uniform(rng, n, (key, '')) for key in ['sector_antenna',
+                'remote_radio_unit', 'tower', 'civil_materials',
+                'installation'])
+    opex = sum(uniform(rng, n, (key, '')) for key in ['site_rental',
+               'staff_costs', 'fiber_link'])
+
+    return [capex, opex, mobile_params['discount_rate'],
+            mobile_params['assessment_period']]
+
+
+def polygon_inputs(rng, n):
+    """
+    Synthetic hexagonal service areas.
+    """
+    angles = np.linspace(0, 2 * np.pi, 7)[:-1]
+    radius = rng.uniform(0.01, 0.5, n)
+    x = rng.uniform(-10, 10, n)
+    y = rng.uniform(-10, 10, n)
+
+    return [np.array([Polygon(zip(cx + r * np.cos(angles),
+                                  cy + r * np.sin(angles)))
+                      for cx, cy, r in zip(x, y, radius)], dtype = object)]
+
+
+def radio_args(*keys):
+    """
+    Build an input generator returning the given radio inputs.
+    """
+
+    return lambda rng, n: [radio_inputs(rng, n)[key] for key in keys]
+
+
+cases = [
+    {'name' : 'hk_rural_correction_model', 'mode' : 'scalar',
+     'func' : mb.hk_rural_correction_model,
+     'inputs' : radio_args('frequency_mhz')},
+    {'name' : 'hk_city_correction_model', 'mode' : 'array',
+     'func' : mb.hk_city_correction_model,
+     'inputs' : radio_args('frequency_mhz', 'user_antenna_height_m')},
+    {'name' : 'hata_terms', 'mode' : 'array', 'func' : mb.hata_terms,
+     'inputs' : radio_args('frequency_mhz', 'transmitter_height_m',
+                           'user_antenna_height_m')},
+    {'name' : 'hk_path_loss_model', 'mode' : 'scalar',
+     'func' : lambda f, h, u, d: mb.hk_path_loss_model(f, h, u, d, 0, [0]),
+     'inputs' : radio_args('frequency_mhz', 'transmitter_height_m',
+                           'user_antenna_height_m', 'distance_km')},
+    {'name' : 'hk_path_loss_model (cold)', 'mode' : 'scalar',
+     'func' : lambda f, h, u, d: mb.hk_path_loss_model(f, h, u, d, 0, [0]),
+     'setup' : mb.hata_scalar_terms.cache_clear,
+     'inputs' : radio_args('frequency_mhz', 'transmitter_height_m',
+                           'user_antenna_height_m', 'distance_km')},
+    {'name' : 'hk_path_loss_array', 'mode' : 'array',
+     'func' : lambda f, h, u, d: mb.hk_path_loss_array(f, h, u, d, 0),
+     'inputs' : radio_args('frequency_mhz', 'transmitter_height_m',
+                           'user_antenna_height_m', 'distance_km')},
+    {'name' : 'calc_noise', 'mode' : 'scalar',
+     'func' : lambda f: mb.calc_noise(f, 10),
+     'inputs' : radio_args('frequency_mhz')},
+    {'name' : 'calc_sinr', 'mode' : 'array', 'func' : mb.calc_sinr,
+     'inputs' : lambda rng, n: [rng.uniform(-120, -60, n), -100.0,
+                uniform(rng, n, ('user_antenna_gain', '_dbi')),
+                uniform(rng, n, ('user_antenna_loss', '_db')),
+                rng.uniform(-20, 20, n)]},
+    {'name' : 'get_spectral_efficiency', 'mode' : 'scalar',
+     'func' : lambda sinr: mb.get_spectral_efficiency(lut, '4G', sinr),
+     'inputs' : radio_args('sinr_db')},
+    {'name' : 'SpectralEfficiencyTable.lookup', 'mode' : 'array',
+     'func' : lambda sinr: se_table.lookup('4G', sinr),
+     'inputs' : radio_args('sinr_db')},
+    {'name' : 'total_cost_ownership', 'mode' : 'array',
+     'func' : mb.total_cost_ownership, 'inputs' : cost_inputs},
+    {'name' : 'lca_manufacturing', 'mode' : 'array',
+     'func' : mb.lca_manufacturing, 'inputs' : manufacturing_inputs},
+    {'name' : 'lca_transportation', 'mode' : 'array',
+     'func' : mb.lca_transportation,
+     'inputs' : lambda rng, n: [rng.uniform(10, 500, n),
+                uniform(rng, n, ('consumption', '_lt_per_km')),
+                mobile_params['diesel_factor_kgco2e'],
+                rng.uniform(8000, 15000, n),
+                mobile_params['container_ship_kgco2e']]},
+    {'name' : 'lca_construction', 'mode' : 'array',
+     'func' : mb.lca_construction,
+     'inputs' : lambda rng, n: [uniform(rng, n, ('machine_fuel_eff',
+                '_lt_per_hr')), uniform(rng, n, ('machine_operation', '_hrs')),
+                mobile_params['diesel_factor_kgco2e']]},
+    {'name' : 'lca_operations', 'mode' : 'array',
+     'func' : mb.lca_operations, 'inputs' : operations_inputs},
+    {'name' : 'lca_eolt', 'mode' : 'array', 'func' : mb.lca_eolt,
+     'inputs' : eolt_inputs},
+    {'name' : 'calc_maximum_distance', 'mode' : 'scalar',
+     'func' : mb.calc_maximum_distance, 'inputs' : polygon_inputs},
+    {'name' : 'capacity_batch', 'mode' : 'array',
+     'func' : lambda df: mb.capacity_batch(df, se_table),
+     'inputs' : lambda rng, n: [capacity_inputs(rng, n)]},
+]
+
+
+def estimated_bytes(case, n):
+    """
+    Estimate the memory needed by the synthetic inputs of a case.
+    """
+    args = case['inputs'](np.random.default_rng(0), 1)
+    columns = sum(len(arg.columns) if isinstance(arg, pd.DataFrame) else 1
+                  for arg in args)
+
+    return columns * n * 8
+
+
+def time_case(case, n, rng, repeat = REPEAT):
+    """
+    Time one kernel at one batch size.
+
+    Parameters
+    ----------
+    case : dict
+        Benchmark case. If it has a setup function, such as clearing a 
+        cache, the setup runs before every timed pass of the batch.
+    n : int
+        Batch size.
+    rng : numpy.random.Generator
+        Random generator for the synthetic inputs.
+    repeat : int
+        Number of timing repeats, of which the fastest is kept.
+
+    Returns
+    -------
+    seconds : float
+        Time taken to evaluate the whole batch.
+
+    """
+    args = case['inputs'](rng, n)
+    func = case['func']
+
+    if case['mode'] == 'scalar':
+
+        columns = [arg.tolist() if isinstance(arg, np.ndarray) else
+                   itertools.repeat(arg, n) for arg in args]
+        rows = list(zip(*columns))
+
+        def run():
+            for row in rows:
+                func(*row)
+
+    else:
+
+        def run():
+            func(*args)
+
+    if 'setup' in case:
+
+        # Caches are reset before every timed pass, so each pass starts cold
+        timer = timeit.Timer(run, setup = case['setup'])
+        seconds = min(timer.repeat(repeat, 1))
+
+    else:
+
+        timer = timeit.Timer(run)
+        number, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat, number)) / number
+
+
+    return seconds
+
+
+def run_benchmarks(sizes = SIZES, seed = 42):
+    """
+    Time every kernel at every batch size.
+
+    Parameters
+    ----------
+    sizes : list
+        Batch sizes.
+    seed : int
+        Seed of the synthetic inputs.
+
+    Returns
+    -------
+    results : dict
+        Seconds per batch for each kernel and batch size. Sizes that are
+        skipped are stored as None.
+
+    """
+    rng = np.random.default_rng(seed)
+    results = {}
+
+    for case in cases:
+
+        results[case['name']] = {}
+
+        for n in sizes:
+
+            if case['mode'] == 'scalar' and n > MAX_SCALAR_SIZE or \
+                estimated_bytes(case, n) > MAX_INPUT_BYTES:
+
+                results[case['name']][str(n)] = None
+                print('{:<32}{:>10}  skipped'.format(case['name'], n))
+
+                continue
+
+            seconds = time_case(case, n, rng)
+            results[case['name']][str(n)] = seconds
+            print('{:<32}{:>10}{:>14.3e} s{:>12.3e} s/row'.format(
+                case['name'], n, seconds, seconds / n))
+
+
+    return results
+
+
+def save_results(results, filename):
+    """
+    Save benchmark results with the environment they were measured in.
+    """
+    if not os.path.exists(BENCHMARKS):
+
+        os.makedirs(BENCHMARKS)
+
+    output = {
+        'created' : time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python' : platform.python_version(),
+        'numpy' : np.__version__,
+        'machine' : platform.machine(),
+        'results' : results
+    }
+
+    with open(os.path.join(BENCHMARKS, filename), 'w') as f:
+
+        json.dump(output, f, indent = 2)
+
+
+    return None
+
+
+def compare_to_baseline(results, filename = 'mobile_baseline.json',
+                        tolerance = TOLERANCE):
+    """
+    Flag kernels that got slower than the saved baseline.
+
+    Parameters
+    ----------
+    results : dict
+        Current benchmark results.
+    filename : string
+        Name of the baseline file.
+    tolerance : float
+        Allowed slowdown as a fraction of the baseline time.
+
+    Returns
+    -------
+    regressions : list
+        Kernel, batch size and slowdown ratio of each regression.
+
+    """
+    path = os.path.join(BENCHMARKS, filename)
+
+    if not os.path.exists(path):
+
+        print('Cannot locate {}'.format(filename))
+
+        return []
+
+    with open(path) as f:
+
+        baseline = json.load(f)['results']
+
+    regressions = []
+
+    for name, timings in results.items():
+
+        for size, seconds in timings.items():
+
+            reference = baseline.get(name, {}).get(size)
+
+            if seconds is None or reference is None:
+
+                continue
+
+            ratio = seconds / reference
+
+            # Differences of a few microseconds are timer noise
+            if ratio > 1 + tolerance and \
+                seconds - reference > MIN_SLOWDOWN_SECONDS:
+
+                regressions.append((name, int(size), ratio))
+                print('REGRESSION {} at {} rows: {:.2f}x slower'.format(
+                    name, size, ratio))
+
+    if not regressions:
+
+        print('No regressions against {}'.format(filename))
+
+
+    return regressions
+
+
+if __name__ == '__main__':
+
+    results = run_benchmarks()
+    save_results(results, 'mobile_benchmarks.json')
+
+    if not os.path.exists(os.path.join(BENCHMARKS, 'mobile_baseline.json')):
+
+        print('Saving results as the new baseline')
+        save_results(results, 'mobile_baseline.json')
+
+    else:
+
+        compare_to_baseline(results)
@@ -16,7 +16,9 @@ import geopandas as gpd
 from shapely import wkt
 from shapely.geometry import Point
 from mobile_inputs import parameters
-from geosafi_consav.mobile import generate_log_normal_dist_value
+from geosafi_consav import sampling
+from geosafi_consav.mobile import (generate_log_normal_dist_value, 
+                                   hex_site_layout)
 pd.options.mode.chained_assignment = None 
 
 CONFIG = configparser.ConfigParser()
@@ -137,6 +139,14 @@ def site_generation(iso3):
     path_out = os.path.join(folder_out, filename)
     combined_gdf.drop(columns = 'geometry').to_csv(path_out, index = False)
 
+    # Hexagonal layout of co-channel sites for the multi-interferer mode, in 
+    # the km frame of the UQ capacity rows with one site per grid length
+    grid_length = parameters['4G']['grid_length']
+    site_x, site_y = hex_site_layout(3 * grid_length, grid_length)
+    sites = pd.DataFrame({'site_x' : site_x, 'site_y' : site_y})
+    sites.to_csv(os.path.join(folder_out, 'interference_sites.csv'), 
+                 index = False)
+
     return my_dict
 
 
@@ -209,303 +219,129 @@ def model_data():
     return None
 
 
-def multigeneration_cell_capacity(i, mobile_params):
+def uq_data_paths(stage):
     """
-    This function generates random values within the given parameter ranges. 
-
-    Parameters
-    ----------
-    i : int.
-        number of iterations
-    mobile_params : dict
-        Dictionary containing mobile engineering details
-
-    Return
-    ------
-        output : list
-            List containing capacity outputs
-
+    Paths of the decile data merged into the UQ inputs of the capacity, cost 
+    or emission stage.
     """
-    output = []
-
-    for decile in deciles:
-
+    mobile_data = os.path.join(DATA_RESULTS, 'cellular', 'SSA_mobile_data.csv')
+    pop_path = os.path.join(DATA_SSA, 'SSA_decile_summary_stats.csv') 
+    site_path = os.path.join(DATA_SSA, 'SSA_number_of_sites.csv')
+    tower_path = os.path.join(DATA_raw, 'tower', 'GID_2_tower_locations.csv')
+    region_data = os.path.join(DATA_SSA, 'SSA_subregional_population_deciles.csv')
 
-        for demand in mobile_params['mean_monthly_demand_GB']:
+    paths = {
+        'capacity' : [mobile_data],
+        'cost' : [pop_path, site_path, tower_path, region_data],
+        'emission' : [pop_path, site_path]
+    }
 
 
-            transmitter_height_m = random.randint(
-                mobile_params['transmitter_height_low_m'], 
-                mobile_params['transmitter_height_high_m'])
-            
-            user_antenna_height_m = random.randint(
-                mobile_params['user_antenna_height_low_m'], 
-                mobile_params['user_antenna_height_high_m'])
-            
-            transmitter_power_dbm = random.randint(
-                mobile_params['transmitter_power_low_dbm'], 
-                mobile_params['transmitter_power_high_dbm'])
-            
-            trans_antenna_gain_dbi = random.randint(
-                mobile_params['trans_antenna_gain_low_dbi'], 
-                mobile_params['trans_antenna_gain_high_dbi'])
-            
-            user_antenna_gain_dbi = random.randint(
-                mobile_params['user_antenna_gain_low_dbi'], 
-                mobile_params['user_antenna_gain_high_dbi'])
-            
-            user_antenna_loss_db = random.randint(
-                mobile_params['user_antenna_loss_low_db'], 
-                mobile_params['user_antenna_loss_high_db'])
-            
-            for _ in range(50):
-                
-                transmitter_x = random.uniform(0, mobile_params['grid_length'])
-                transmitter_y = random.uniform(0, mobile_params['grid_length'])
-                receiver_x = random.uniform(0, (mobile_params['grid_length'] + 5))
-                receiver_y = random.uniform(0, (mobile_params['grid_length'] + 5))
-                interceptor_x = random.uniform(0, mobile_params['grid_length'])
-                interceptor_y = random.uniform(0, mobile_params['grid_length'])
-    
-            output.append({
-                'transmitter_x': transmitter_x, 
-                'transmitter_y': transmitter_y,
-                'receiver_x': receiver_x,
-                'receiver_y': receiver_y,
-                'interference_x': interceptor_x,
-                'interference_y': interceptor_y,
-                'iteration' : i,
-                'mu' : mobile_params['mu'],
-                'sigma' : mobile_params['sigma'],
-                'seed_value' : mobile_params['seed_value'],
-                'draws' : mobile_params['draws'],
-                'transmitter_height_m' : transmitter_height_m,
-                'user_antenna_height_m' : user_antenna_height_m,
-                'transmitter_power_dbm' : transmitter_power_dbm,
-                'trans_antenna_gain_dbi' : trans_antenna_gain_dbi,
-                'user_antenna_gain_dbi' : user_antenna_gain_dbi,
-                'user_antenna_loss_db' : user_antenna_loss_db,
-                'shadow_fading_db' : mobile_params['shadow_fading_db'],
-                'building_penetration_loss_db' : (
-                    mobile_params['building_penetration_loss_db']),
-                'antenna_sectors' : mobile_params['antenna_sectors'],
-                'system_temperature_k' : mobile_params['system_temperature_k'],
-                'mean_monthly_demand_GB' : demand,
-                'decile' : decile
-            })
+    return paths[stage]
 
 
-    return output
-
-
-def uq_inputs_capacity(parameters):
+def merge_capacity_data(df):
     """
-    Generate all UQ capacity inputs in preparation for running through the 
-    mobile broadband model. 
+    Merge sampled UQ capacity inputs with the decile mobile data, giving one 
+    row per sample and frequency.
 
     Parameters
     ----------
-    parameters : dict
-        dictionary of dictionary containing mobile engineering values.
-
-    """
-    iterations = []
-    
-    for key, mobile_params in parameters.items():
-
-        for i in range(0, mobile_params['iterations']):
-
-            if key in ['4G', '5G']:
-                
-                data = multigeneration_cell_capacity(i, mobile_params)
-
-            iterations = iterations + data
+    df : pandas.DataFrame
+        Sampled UQ capacity inputs.
 
-    df = pd.DataFrame.from_dict(iterations)
+    Returns
+    -------
+    df : pandas.DataFrame
+        Model ready UQ capacity inputs.
 
-    # Import user data
-    mob_path = os.path.join(DATA_RESULTS, 'cellular', 'SSA_mobile_data.csv') 
+    """
+    mob_path, = uq_data_paths('capacity')
     df1 = pd.read_csv(mob_path)
 
-    filename = 'uq_parameters_capacity.csv'
-    folder_out = os.path.join(DATA_RESULTS, 'cellular')
 
-    if not os.path.exists(folder_out):
+    return pd.merge(df, df1, on = 'decile')
 
-        os.makedirs(folder_out)
-    
-    merged_df = pd.merge(df, df1, on = 'decile')
-    path_out = os.path.join(folder_out, filename)
-    merged_df.to_csv(path_out, index = False)
 
-    return None
-
-
-def multigeneration_cell_costs(i, mobile_params):
+def merge_cost_data(df):
     """
-    This function generates random values within the given parameter ranges. 
+    Merge sampled UQ cost inputs with the decile summary statistics, the 
+    required sites of each cell generation and the existing towers.
 
     Parameters
     ----------
-    i : int.
-        number of iterations
-    mobile_params : dict
-        Dictionary containing mobile engineering details
+    df : pandas.DataFrame
+        Sampled UQ cost inputs.
 
-    Return
-    ------
-        output : list
-            List containing cost outputs
+    Returns
+    -------
+    df : pandas.DataFrame
+        Model ready UQ cost inputs.
 
     """
-    output = []
+    pop_path, site_path, tower_path, region_data = uq_data_paths('cost')
 
-    for decile in deciles:
+    df1 = pd.read_csv(pop_path)
+    df2 = pd.read_csv(site_path)
+    df3 = pd.read_csv(tower_path)
+    df4 = pd.read_csv(region_data)
 
-        for usd_mhz_pop in mobile_params['usd_per_mhz_pop']:
+    df2 = df2[['cell_generation', 'channel_bandwidth_mhz', 
+               'no_of_required_sites', 'decile']]
+    
+    df1 = pd.merge(df1, df2, on = 'decile')
 
-            for frequency in mobile_params['frequencies_mhz']:
+    df3 = pd.merge(df3, df4, on = 'GID_2', how = 'inner')
+    df3 = df3.groupby(['decile']).agg(existing_tower_no = 
+                    ('existing_tower_no', 'mean')).reset_index()
+    
+    df3['existing_tower_no'] = df3['existing_tower_no'].round().astype(int)
 
-                sector_antenna = random.randint(mobile_params['sector_antenna_low'], 
-                    mobile_params['sector_antenna_high'])
-                
-                remote_radio_unit = random.randint(mobile_params['remote_radio_unit_low'], 
-                    mobile_params['remote_radio_unit_high'])
-                
-                io_fronthaul = random.randint(mobile_params['io_fronthaul_low'], 
-                    mobile_params['io_fronthaul_high'])
-                
-                control_unit = random.randint(mobile_params['control_unit_low'], 
-                    mobile_params['control_unit_high'])
-                
-                cooling_fans = random.randint(mobile_params['cooling_fans_low'], 
-                    mobile_params['cooling_fans_high'])
-                
-                power_supply = random.randint(mobile_params['power_supply_low'], 
-                    mobile_params['power_supply_high'])
-                
-                battery_power = random.randint(mobile_params['battery_power_low'], 
-                    mobile_params['battery_power_high'])
-                
-                bbu_cabinet = random.randint(mobile_params['bbu_cabinet_low'], 
-                    mobile_params['bbu_cabinet_high'])
-                
-                tower = random.randint(mobile_params['tower_low'], 
-                    mobile_params['tower_high'])
-                
-                civil_materials = random.randint(mobile_params['civil_materials_low'], 
-                    mobile_params['civil_materials_high'])
-                
-                transportation = random.randint(mobile_params['transportation_low'], 
-                    mobile_params['transportation_high'])
-                
-                installation = random.randint(mobile_params['installation_low'], 
-                    mobile_params['installation_high'])
-                
-                site_rental = random.randint(mobile_params['site_rental_low'], 
-                    mobile_params['site_rental_high'])
-                
-                router = random.randint(mobile_params['router_low'], 
-                    mobile_params['router_high'])
-                
-                fiber_link = random.randint(mobile_params['fiber_link_low'], 
-                    mobile_params['fiber_link_high'])
-                
-                base_station_energy = random.randint(mobile_params['power_supply_low'], 
-                    mobile_params['power_supply_high'])
-                
-                staff_costs = random.randint(mobile_params['staff_costs_low'], 
-                    mobile_params['staff_costs_high'])
-            
-                output.append({
-                    'iteration' : i,
-                    'mu' : mobile_params['mu'],
-                    'sigma' : mobile_params['sigma'],
-                    'seed_value' : mobile_params['seed_value'],
-                    'draws' : mobile_params['draws'],
-                    'sector_antenna_usd' : sector_antenna,
-                    'remote_radio_unit_usd' : remote_radio_unit,
-                    'io_fronthaul_usd' : io_fronthaul,
-                    'control_unit_usd' : control_unit,
-                    'cooling_fans_usd' : cooling_fans,
-                    'power_supply_usd' : power_supply,
-                    'battery_power_usd' : battery_power,
-                    'bbu_cabinet_usd' : bbu_cabinet,
-                    'tower_usd' : tower,
-                    'civil_materials_usd' : civil_materials,
-                    'transportation_usd' : transportation,
-                    'installation_usd' : installation,
-                    'site_rental_usd' : site_rental,
-                    'base_station_energy_usd' : base_station_energy,
-                    'router_usd' : router,
-                    'fiber_link_usd' : fiber_link,
-                    'staff_costs_usd' : staff_costs,
-                    'mhz_per_pop_usd' : usd_mhz_pop,
-                    'assessment_years' : mobile_params['assessment_period'],
-                    'discount_rate' : mobile_params['discount_rate'],
-                    'decile' : decile
-                })
+    df = pd.merge(df, df1, on = 'decile')
+    df = pd.merge(df, df3, on = 'decile', how = 'inner')
 
 
-    return output
+    return df
 
 
-def uq_inputs_costs(parameters):
+def merge_emission_data(df):
     """
-    Generate all UQ cost inputs in preparation for running through the 
-    mobile broadband model. 
+    Merge sampled UQ emission inputs with the decile summary statistics and 
+    the required sites of each cell generation.
 
     Parameters
     ----------
-    parameters : dict
-        dictionary of dictionary containing mobile cost values.
+    df : pandas.DataFrame
+        Sampled UQ emission inputs.
 
-    """
-    iterations = []
-
-    for key, mobile_params in parameters.items():
-
-        for i in range(0, mobile_params['iterations']):
-
-            if key in ['4G', '5G']:
-                
-                data = multigeneration_cell_costs(i, mobile_params)
-
-            iterations = iterations + data
+    Returns
+    -------
+    df : pandas.DataFrame
+        Model ready UQ emission inputs.
 
-    df = pd.DataFrame.from_dict(iterations)
-
-    # Import user data
-    pop_path = os.path.join(DATA_SSA, 'SSA_decile_summary_stats.csv') 
-    site_path = os.path.join(DATA_SSA, 'SSA_number_of_sites.csv')
-    tower_path = os.path.join(DATA_raw, 'tower', 'GID_2_tower_locations.csv')
-    region_data = os.path.join(DATA_SSA, 'SSA_subregional_population_deciles.csv')
+    """
+    pop_path, site_path = uq_data_paths('emission')
 
     df1 = pd.read_csv(pop_path)
     df2 = pd.read_csv(site_path)
-    df3 = pd.read_csv(tower_path)
-    df4 = pd.read_csv(region_data)
 
-    df2 = df2[['cell_generation', 'channel_bandwidth_mhz', 
-               'no_of_required_sites', 'decile']]
-    
+    df2 = df2[['cell_generation', 'no_of_required_sites', 'decile']]
     df1 = pd.merge(df1, df2, on = 'decile')
 
-    df3 = pd.merge(df3, df4, on = 'GID_2', how = 'inner')
-    df3 = df3.groupby(['decile']).agg(existing_tower_no = 
-                    ('existing_tower_no', 'mean')).reset_index()
-    
-    df3['existing_tower_no'] = df3['existing_tower_no'].round().astype(int)
 
-    filename = 'uq_parameters_cost.csv'
+    return pd.merge(df, df1, on = 'decile')
+
+
+def write_uq_inputs(df, filename):
+    """
+    Write model ready UQ inputs to the cellular results folder.
+    """
     folder_out = os.path.join(DATA_RESULTS, 'cellular')
 
     if not os.path.exists(folder_out):
 
         os.makedirs(folder_out)
-    
-    df = pd.merge(df, df1, on = 'decile')
-    df = pd.merge(df, df3, on = 'decile', how = 'inner')
+
     path_out = os.path.join(folder_out, filename)
     df.to_csv(path_out, index = False)
 
@@ -513,224 +349,100 @@ def uq_inputs_costs(parameters):
     return None
 
 
-def multigeneration_cell_emissions(i, mobile_params):
+def uq_inputs_capacity(parameters, seed = None, design = 'random', 
+                       iterations = None):
     """
-    This function generates random values within the given emission ranges. 
+    Generate all UQ capacity inputs in preparation for running through the 
+    mobile broadband model. 
 
     Parameters
     ----------
-    i : int.
-        number of iterations
-    mobile_params : dict
-        Dictionary containing mobile engineering details
-
-    Return
-    ------
-        output : list
-            List containing capacity outputs
+    parameters : dict
+        dictionary of dictionary containing mobile engineering values.
+    seed : int
+        Seed of the random draws.
+    design : string
+        Experimental design of the draws, one of 'random', 'lhs' (Latin 
+        hypercube) or 'sobol' (scrambled Sobol sequence).
+    iterations : int
+        Number of iterations. Defaults to the iterations in parameters.
 
     """
-    output = []
-
-    for decile in deciles:
-
-        bbu_rru_pcb_kg = random.randint(mobile_params['bbu_rru_pcb_low_kg'], 
-            mobile_params['bbu_rru_pcb_high_kg'])
-        
-        bbu_rru_aluminium_kg = random.randint(
-            mobile_params['bbu_rru_aluminium_low_kg'], 
-            mobile_params['bbu_rru_aluminium_high_kg'])
-        
-        copper_antenna_kg = random.randint(
-            mobile_params['copper_antenna_low_kg'], 
-            mobile_params['copper_antenna_high_kg'])
-        
-        aluminium_antenna_kg = random.randint(
-            mobile_params['aluminium_antenna_low_kg'], 
-            mobile_params['aluminium_antenna_high_kg'])
-        
-        pvc_antenna_kg = random.randint(mobile_params['pvc_antenna_low_kg'], 
-                                        mobile_params['pvc_antenna_high_kg'])
-        
-        iron_antenna_kg = random.randint(mobile_params['iron_antenna_low_kg'], 
-                                            mobile_params['iron_antenna_high_kg'])
-        
-        steel_antenna_kg = random.randint(mobile_params['steel_antenna_low_kg'], 
-                                            mobile_params['steel_antenna_high_kg'])
-        
-        steel_tower_kg = random.randint(mobile_params['steel_tower_low_kg'], 
-                                        mobile_params['steel_tower_high_kg'])
-        
-        aluminium_frame_kg = random.randint(
-            mobile_params['aluminium_frame_low_kg'], 
-            mobile_params['aluminium_frame_high_kg'])
-        
-        steel_pole_kg = random.randint(mobile_params['steel_pole_low_kg'], 
-                                        mobile_params['steel_pole_high_kg'])
-        
-        machine_concrete_kg = random.randint(
-            mobile_params['machine_concrete_low_kg'], 
-            mobile_params['machine_concrete_high_kg'])
-        
-        machine_steel_kg = random.randint(mobile_params['machine_steel_low_kg'], 
-                                            mobile_params['machine_steel_high_kg'])
-        
-        basic_aluminium_device_kg = random.randint(
-            mobile_params['basic_aluminium_device_low_kg'], 
-            mobile_params['basic_aluminium_device_high_kg'])
-        
-        smartphone_kg = random.randint(
-            mobile_params['smartphone_low_kg'], 
-            mobile_params['smartphone_high_kg'])
+    rng = np.random.default_rng(seed)
 
-        ict_equipment_kg = random.uniform(
-            mobile_params['ict_equipment_low_kg'], 
-            mobile_params['ict_equipment_high_kg'])
-        
-        power_supply_kg = random.uniform(
-            mobile_params['power_supply_low_kg'], 
-            mobile_params['power_supply_high_kg'])
-        
-        lithium_battery_kg = random.uniform(
-            mobile_params['lithium_battery_low_kg'], 
-            mobile_params['lithium_battery_high_kg'])
+    df = pd.concat([sampling.uq_capacity_inputs(mobile_params, deciles, 
+                    iterations, rng, design) for key, mobile_params in 
+                    parameters.items() if key in ['4G', '5G']], 
+                   ignore_index = True)
 
-        consumption_lt_per_km = random.uniform(
-            mobile_params['consumption_low_lt_per_km'], 
-            mobile_params['consumption_high_lt_per_km'])
-        
-        machine_fuel_eff_lt_per_hr = random.randint(
-            mobile_params['machine_fuel_eff_low_lt_per_hr'], 
-            mobile_params['machine_fuel_eff_high_lt_per_hr'])
-        
-        machine_operation_hrs = random.randint(
-            mobile_params['machine_operation_low_hrs'], 
-            mobile_params['machine_operation_high_hrs'])
-
-        smartphone_kwh = random.uniform(mobile_params['smartphone_low_kwh'], 
-            mobile_params['smartphone_high_kwh'])
-        
-        ict_kwh = random.uniform(mobile_params['ict_low_kwh'], 
-            mobile_params['ict_high_kwh'])
-        
-        base_band_unit_kwh = random.uniform(mobile_params['base_band_unit_low_kwh'], 
-            mobile_params['base_band_unit_high_kwh'])
-        
-        radio_frequency_kwh = random.uniform(mobile_params['radio_frequency_low_kwh'], 
-            mobile_params['radio_frequency_high_kwh'])
-        
-        epc_center_kwh = random.uniform(mobile_params['epc_center_low_kwh'], 
-            mobile_params['epc_center_high_kwh'])
-        
-        cpe_kwh = random.uniform(mobile_params['cpe_low_kwh'], 
-            mobile_params['cpe_high_kwh'])
-        
-        base_station_power_kwh = random.uniform(
-            mobile_params['base_station_power_low_kwh'], 
-            mobile_params['base_station_power_high_kwh'])
-        
-        output.append({
-            'iteration' : i,
-            'bbu_rru_pcb_kg' : bbu_rru_pcb_kg,
-            'bbu_rru_aluminium_kg' : bbu_rru_aluminium_kg,
-            'copper_antenna_kg' : copper_antenna_kg,
-            'aluminium_antenna_kg' : aluminium_antenna_kg,
-            'pvc_antenna_kg' : pvc_antenna_kg,
-            'iron_antenna_kg' : iron_antenna_kg,
-            'steel_antenna_kg' : steel_antenna_kg,
-            'steel_tower_kg' : steel_tower_kg,
-            'aluminium_frame_kg' : aluminium_frame_kg,
-            'steel_pole_kg' : steel_pole_kg,
-            'machine_concrete_kg' : machine_concrete_kg,
-            'machine_steel_kg' : machine_steel_kg,
-            'basic_aluminium_device_kg' : basic_aluminium_device_kg,
-            'smartphone_kg' : smartphone_kg,
-            'ict_equipment_kg' : ict_equipment_kg,
-            'power_supply_kg' : power_supply_kg,
-            'lithium_battery_kg' : lithium_battery_kg,
-            'pcb_kg_co2e' : mobile_params['pcb_kg_co2e'],
-            'aluminium_kg_co2e' : mobile_params['aluminium_kg_co2e'],
-            'copper_kg_co2e' : mobile_params['copper_kg_co2e'],
-            'pvc_kg_co2e' : mobile_params['pvc_kg_co2e'],
-            'iron_kg_co2e' : mobile_params['iron_kg_co2e'],
-            'steel_kg_co2e' : mobile_params['steel_kg_co2e'],
-            'concrete_kg_co2e' : mobile_params['concrete_kg_co2e'],
-            'olnu_kg_co2e' : mobile_params['olnu_kg_co2e'],
-            'electricity_kg_co2e' : mobile_params['electricity_kg_co2e'],
-            'plastics_factor_kgco2e' : mobile_params['plastics_factor_kgco2'],
-            'metals_factor_kgco2e' : mobile_params['metals_factor_kgco2'],
-            'diesel_factor_kgco2e' : mobile_params['diesel_factor_kgco2e'],
-            'container_ship_kgco2e' : mobile_params['container_ship_kgco2e'],
-            'consumption_lt_per_km' : consumption_lt_per_km,
-            'machine_fuel_eff_lt_per_hr' : machine_fuel_eff_lt_per_hr,
-            'machine_operation_hrs' : machine_operation_hrs,
-            'cpe_kwh' : cpe_kwh,
-            'smartphone_kwh' : smartphone_kwh,
-            'ict_kwh' : ict_kwh,
-            'base_band_unit_kwh' : base_band_unit_kwh,
-            'base_station_power_kwh' : base_station_power_kwh,
-            'radio_frequency_kwh' : radio_frequency_kwh,
-            'epc_center_kwh' : epc_center_kwh,
-            'assessment_period' : mobile_params['assessment_period'],
-            'social_carbon_cost_usd' : mobile_params['social_carbon_cost_usd'],
-            'decile' : decile,
-        })
+    write_uq_inputs(merge_capacity_data(df), 'uq_parameters_capacity.csv')
 
 
-    return output
+    return None
 
 
-def uq_inputs_emissions(parameters):
+def uq_inputs_costs(parameters, seed = None, design = 'random', 
+                    iterations = None):
     """
-    Generate all UQ emission inputs in preparation for running through the 
+    Generate all UQ cost inputs in preparation for running through the 
     mobile broadband model. 
 
     Parameters
     ----------
     parameters : dict
         dictionary of dictionary containing mobile cost values.
+    seed : int
+        Seed of the random draws.
+    design : string
+        Experimental design of the draws, one of 'random', 'lhs' (Latin 
+        hypercube) or 'sobol' (scrambled Sobol sequence).
+    iterations : int
+        Number of iterations. Defaults to the iterations in parameters.
 
     """
-    iterations = []
-
-    for key, mobile_params in parameters.items():
-
-        for i in range(0, mobile_params['iterations']):
+    rng = np.random.default_rng(seed)
 
-            if key in ['4G', '5G']:
-                
-                data = multigeneration_cell_emissions(i, mobile_params)
-
-            iterations = iterations + data
-
-    df = pd.DataFrame.from_dict(iterations)
+    df = pd.concat([sampling.uq_cost_inputs(mobile_params, deciles, 
+                    iterations, rng, design) for key, mobile_params in 
+                    parameters.items() if key in ['4G', '5G']], 
+                   ignore_index = True)
 
-    # Import user data
-    pop_path = os.path.join(DATA_SSA, 'SSA_decile_summary_stats.csv') 
-    df1 = pd.read_csv(pop_path)
-    site_path = os.path.join(DATA_SSA, 'SSA_number_of_sites.csv')
+    write_uq_inputs(merge_cost_data(df), 'uq_parameters_cost.csv')
 
 
-    df1 = pd.read_csv(pop_path)
-    df2 = pd.read_csv(site_path)
+    return None
 
 
-    df2 = df2[['cell_generation', 'no_of_required_sites', 'decile']]
-    df1 = pd.merge(df1, df2, on = 'decile')
+def uq_inputs_emissions(parameters, seed = None, design = 'random', 
+                        iterations = None):
+    """
+    Generate all UQ emission inputs in preparation for running through the 
+    mobile broadband model. 
 
-    filename = 'uq_parameters_emission.csv'
-    folder_out = os.path.join(DATA_RESULTS, 'cellular')
+    Parameters
+    ----------
+    parameters : dict
+        dictionary of dictionary containing mobile cost values.
+    seed : int
+        Seed of the random draws.
+    design : string
+        Experimental design of the draws, one of 'random', 'lhs' (Latin 
+        hypercube) or 'sobol' (scrambled Sobol sequence).
+    iterations : int
+        Number of iterations. Defaults to the iterations in parameters.
 
-    if not os.path.exists(folder_out):
+    """
+    rng = np.random.default_rng(seed)
 
-        os.makedirs(folder_out)
+    df = pd.concat([sampling.uq_emission_inputs(mobile_params, deciles, 
+                    iterations, rng, design) for key, mobile_params in 
+                    parameters.items() if key in ['4G', '5G']], 
+                   ignore_index = True)
 
-    merged_df = pd.merge(df, df1, on = 'decile')
-    path_out = os.path.join(folder_out, filename)
-    merged_df.to_csv(path_out, index = False)
+    write_uq_inputs(merge_emission_data(df), 'uq_parameters_emission.csv')
 
 
-    return
+    return None
 
 
 def select_frequency(row):
@@ -897,12 +609,12 @@ if __name__ == '__main__':
     #model_data()
 
     #print('Running uq_capacity_inputs_generator()')
-    #uq_inputs_capacity(parameters)
+    #uq_inputs_capacity(parameters, seed = 10)
 
     #print('Running uq_cost_inputs_generator()')
-    #uq_inputs_costs(parameters)
+    #uq_inputs_costs(parameters, seed = 10)
 
     #print('Running uq_inputs_emissions_generator()')
-    #uq_inputs_emissions(parameters)
+    #uq_inputs_emissions(parameters, seed = 10)
 
     test_site_uq_capacity('KEN', parameters)
\ No newline at end of file
@@ -24,38 +24,35 @@ DATA_RESULTS = os.path.join(BASE_PATH, '..', 'results', 'final')
 DATA_SSA = os.path.join(BASE_PATH, '..', 'results', 'SSA')
 DATA_RAW = os.path.join(BASE_PATH, '..', 'data', 'raw', 'tower')
 VALID = os.path.join(BASE_PATH, '..', 'validation')
+RESULTS_FORMAT = CONFIG.get('processing', 'results_format', fallback = 'csv')
 
 
-def network_dimension():
+def decile_statistics(poor_unconnected, regions):
     """
-    This function is for calculating the number of required sites for each 
-    decile
-    """
-    cap_data = os.path.join(CELL_RESULTS, 'mobile_capacity_results.csv')
-    df = pd.read_csv(cap_data)
-    df = df[['cell_generation', 'frequency_mhz', 'channel_bandwidth_mhz', 
-             'intersite_distance_km', 'spectral_efficiency_bpshz', 
-             'capacity_mbps', 'site_area_sqkm', 'capacity_mbps_km2',
-             'mean_monthly_demand_GB', 'traffic_busy_hour', 
-             'smartphone_penetration', 'decile']]
+    This function calculates the total and mean poor unconnected population 
+    and area of each decile.
 
-    decile_data = os.path.join(DATA_SSA, 'SSA_poor_unconnected.csv')
-    region_data = os.path.join(DATA_SSA, 
-                'SSA_subregional_population_deciles.csv')
+    Parameters
+    ----------
+    poor_unconnected : pandas.DataFrame
+        Poor unconnected population of each region.
+    regions : pandas.DataFrame
+        Decile and area of each sub-region.
 
-    df1 = pd.read_csv(decile_data)
-    df2 = pd.read_csv(region_data)
+    Returns
+    -------
+    df : pandas.DataFrame
+        Population and area statistics of each decile.
 
-    df1 = df1.rename(columns = {'GID_1': 'GID_2'})
+    """
+    df1 = poor_unconnected.rename(columns = {'GID_1': 'GID_2'})
     df1 = df1[['GID_2', 'technology', 'poor_unconnected', 'poverty_range']]
 
-    df1 = df1[df1['technology'] == '3G']
-    df1 = df1[df1['poverty_range'] == 'GSAP2_poor']
-
-    df2 = df2[['GID_2', 'decile', 'area']]
-    df1 = pd.merge(df1, df2, on = 'GID_2', how = 'inner')
+    df1 = df1[(df1['technology'] == '3G') & 
+              (df1['poverty_range'] == 'GSAP2_poor')]
 
-    df1 = df1[['decile', 'poor_unconnected', 'area']]
+    df1 = pd.merge(df1, regions[['GID_2', 'decile', 'area']], on = 'GID_2', 
+                   how = 'inner')
 
     df1 = df1.groupby(['decile']).agg(total_decile_population = 
                      ('poor_unconnected', 'sum'),
@@ -63,41 +60,30 @@ def network_dimension():
                      total_decile_area = ('area', 'sum'),
                      mean_decile_area = ('area', 'mean')).reset_index()
 
-    df1['total_decile_population'] = df1['total_decile_population'].astype(int)
-    df1['mean_decile_population'] = df1['mean_decile_population'].astype(int)
-    df1['total_decile_area'] = df1['total_decile_area'].astype(int)
-    df1['mean_decile_area'] = df1['mean_decile_area'].astype(int)
+    columns = ['total_decile_population', 'mean_decile_population', 
+               'total_decile_area', 'mean_decile_area']
+    df1[columns] = df1[columns].astype(int)
+
+
+    return df1
+
+
+def network_dimension():
+    """
+    This function is for calculating the number of required sites for each 
+    decile
+    """
+    decile_data = os.path.join(DATA_SSA, 'SSA_poor_unconnected.csv')
+    region_data = os.path.join(DATA_SSA, 
+                'SSA_subregional_population_deciles.csv')
+
+    df = read_results('capacity', mb.DIMENSION_COLUMNS)
+    df1 = decile_statistics(pd.read_csv(decile_data), 
+                            pd.read_csv(region_data))
+
+    df = mb.network_demand(df, df1)
+    dff = mb.required_sites(df)
 
-    df = pd.merge(df, df1, on = 'decile', how = 'inner')
-    
-    df['average_user_demand_mbps'] = mb.user_demand(df['mean_monthly_demand_GB'], 
-                    df['traffic_busy_hour'], df['smartphone_penetration'], 
-                    df['mean_decile_population'], df['mean_decile_area'])
-    df['required_mbps'] = df['average_user_demand_mbps'] * df['mean_decile_population']
-    df['no_of_required_sites'] = (df['required_mbps']) / df['capacity_mbps_km2']
-    df['average_user_capacity_mbps'] = (df['required_mbps'] 
-                            / df['mean_decile_population'])
-
-    df = df[df['mean_monthly_demand_GB'] == 30]
-
-    dff = df.groupby(['decile', 'cell_generation', 'channel_bandwidth_mhz']
-                     ).agg(no_of_required_sites = ('no_of_required_sites', 
-                     'sum')).reset_index()
-    
-    for index, row in dff.iterrows():
-
-        if row['cell_generation'] == '5G':
-       
-            corresponding_row = dff[(dff['decile'] == row['decile']) & (
-                dff['cell_generation'] == '4G')]
-        
-            if not corresponding_row.empty:
-                
-                dff.at[index, 'no_of_required_sites'] = corresponding_row[
-                    'no_of_required_sites'].values[0] * 1.5
-                
-    
-    dff['no_of_required_sites'] = dff['no_of_required_sites'].round().astype(int)
     filename = 'SSA_mobile_capacity_results.csv'
     filename_1 = 'SSA_number_of_sites.csv'
     if not os.path.exists(DATA_SSA):
@@ -193,156 +179,298 @@ def process_africa_results():
     return None
 
 
-def decile_emissions_per_user():
+LCA_PHASES = {
+    'per_user_mfg_ghg_kg' : 'total_mfg_ghg', 
+    'per_user_trans_ghg_kg' : 'total_trans_ghg_kg', 
+    'per_user_construct_ghg_kg' : 'total_construction_ghg_kg', 
+    'per_user_ops_ghg_kg' : 'total_operations_ghg_kg', 
+    'per_user_eolt_ghg_kg' : 'total_eolt_ghg_kg'
+}
+
+PER_USER_INPUTS = {
+    'capacity' : ['cell_generation', 'frequency_mhz', 'intersite_distance_km', 
+                  'spectral_efficiency_bpshz', 'channel_bandwidth_mhz', 
+                  'decile'],
+    'cost' : ['cell_generation', 'decile', 'total_base_station_tco_usd', 
+              'total_decile_tco_usd', 'number_of_sites', 'mean_area_sqkm', 
+              'mean_poor_connected', 'total_poor_unconnected', 
+              'assessment_years', 'existing_tower_no', 'adoption_rate', 
+              'arpu_usd', 'monthly_income_usd'],
+    'emission' : ['cell_generation', 'decile', 'assessment_period', 
+                  'total_poor_unconnected', 'total_emissions_ghg_kg', 
+                  'social_carbon_cost_usd'] + list(LCA_PHASES.values())
+}
+
+PER_USER_OUTPUTS = {
+    'capacity' : 'radio_simulation_results',
+    'cost' : 'SSA_decile_costs',
+    'emission' : 'SSA_decile_emissions'
+}
+
+
+def per_user_path(stage, folder = None):
     """
-    This function calculates the per user metrics for each decile.
+    Path of the per user output of a stage in the configured results format.
     """
-    print('Generating per user metrics')
+    folder = folder or DATA_SSA
 
-    pop_data = os.path.join(CELL_RESULTS, 'mobile_emission_results.csv')
-    df = pd.read_csv(pop_data)
-    
-    ################### Per user emissions #####################
-    df['per_user_mfg_ghg_kg'] = (df['total_mfg_ghg'] / 
-                                 df['total_poor_unconnected'])
-    
-    df['per_user_trans_ghg_kg'] = (df['total_trans_ghg_kg'] / 
-                                 df['total_poor_unconnected'])
-    
-    df['per_user_construct_ghg_kg'] = (df['total_construction_ghg_kg'] / 
-                                 df['total_poor_unconnected'])
-    
-    df['per_user_ops_ghg_kg'] = (df['total_operations_ghg_kg'] / 
-                                 df['total_poor_unconnected'])
 
-    df['per_user_eolt_ghg_kg'] = (df['total_eolt_ghg_kg'] / 
-                                 df['total_poor_unconnected'])
-    
-    df['per_user_ghg_kg'] = (df['total_emissions_ghg_kg'] / 
-                                 df['total_poor_unconnected'])
-    
-    df['scc_cost_usd'] = (df['total_emissions_ghg_kg'] / 1e3 
-                          * df['social_carbon_cost_usd'])
-    
-    df['per_user_scc_cost_usd'] = (df['scc_cost_usd'] 
-                                   / df['total_poor_unconnected'])
-    
-    df['annualized_per_user_scc_cost_usd'] = (df['per_user_scc_cost_usd'] 
-                                              / df['assessment_period'])
-    
-    df['annualized_per_user_scc_cost_usd'] = (
-        df['annualized_per_user_scc_cost_usd'] / 5)
-    
-    df = pd.melt(df, id_vars = ['cell_generation', 'decile', 'scc_cost_usd',
-         'per_user_scc_cost_usd', 'annualized_per_user_scc_cost_usd', 
-         'assessment_period', 'per_user_ghg_kg', 'total_emissions_ghg_kg'], 
-         value_vars = ['per_user_mfg_ghg_kg', 'per_user_trans_ghg_kg', 
-          'per_user_construct_ghg_kg', 'per_user_ops_ghg_kg', 
-          'per_user_eolt_ghg_kg'], var_name = 'lca_phase', value_name = 
-          'phase_per_user_kg')
-    
-    df['annualized_per_user_ghg'] = (df['per_user_ghg_kg'] / 
-                                     df['assessment_period'])
-    
-    df['annualized_per_user_ghg'] = df['annualized_per_user_ghg'] / 5
-    
-    df['annualized_phase_per_user_kg'] = (df['phase_per_user_kg'] 
-                                          / df['assessment_period'])
+    return os.path.join(folder, '{}.{}'.format(PER_USER_OUTPUTS[stage], 
+                                               RESULTS_FORMAT))
 
-    df = df[['cell_generation', 'decile', 'assessment_period', 
-             'lca_phase', 'phase_per_user_kg', 'annualized_phase_per_user_kg', 
-             'per_user_ghg_kg', 'annualized_per_user_ghg', 'scc_cost_usd',
-             'total_emissions_ghg_kg', 'per_user_scc_cost_usd',
-             'annualized_per_user_scc_cost_usd']]
 
-    df['technology'] = 'cellular'
-    filename = 'SSA_decile_emissions.csv'
-    folder_out = os.path.join(DATA_SSA)
+def read_results(stage, columns, folder = None, file_format = None):
+    """
+    This function reads columns of the capacity, cost or emission results in 
+    the configured results format.
+
+    Parameters
+    ----------
+    stage : string
+        One of 'capacity', 'cost' or 'emission'.
+    columns : list
+        Columns to be read.
+    folder : string
+        Folder of the model results. Defaults to the cellular results.
+    file_format : string
+        Either 'csv' or 'parquet'. Defaults to the configured format.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        Model results.
 
-    if not os.path.exists(folder_out):
+    """
+    folder = folder or CELL_RESULTS
+    file_format = file_format or RESULTS_FORMAT
+    path = os.path.join(folder, 'mobile_{}_results.{}'.format(stage, 
+                                                             file_format))
 
-        os.makedirs(folder_out)
-    
-    path_out = os.path.join(folder_out, filename)
-    df.to_csv(path_out, index = False)
+    if file_format == 'parquet':
 
-    return None
+        return pd.read_parquet(path, columns = columns)
 
 
-def decile_cost_per_user():
+    return pd.read_csv(path, usecols = columns)
+
+
+def read_model_results(stage, folder = None, file_format = None):
     """
-    This function calculates the per user metrics for each decile.
+    This function reads the columns of the capacity, cost or emission results 
+    needed for the per user metrics, with the decile and cell generation 
+    stored as categorical codes.
+
+    Parameters
+    ----------
+    stage : string
+        One of 'capacity', 'cost' or 'emission'.
+    folder : string
+        Folder of the model results. Defaults to the cellular results.
+    file_format : string
+        Either 'csv' or 'parquet'. Defaults to the configured format.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        Model results.
+
     """
-    print('Generating per user metrics')
+    columns = PER_USER_INPUTS[stage]
+    df = read_results(stage, columns, folder, file_format)
+    df[['decile', 'cell_generation']] = df[['decile', 'cell_generation']
+                                           ].astype('category')
 
-    pop_data = os.path.join(CELL_RESULTS, 'mobile_cost_results.csv')
-    df = pd.read_csv(pop_data)
-    
-    ################### Per user costs #####################
-    df['per_user_tco_usd'] = (df['total_decile_tco_usd'] / 
-                                 (df['mean_poor_connected']))
-    
-    df['annualized_per_user_cost_usd'] = ((df['per_user_tco_usd']) 
-                                          / (df['assessment_years']))
-    
-    df['annualized_per_user_cost_usd'] = (df['annualized_per_user_cost_usd'] 
-                                          / 5)
-    
-    df['monthly_per_user_cost_usd'] = (df['annualized_per_user_cost_usd'] / 12)
 
-    df['monthly_price'] = (df['monthly_per_user_cost_usd']) 
-    
-    df['percent_gni'] = df['monthly_price'] / df['monthly_income_usd'] * 100
-    
-    df = df[['cell_generation', 'decile', 'total_base_station_tco_usd', 
-             'total_decile_tco_usd','number_of_sites', 'per_user_tco_usd', 
-             'mean_area_sqkm', 'mean_poor_connected','total_poor_unconnected',
-             'annualized_per_user_cost_usd', 'monthly_per_user_cost_usd', 
-             'existing_tower_no', 'adoption_rate', 'arpu_usd', 'monthly_price',
-             'monthly_income_usd', 'percent_gni']]
-
-    df['technology'] = 'cellular'
-    filename = 'SSA_decile_costs.csv'
-    folder_out = os.path.join(DATA_SSA)
+    return df[columns]
+
+
+def tile_column(values, count):
+    """
+    This function repeats a column count times, keeping categorical columns 
+    as codes.
+    """
+    if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+
+        return pd.Categorical.from_codes(np.tile(values.cat.codes.values, 
+                                         count), dtype = values.dtype)
+
+
+    return np.tile(np.asarray(values), count)
+
+
+def per_user_capacity(df):
+    """
+    This function calculates the per user capacity of the capacity results.
+    """
+    output = df[['cell_generation', 'frequency_mhz', 'intersite_distance_km']
+                ].copy()
+    output['per_user_capacity_mbps'] = (df['spectral_efficiency_bpshz'].values 
+                                        * df['channel_bandwidth_mhz'].values)
+    output['decile'] = df['decile']
+    output['technology'] = 'cellular'
+
+
+    return output
+
+
+def per_user_costs(df):
+    """
+    This function calculates the per user, annualized and monthly costs and 
+    the share of the monthly income of the cost results.
+    """
+    per_user_tco_usd = (df['total_decile_tco_usd'].values / 
+                        df['mean_poor_connected'].values)
+    annualized = per_user_tco_usd / df['assessment_years'].values / 5
+    monthly = annualized / 12
+
+    return pd.DataFrame({
+        'cell_generation' : df['cell_generation'],
+        'decile' : df['decile'],
+        'total_base_station_tco_usd' : df['total_base_station_tco_usd'],
+        'total_decile_tco_usd' : df['total_decile_tco_usd'],
+        'number_of_sites' : df['number_of_sites'],
+        'per_user_tco_usd' : per_user_tco_usd,
+        'mean_area_sqkm' : df['mean_area_sqkm'],
+        'mean_poor_connected' : df['mean_poor_connected'],
+        'total_poor_unconnected' : df['total_poor_unconnected'],
+        'annualized_per_user_cost_usd' : annualized,
+        'monthly_per_user_cost_usd' : monthly,
+        'existing_tower_no' : df['existing_tower_no'],
+        'adoption_rate' : df['adoption_rate'],
+        'arpu_usd' : df['arpu_usd'],
+        'monthly_price' : monthly,
+        'monthly_income_usd' : df['monthly_income_usd'],
+        'percent_gni' : monthly / df['monthly_income_usd'].values * 100,
+        'technology' : 'cellular'
+    })
+
+
+def per_user_emissions(df):
+    """
+    This function calculates the per user and annualized emissions of each 
+    life cycle phase and the social cost of carbon of the emission results, 
+    with one row per result and phase.
+    """
+    users = df['total_poor_unconnected'].values
+    period = df['assessment_period'].values
+    total = df['total_emissions_ghg_kg'].values
+
+    per_user_ghg_kg = total / users
+    scc_cost_usd = total / 1e3 * df['social_carbon_cost_usd'].values
+    per_user_scc_cost_usd = scc_cost_usd / users
+    phases = np.concatenate([df[column].values / users for column in 
+                             LCA_PHASES.values()])
+
+    count = len(LCA_PHASES)
+    tile = lambda values: tile_column(values, count)
+    lca_phase = pd.Categorical.from_codes(np.repeat(np.arange(count), 
+                len(df)), list(LCA_PHASES))
+
+    return pd.DataFrame({
+        'cell_generation' : tile(df['cell_generation']),
+        'decile' : tile(df['decile']),
+        'assessment_period' : tile(period),
+        'lca_phase' : lca_phase,
+        'phase_per_user_kg' : phases,
+        'annualized_phase_per_user_kg' : phases / tile(period),
+        'per_user_ghg_kg' : tile(per_user_ghg_kg),
+        'annualized_per_user_ghg' : tile(per_user_ghg_kg / period / 5),
+        'scc_cost_usd' : tile(scc_cost_usd),
+        'total_emissions_ghg_kg' : tile(total),
+        'per_user_scc_cost_usd' : tile(per_user_scc_cost_usd),
+        'annualized_per_user_scc_cost_usd' : tile(per_user_scc_cost_usd 
+                                                  / period / 5),
+        'technology' : 'cellular'
+    })
+
+
+PER_USER_METRICS = {
+    'capacity' : per_user_capacity,
+    'cost' : per_user_costs,
+    'emission' : per_user_emissions
+}
+
+
+def decile_per_user_metrics(results = None, stages = None, folder_out = None):
+    """
+    This function calculates the per user metrics of the capacity, cost and 
+    emission results in one pass and writes every SSA decile output in the 
+    configured results format.
+
+    Parameters
+    ----------
+    results : dict
+        In-memory results of each stage. Stages missing from results are read 
+        from the cellular results folder.
+    stages : list
+        Stages to be processed. Defaults to the stages in results, or to all 
+        stages if results is not given.
+    folder_out : string
+        Folder of the outputs. Defaults to the SSA results.
+
+    Returns
+    -------
+    metrics : dict
+        Per user metrics of each stage.
+
+    """
+    print('Generating per user metrics')
+
+    results = results or {}
+    stages = stages or list(results) or list(PER_USER_METRICS)
+    folder_out = folder_out or DATA_SSA
 
     if not os.path.exists(folder_out):
 
         os.makedirs(folder_out)
-    
-    path_out = os.path.join(folder_out, filename)
-    df.to_csv(path_out, index = False)
+
+    metrics = {}
+
+    for stage in stages:
+
+        df = results.get(stage)
+        df = read_model_results(stage) if df is None else df
+        metrics[stage] = PER_USER_METRICS[stage](df)
+
+        path_out = per_user_path(stage, folder_out)
+
+        if RESULTS_FORMAT == 'parquet':
+
+            metrics[stage].to_parquet(path_out, index = False)
+
+        else:
+
+            metrics[stage].to_csv(path_out, index = False)
+
+
+    return metrics
+
+
+def decile_emissions_per_user():
+    """
+    This function calculates the per user metrics for each decile.
+    """
+    decile_per_user_metrics(stages = ['emission'])
 
 
     return None
 
 
-def decile_capacity_per_user():
+def decile_cost_per_user():
     """
     This function calculates the per user metrics for each decile.
     """
-    print('Generating per user metrics')
+    decile_per_user_metrics(stages = ['cost'])
 
-    pop_data = os.path.join(CELL_RESULTS, 'mobile_capacity_results.csv')
-    df = pd.read_csv(pop_data)
-    
-    ################### Per user capacity #####################
-    
-    df['per_user_capacity_mbps'] = (df['spectral_efficiency_bpshz'] * 
-                                 df['channel_bandwidth_mhz'])
-    
-    df = df[['cell_generation', 'frequency_mhz', 'intersite_distance_km',
-             'per_user_capacity_mbps', 'decile']]
 
-    df['technology'] = 'cellular'
-    filename = 'radio_simulation_results.csv'
-    folder_out = os.path.join(DATA_SSA)
+    return None
 
-    if not os.path.exists(folder_out):
 
-        os.makedirs(folder_out)
-    
-    path_out = os.path.join(folder_out, filename)
-    df.to_csv(path_out, index = False)
+def decile_capacity_per_user():
+    """
+    This function calculates the per user metrics for each decile.
+    """
+    decile_per_user_metrics(stages = ['capacity'])
 
 
     return None
@@ -354,8 +482,4 @@ if __name__ == '__main__':
 
     #process_africa_results()
     
-    #decile_capacity_per_user()
-
-    decile_cost_per_user()
-
-    decile_emissions_per_user()
\ No newline at end of file
+    decile_per_user_metrics(stages = ['cost', 'emission'])
\ No newline at end of file
@@ -3,13 +3,14 @@ import os
 import warnings
 import pandas as pd
 from geosafi_consav.preprocessing import ProcessCountry, ProcessRegions, ProcessPopulation
+from geosafi_consav.preprocessing import build_population_store
 from geosafi_consav.preprocessing import PovertyProcess
 from geosafi_consav.preprocessing import CoverageProcess
 from geosafi_consav.generator import PointsGenerator, EdgeGenerator
 from geosafi_consav.intersections import IntersectLayers 
 from geosafi_consav.quantifications import (generate_unconnected_csv, 
-    generate_poverty_csv, coverage_poverty_csv, csv_merger, sum_population,
-    pop_csv_merger)
+    generate_unconnected_raster_csv, generate_poverty_csv, 
+    coverage_poverty_csv, csv_merger, sum_population, pop_csv_merger)
 
 pd.options.mode.chained_assignment = None
 warnings.filterwarnings('ignore')
@@ -24,12 +25,17 @@ DATA_RESULTS = os.path.join(BASE_PATH, '..', 'results', 'final')
 
 path = os.path.join(DATA_RAW, 'countries.csv')
 pop_tif_loc = os.path.join(DATA_RAW, 'WorldPop', 'ppp_2020_1km_Aggregated.tif')
+pop_store = os.path.join(DATA_RAW, 'WorldPop', 'SSA_population_store')
 countries = pd.read_csv(path, encoding = 'utf-8-sig')
 
 poverty_shp = os.path.join(DATA_RAW, 'poverty_data', 'GSAP2.shp')
 
 if __name__ == '__main__':
 
+    # Convert the SSA extent of WorldPop once to a memory-mapped store, and 
+    # pass pop_store instead of pop_tif_loc to ProcessPopulation
+    #build_population_store(pop_tif_loc, pop_store)
+
     for idx, country in countries.iterrows():
             
         if not country['regions'] == 'Sub-Saharan Africa' or country['Exclude'] == 1:
@@ -81,6 +87,10 @@ if __name__ == '__main__':
             folder = os.path.join( DATA_RESULTS, iso, 'pop_connected')
             #generate_unconnected_csv(folder, iso)
 
+            # Raster alternative needing only the national population and 
+            # coverage layers, without the shapefile and overlay stages
+            #generate_unconnected_raster_csv(iso)
+
             ######### POVERTY IN-LINE POPULATION #########
             #generate_poverty_csv(iso)
             #coverage_poverty_csv(iso)
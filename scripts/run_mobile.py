@@ -8,14 +8,27 @@ September 2024
 """
 import configparser
 import os
+import sys
 import math
 import time
+import numpy as np
 import pandas as pd
+import rasterio
 import geosafi_consav.mobile as mb
-from mobile_inputs import lut
+import mobile_inputs
+from functools import partial
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import concurrent.futures
+from rasterio.transform import from_origin
+from mobile_inputs import lut, parameters
+import mobi_preprocess
+from mobi_preprocess import (merge_capacity_data, merge_cost_data, 
+                             merge_emission_data, uq_data_paths)
+from geosafi_consav import sampling
+from geosafi_consav.cache import ResultCache, code_version, file_digest
+from geosafi_consav.sensitivity import saltelli_design, sobol_indices
+from geosafi_consav.convergence import ConvergenceMonitor
+from geosafi_consav.parallel import map_chunks
+from geosafi_consav.writers import ResultWriter, write_chunks
 pd.options.mode.chained_assignment = None 
 
 CONFIG = configparser.ConfigParser()
@@ -24,106 +37,143 @@ BASE_PATH = CONFIG['file_locations']['base_path']
 RESULTS = os.path.join(BASE_PATH, '..', 'results', 'cellular')
 SSA_DATA = os.path.join(BASE_PATH, '..', 'results', 'SSA')
 RAW_DATA = os.path.join(BASE_PATH, '..', 'data', 'raw', 'tower')
+WORKERS = CONFIG.getint('processing', 'workers', fallback = 0) or None
+CHUNK_SIZE = CONFIG.getint('processing', 'chunk_size', fallback = 100000)
+MAX_BUFFER_MB = CONFIG.getfloat('processing', 'max_buffer_mb', fallback = 256)
+RESULTS_FORMAT = CONFIG.get('processing', 'results_format', fallback = 'csv')
+INTERFERERS = CONFIG.getint('processing', 'interferers', fallback = 0)
+CACHE_SIZE_MB = CONFIG.getfloat('processing', 'cache_size_mb', fallback = 2048)
+CACHE = ResultCache(os.path.join(RESULTS, 'cache'), CACHE_SIZE_MB)
+SE_TABLE = mb.SpectralEfficiencyTable(lut)
+FADING = mb.FadingVariateBank()
+CODE_VERSION = code_version(mb, sampling, mobi_preprocess, mobile_inputs,
+                            sys.modules[__name__])
+
+
+def results_path(filename):
+    """
+    Path of a results file in the configured results format.
+    """
 
+    return os.path.join(RESULTS, '{}.{}'.format(filename, RESULTS_FORMAT))
 
-def process_capacity_item(item):
-    """
-    Helper function to process each item in parallel.
-    """
-    #user_demand = mb.user_demand(item['mean_monthly_demand_GB'], 
-                #item['traffic_busy_hour'], item['smartphone_penetration'], 1, 1) 
-                #item['mean_poor_connected'], item['mean_area_sqkm'])
-    
-    random_variation = mb.generate_log_normal_dist_value(
-        item['frequency_MHz'], item['mu'], item['sigma'], 
-        item['seed_value'], item['draws'])
-    
-    hk_rural_correction_db = mb.hk_rural_correction_model(
-        item['frequency_MHz'])
-    
-    hk_city_correction_db = mb.hk_city_correction_model(
-        item['frequency_MHz'], item['user_antenna_height_m'])
-    
-    intersite_distance_km = mb.calc_signal_path(item['transmitter_x'], 
-        item['transmitter_y'], item['receiver_x'], item['receiver_y'])
-    
-    interference_signal_path_km = mb.calc_signal_path(item['interference_x'], 
-        item['interference_y'], item['receiver_x'], item['receiver_y'])
-    
-    path_loss_db = mb.hk_path_loss_model(item['frequency_MHz'], 
-            item['transmitter_height_m'], item['user_antenna_height_m'], 
-            intersite_distance_km, item['iteration'], random_variation)
-    
-    int_path_loss_db = mb.hk_path_loss_model(item['frequency_MHz'], 
-            item['transmitter_height_m'], item['user_antenna_height_m'], 
-            interference_signal_path_km, item['iteration'], random_variation)
-
-    received_power_db = mb.calc_power_received(item['transmitter_power_dbm'], 
-                    item['trans_antenna_gain_dbi'], path_loss_db, 
-                    item['shadow_fading_db'], 
-                    item['building_penetration_loss_db'])
-
-    int_received_power_db = mb.calc_power_received(item['transmitter_power_dbm'], 
-                    item['trans_antenna_gain_dbi'], int_path_loss_db, 
-                    item['shadow_fading_db'], 
-                    item['building_penetration_loss_db'])
-
-    cell_generation = mb.system_type(item['frequency_MHz'])
-
-    channel_bandwidth_mhz = mb.bandwidth(cell_generation)
-
-    noise_db = mb.calc_noise(item['frequency_MHz'], channel_bandwidth_mhz)
-
-    interference_db = mb.calc_interference(int_received_power_db, noise_db,
-                item['user_antenna_gain_dbi'], item['user_antenna_loss_db'])
-    
-    sinr_db = mb.calc_sinr(received_power_db, noise_db, 
-                         item['user_antenna_gain_dbi'], 
-                         item['user_antenna_loss_db'], 
-                         interference_db)
-    
-    spectral_efficiency_bpshz = mb.get_spectral_efficiency(lut, 
-                                        cell_generation, sinr_db)
-    
-    capacity_mbps = mb.calc_capacity(spectral_efficiency_bpshz, 
-                channel_bandwidth_mhz, item['antenna_sectors']) * 3
-    
-    site_area_sqkm = mb.calc_site_area(intersite_distance_km)
-
-    capacity_mbps_km2 = mb.calc_area_capacity(capacity_mbps, site_area_sqkm)
-    
-    return {
-        'transmitter_x' : item['transmitter_x'],
-        'transmitter_y' : item['transmitter_y'],
-        'receiver_x' : item['receiver_x'],
-        'receiver_y' : item['receiver_y'],
-        'cell_generation' : cell_generation,
-        'frequency_mhz' : item['frequency_MHz'],
-        'intersite_distance_km' : intersite_distance_km,
-        'interference_signal_path_km' : interference_signal_path_km,
-        'hk_rural_correction_db' : hk_rural_correction_db,
-        'hk_city_correction_db' : hk_city_correction_db,
-        'path_loss_db' : path_loss_db,
-        'int_path_loss_db' : int_path_loss_db,
-        'received_power_db' : received_power_db,
-        'noise_db' : noise_db,
-        'interference_db' : interference_db,
-        'sinr_db' : sinr_db,
-        'spectral_efficiency_bpshz' : spectral_efficiency_bpshz,
-        'capacity_mbps' : capacity_mbps,
-        'site_area_sqkm' : site_area_sqkm,
-        'capacity_mbps_km2' : capacity_mbps_km2,
-        'mean_monthly_demand_GB' : item['mean_monthly_demand_GB'],
-        'traffic_busy_hour' : item['traffic_busy_hour'],
-        'channel_bandwidth_mhz' : channel_bandwidth_mhz,
-        'smartphone_penetration' : item['smartphone_penetration'],
-        'decile' : item['decile']
-    }
+
+def stage_key(stage, *parts):
+    """
+    Cache key of a stage's results, from the digests and settings that 
+    determine them, the results format, the model code version and the 
+    spectral efficiency table and parameters the stages are run with.
+    """
+
+    return CACHE.key(stage, RESULTS_FORMAT, CODE_VERSION, lut, parameters, 
+                     *parts)
+
+
+def fetch_cached(key, filename):
+    """
+    Copy cached results to the results folder. Returns True on a cache hit.
+    """
+    if key is None or not CACHE.fetch(key, results_path(filename)):
+
+        return False
+
+    print('Using cached {}'.format(os.path.basename(results_path(filename))))
+
+
+    return True
+
+
+def stream_results(df, func, filename, desc, workers, chunk_size, 
+                   key = None):
+    """
+    Evaluate the UQ inputs chunk by chunk and append each chunk of results 
+    to the results file as soon as it is ready.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        UQ inputs.
+    func : function
+        Function processing one chunk of inputs.
+    filename : string
+        Name of the results file without extension.
+    desc : string
+        Progress bar description.
+    workers : int
+        Number of worker processes.
+    chunk_size : int
+        Number of rows in each chunk.
+    key : string
+        Cache key under which the results are stored. The results are not 
+        cached if not given.
+
+    """
+    path_out = results_path(filename)
+    chunks = map_chunks(df, func, workers, chunk_size, desc)
+    write_chunks(chunks, path_out, MAX_BUFFER_MB, RESULTS_FORMAT)
+
+    if key is not None:
+
+        CACHE.store(key, path_out)
+
+
+    return None
 
 
-def run_uq_processing_capacity():
+def process_capacity_chunk(chunk, sites = None, interferers = 1):
     """
-    Run the UQ inputs through the mobile broadband model in parallel.
+    Process a chunk of capacity rows with the vectorized capacity model.
+    """
+
+    return mb.capacity_batch(chunk, SE_TABLE, FADING, sites, interferers)
+
+
+def capacity_chunk_function(interferers = INTERFERERS):
+    """
+    Return the function processing a chunk of capacity rows, with the nearest 
+    co-channel sites in interference_sites.csv bound to it if interferers is 
+    above zero. Returns None if the sites cannot be located.
+    """
+    if interferers <= 0:
+
+        return process_capacity_chunk
+
+    site_path = os.path.join(RESULTS, 'interference_sites.csv')
+
+    if not os.path.exists(site_path):
+        print('Cannot locate interference_sites.csv')
+        return None
+
+    sites = pd.read_csv(site_path)
+
+
+    return partial(process_capacity_chunk, sites = sites, 
+                   interferers = interferers)
+
+
+def capacity_key_parts(interferers):
+    """
+    Settings and site digest that the capacity results depend on.
+    """
+    if interferers <= 0:
+
+        return [interferers]
+
+
+    return [interferers, file_digest(os.path.join(RESULTS, 
+                                                  'interference_sites.csv'))]
+
+
+def run_uq_processing_capacity(workers = WORKERS, chunk_size = CHUNK_SIZE, 
+                               interferers = INTERFERERS, use_cache = True):
+    """
+    Run the UQ inputs through the vectorized mobile broadband capacity model, 
+    in chunks spread over worker processes.
+
+    If interferers is above zero, the interference of each receiver is summed 
+    over its nearest co-channel sites in interference_sites.csv instead of 
+    the single interference site of each row. Results of unchanged inputs 
+    are copied from the cache if use_cache is True.
     """
     path = os.path.join(RESULTS, 'uq_parameters_capacity.csv') 
 
@@ -131,265 +181,610 @@ def run_uq_processing_capacity():
         print('Cannot locate uq_parameters_capacity.csv')
         return
 
-    df = pd.read_csv(path)
-    df = df.to_dict('records')  
+    key = None
 
-    results = []
-    
+    if use_cache:
 
-    with ThreadPoolExecutor() as executor:
-    
-        futures = {executor.submit(process_capacity_item, item): item for item in df}
-        
-        for future in tqdm(as_completed(futures), total=len(futures), 
-                           desc="Processing uncertainty mobile results"):
-            
-            result = future.result()  
-            results.append(result)
+        key = stage_key('capacity', file_digest(path), 
+                        *capacity_key_parts(interferers))
 
-    df_results = pd.DataFrame(results)
+        if fetch_cached(key, 'mobile_capacity_results'):
+            return
 
-    filename = 'mobile_capacity_results.csv'
-    if not os.path.exists(RESULTS):
-        os.makedirs(RESULTS)
+    func = capacity_chunk_function(interferers)
 
-    path_out = os.path.join(RESULTS, filename)
-    df_results.to_csv(path_out, index=False)
+    if func is None:
+        return
+
+    df = pd.read_csv(path)
+    stream_results(df, func, 'mobile_capacity_results', 
+                   "Processing uncertainty mobile results", workers, chunk_size, 
+                   key)
 
 
     return None
 
 
-def process_cost_item(item):
-    """
-    Process a single item to compute various costs.
-    This is the function that will be run in parallel for each item.
-    """
-    equipment_cost_usd = mb.equipment_cost(item['sector_antenna_usd'],
-            item['remote_radio_unit_usd'], item['io_fronthaul_usd'],
-            item['control_unit_usd'], item['cooling_fans_usd'], 
-            item['battery_power_usd'], item['bbu_cabinet_usd'], 
-            item['tower_usd'], item['civil_materials_usd'], 
-            item['router_usd'])
-
-    spectrum_cost_usd = mb.spectrum_cost(item['channel_bandwidth_mhz'], 
-            item['mean_poor_connected'], item['mhz_per_pop_usd'])
-
-    capex_cost_usd = mb.capex_cost(equipment_cost_usd, spectrum_cost_usd,
-            item['installation_usd'], item['transportation_usd'])
-
-    opex_cost_usd = mb.opex_cost(item['site_rental_usd'], 
-            item['base_station_energy_usd'], item['staff_costs_usd'], 
-            item['sector_antenna_usd'], item['remote_radio_unit_usd'], 
-            item['bbu_cabinet_usd'], item['router_usd'], 
-            item['fiber_link_usd'])
-
-    total_cost_ownership = mb.total_cost_ownership(capex_cost_usd, 
-            opex_cost_usd, item['discount_rate'], item['assessment_years'])
-    
-    total_decile_tco_usd = total_cost_ownership * item['no_of_required_sites']
-
-    result = {
-        'cell_generation': item['cell_generation'],
-        'frequency_mhz': item['channel_bandwidth_mhz'],
-        'equipment_cost_usd': equipment_cost_usd,
-        'spectrum_cost_usd': spectrum_cost_usd,
-        'capex_cost_usd': capex_cost_usd,
-        'opex_cost_usd': opex_cost_usd,
-        'total_base_station_tco_usd': total_cost_ownership,
-        'total_decile_tco_usd' : total_decile_tco_usd,
-        'total_poor_unconnected' : item['total_poor_unconnected'],
-        'mean_area_sqkm': item['mean_area_sqkm'],
-        'mean_poor_connected': item['mean_poor_connected'],
-        'total_area_sqkm' : item['total_area_sqkm'],
-        'cost_per_1GB_usd': item['cost_per_1GB_usd'],
-        'monthly_income_usd': item['monthly_income_usd'],
-        'cost_per_month_usd': item['cost_per_month_usd'],
-        'arpu_usd': item['arpu_usd'],
-        'assessment_years': item['assessment_years'],
-        'adoption_rate' : item['adoption_rate'],
-        'existing_tower_no' : item['existing_tower_no'],
-        'number_of_sites' : item['no_of_required_sites'],
-        'decile': item['decile']}
-
-    return result
-
-
-def run_uq_processing_cost():
+def process_cost_chunk(chunk):
+    """
+    Process a chunk of cost rows with the vectorized cost model.
+    """
+
+    return mb.cost_batch(chunk)
+
+
+def run_uq_processing_cost(workers = WORKERS, chunk_size = CHUNK_SIZE, 
+                           use_cache = True):
     """
     Run the UQ inputs through the mobile broadband model. 
-    Parallelized for better performance.
+    Chunks of rows are processed in parallel worker processes. Results of 
+    unchanged inputs are copied from the cache if use_cache is True.
     """
     path = os.path.join(RESULTS, 'uq_parameters_cost.csv') 
 
     if not os.path.exists(path):
         print('Cannot locate uq_parameters_cost.csv')
+        return
 
-    df = pd.read_csv(path)
-    df = df.to_dict('records')
+    key = stage_key('cost', file_digest(path)) if use_cache else None
 
-    results = []
+    if fetch_cached(key, 'mobile_cost_results'):
+        return
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        
-        results = list(tqdm(executor.map(process_cost_item, df), 
-            desc="Processing uncertainty mobile cost results", total=len(df)))
+    df = pd.read_csv(path)
+    stream_results(df, process_cost_chunk, 'mobile_cost_results', 
+        "Processing uncertainty mobile cost results", workers, chunk_size, key)
 
-    df_results = pd.DataFrame(results)
 
-    filename = 'mobile_cost_results.csv'
+    return None
 
-    if not os.path.exists(RESULTS):
-        os.makedirs(RESULTS)
 
-    path_out = os.path.join(RESULTS, filename)
-    df_results.to_csv(path_out, index=False)
+def process_emission_chunk(chunk):
+    """
+    Process a chunk of emission rows with the matrix emissions model.
+    """
 
+    return mb.emission_batch(chunk)
 
-    return None
 
+def add_epc_centers(df):
+    """
+    Add the number of evolved packet core centers serving each row.
+    """
+    df['number_epc_centers'] = (df['mean_poor_connected'] * 1 / 150280)
 
-def process_emission_item(item):
-    """
-    Process a single item (row) for the emissions calculations.
-    This function will be executed in parallel for each row in the dataframe.
-    """
-    lca_mfg = mb.lca_manufacturing(item['bbu_rru_pcb_kg'], 
-                    item['bbu_rru_aluminium_kg'], item['copper_antenna_kg'], 
-                    item['aluminium_antenna_kg'], item['pvc_antenna_kg'],
-                    item['iron_antenna_kg'], item['steel_antenna_kg'], 
-                    item['steel_tower_kg'], item['aluminium_frame_kg'], 
-                    item['steel_pole_kg'], item['machine_concrete_kg'], 
-                    item['machine_steel_kg'], item['basic_aluminium_device_kg'], 
-                    item['pcb_kg_co2e'], item['aluminium_kg_co2e'], 
-                    item['copper_kg_co2e'], item['pvc_kg_co2e'], 
-                    item['iron_kg_co2e'], item['steel_kg_co2e'], 
-                    item['concrete_kg_co2e'], item['smartphone_kg'],
-                    item['ict_equipment_kg'], item['power_supply_kg'],
-                    item['lithium_battery_kg'], item['mean_poor_connected'])
-
-    aluminium_mfg_ghg = lca_mfg['aluminium_ghg']
-    steel_iron_mfg_ghg = lca_mfg['steel_iron_ghg']
-    concrete_mfg_ghg = lca_mfg['concrete_ghg']
-    plastics_mfg_ghg = lca_mfg['plastics_ghg']
-    other_metals_mfg_ghg = lca_mfg['other_metals_ghg']
-
-    total_mfg_ghg = (aluminium_mfg_ghg + steel_iron_mfg_ghg + concrete_mfg_ghg 
-                     + plastics_mfg_ghg + other_metals_mfg_ghg)    
-    total_mfg_ghg = mb.phase_emission_ghg(item['cell_generation'], 
-                    total_mfg_ghg, item['no_of_required_sites'])
-
-    lca_trans = mb.lca_transportation(item['mean_distance_km'], 
-                                      item['consumption_lt_per_km'], 
-                                      item['diesel_factor_kgco2e'],
-                                      item['maritime_km'],
-                                      item['container_ship_kgco2e'])
-    total_trans_ghg_kg = lca_trans['trans_ghg_kg']
-    total_trans_ghg_kg = mb.phase_emission_ghg(item['cell_generation'], 
-                        total_trans_ghg_kg, item['no_of_required_sites'])
-
-    lca_constr = mb.lca_construction(item['machine_fuel_eff_lt_per_hr'], 
-                                     item['machine_operation_hrs'], 
-                                     item['diesel_factor_kgco2e'])
-    total_construction_ghg = lca_constr['construction_ghg']
-    total_construction_ghg = mb.phase_emission_ghg(item['cell_generation'], 
-                            total_construction_ghg, item['no_of_required_sites'])
-
-    lca_ops = mb.lca_operations(item['smartphone_kwh'], item['ict_kwh'],
-                                item['base_band_unit_kwh'], 
-                                item['mean_poor_connected'], 
-                                item['radio_frequency_kwh'],
-                                item['epc_center_kwh'], 
-                                item['number_epc_centers'],
-                                item['electricity_kg_co2e'],
-                                item['no_of_required_sites'])
-    total_operations_ghg = lca_ops['operations_ghg']
-    total_operations_ghg = mb.phase_emission_ghg(item['cell_generation'], 
-                        total_operations_ghg, item['no_of_required_sites'])
-
-    lca_eolts = mb.lca_eolt(item['bbu_rru_pcb_kg'], item['bbu_rru_aluminium_kg'], 
-                            item['copper_antenna_kg'], 
-                            item['aluminium_antenna_kg'], item['pvc_antenna_kg'],
-                            item['iron_antenna_kg'], item['steel_antenna_kg'], 
-                            item['steel_tower_kg'], item['aluminium_frame_kg'], 
-                            item['steel_pole_kg'], item['machine_steel_kg'], 
-                            item['basic_aluminium_device_kg'], 
-                            item['metals_factor_kgco2e'], 
-                            item['plastics_factor_kgco2e'])
-    
-    aluminium_eolt_ghg = lca_eolts['aluminium_ghg']
-    steel_iron_eolt_ghg = lca_eolts['steel_iron_ghg']
-    plastics_eolt_ghg = lca_eolts['plastics_ghg']
-    other_metals_eolt_ghg = lca_eolts['other_metals_ghg']
-
-    total_eolt_ghg = (aluminium_eolt_ghg + steel_iron_eolt_ghg 
-                      + plastics_eolt_ghg + other_metals_eolt_ghg)
-    
-    total_eolt_ghg = mb.phase_emission_ghg(item['cell_generation'], 
-                    total_eolt_ghg, item['no_of_required_sites'])
-
-    total_emissions_ghg_kg = (total_mfg_ghg + total_trans_ghg_kg 
-                        + total_construction_ghg + total_operations_ghg 
-                        + total_eolt_ghg) 
-    
-    result = {
-        'cell_generation': item['cell_generation'],
-        'aluminium_mfg_ghg_kg': aluminium_mfg_ghg,
-        'steel_iron_mfg_ghg_kg': steel_iron_mfg_ghg,
-        'concrete_mfg_ghg_kg': concrete_mfg_ghg,
-        'plastics_mfg_ghg_kg': plastics_mfg_ghg,
-        'other_metals_mfg_ghg_kg': other_metals_mfg_ghg,
-        'aluminium_eolt_ghg': aluminium_eolt_ghg,
-        'steel_iron_eolt_ghg': steel_iron_eolt_ghg,
-        'plastics_eolt_ghg': plastics_eolt_ghg,
-        'other_metals_eolt_ghg': other_metals_eolt_ghg,
-        'total_mfg_ghg': total_mfg_ghg,
-        'total_trans_ghg_kg': total_trans_ghg_kg,
-        'total_construction_ghg_kg': total_construction_ghg,
-        'total_operations_ghg_kg': total_operations_ghg,
-        'total_eolt_ghg_kg': total_eolt_ghg,
-        'total_emissions_ghg_kg': total_emissions_ghg_kg,
-        'total_population' : item['total_population'],
-        'total_poor_unconnected': item['total_poor_unconnected'],
-        'mean_poor_connected': item['mean_poor_connected'],
-        'social_carbon_cost_usd' : item['social_carbon_cost_usd'],
-        'no_of_required_sites': item['no_of_required_sites'],
-        'assessment_period': item['assessment_period'],
-        'decile': item['decile']
-    }
 
-    return result
+    return df
 
 
-def run_uq_processing_emission():
+def run_uq_processing_emission(workers = WORKERS, chunk_size = CHUNK_SIZE, 
+                               use_cache = True):
     """
     Run the UQ inputs through the mobile broadband model.
-    Parallelized for better performance.
+    Chunks of rows are processed in parallel worker processes. Results of 
+    unchanged inputs are copied from the cache if use_cache is True.
     """
     path = os.path.join(RESULTS, 'uq_parameters_emission.csv') 
 
     if not os.path.exists(path):
         print('Cannot locate uq_parameters_emission.csv')
+        return
+
+    key = stage_key('emission', file_digest(path)) if use_cache else None
+
+    if fetch_cached(key, 'mobile_emission_results'):
+        return
+
+    df = add_epc_centers(pd.read_csv(path))
+
+    stream_results(df, process_emission_chunk, 'mobile_emission_results', 
+        "Processing uncertainty mobile results", workers, chunk_size, key)
+
+
+    return None
+
+
+def merge_emission_inputs(df):
+    """
+    Merge sampled UQ emission inputs with the decile data and add the evolved 
+    packet core centers.
+    """
+
+    return add_epc_centers(merge_emission_data(df))
+
+
+UQ_STAGES = {
+    'capacity': {
+        'sampler' : sampling.uq_capacity_inputs,
+        'ranges' : sampling.capacity_ranges,
+        'constants' : sampling.capacity_constants,
+        'axes' : sampling.capacity_axes,
+        'merge' : merge_capacity_data,
+        'metric' : 'capacity_mbps_km2',
+        'filename' : 'mobile_capacity_results',
+        'inputs' : 'uq_parameters_capacity.csv'
+    },
+    'cost': {
+        'sampler' : sampling.uq_cost_inputs,
+        'ranges' : sampling.cost_ranges,
+        'constants' : sampling.cost_constants,
+        'axes' : sampling.cost_axes,
+        'merge' : merge_cost_data,
+        'process' : process_cost_chunk,
+        'metric' : 'total_base_station_tco_usd',
+        'filename' : 'mobile_cost_results',
+        'inputs' : 'uq_parameters_cost.csv'
+    },
+    'emission': {
+        'sampler' : sampling.uq_emission_inputs,
+        'ranges' : sampling.emission_ranges,
+        'constants' : sampling.emission_constants,
+        'axes' : sampling.emission_axes,
+        'merge' : merge_emission_inputs,
+        'process' : process_emission_chunk,
+        'metric' : 'total_emissions_ghg_kg',
+        'filename' : 'mobile_emission_results',
+        'inputs' : 'uq_parameters_emission.csv'
+    },
+}
+
+
+def sample_stage_inputs(stage, deciles, iterations, first_iteration = 0, 
+                        rng = None, design = 'random'):
+    """
+    Sample a batch of model ready UQ inputs of a stage in memory.
+
+    Parameters
+    ----------
+    stage : string
+        One of 'capacity', 'cost' or 'emission'.
+    deciles : list
+        Deciles to sample.
+    iterations : int
+        Number of iterations in the batch.
+    first_iteration : int
+        Iteration number of the first iteration in the batch.
+    rng : numpy.random.Generator
+        Random generator of the draws.
+    design : string
+        Experimental design, one of 'random', 'lhs' or 'sobol'.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        UQ inputs of the 4G and 5G parameters merged with the decile data.
+
+    """
+    spec = UQ_STAGES[stage]
+    samples = pd.concat([spec['sampler'](mobile_params, deciles, iterations, 
+                         rng, design) for key, mobile_params in 
+                         parameters.items() if key in ['4G', '5G']], 
+                        ignore_index = True)
+    samples['iteration'] += first_iteration
+
+
+    return spec['merge'](samples)
+
+
+def uq_input_batches(stage, iterations = None, batch_iterations = 10, 
+                     design = 'random', seed = None):
+    """
+    Yield the UQ inputs of a stage in batches of iterations, so no batch 
+    larger than batch_iterations is held in memory.
+
+    Parameters
+    ----------
+    stage : string
+        One of 'capacity', 'cost' or 'emission'.
+    iterations : int
+        Total number of iterations. Defaults to the iterations in the 
+        parameters.
+    batch_iterations : int
+        Iterations per batch.
+    design : string
+        Experimental design of each batch, one of 'random', 'lhs' or 'sobol'.
+    seed : int
+        Seed of the random draws.
+
+    Yields
+    ------
+    df : pandas.DataFrame
+        Model ready UQ inputs.
+
+    """
+    iterations = iterations or min(mobile_params['iterations'] for key, 
+        mobile_params in parameters.items() if key in ['4G', '5G'])
+    rng = np.random.default_rng(seed)
+
+    for start in range(0, iterations, batch_iterations):
+
+        yield sample_stage_inputs(stage, sampling.DECILES, min(batch_iterations, 
+            iterations - start), start, rng, design)
+
+
+def run_uq_pipeline(stage, iterations = None, batch_iterations = 10, 
+                    design = 'random', seed = None, persist_inputs = False,
+                    workers = WORKERS, chunk_size = CHUNK_SIZE, 
+                    use_cache = True):
+    """
+    Sample the UQ inputs of a stage in memory and stream each batch straight 
+    through the model, without the uq_parameters_*.csv round trip.
+
+    Parameters
+    ----------
+    stage : string
+        One of 'capacity', 'cost' or 'emission'.
+    iterations : int
+        Total number of iterations. Defaults to the iterations in the 
+        parameters.
+    batch_iterations : int
+        Iterations sampled per batch.
+    design : string
+        Experimental design, one of 'random', 'lhs' or 'sobol'.
+    seed : int
+        Seed of the random draws.
+    persist_inputs : bool
+        If True, the sampled inputs are also written to the 
+        uq_parameters_*.csv file of the stage.
+    workers : int
+        Number of worker processes.
+    chunk_size : int
+        Number of rows in each chunk.
+    use_cache : bool
+        If True, seeded runs whose parameters, decile data and code are 
+        unchanged copy their results from the cache. Runs persisting their 
+        inputs are always evaluated.
+
+    Returns
+    -------
+    rows : int
+        Number of result rows written, or None if copied from the cache.
+
+    """
+    spec = UQ_STAGES[stage]
+    key = None
+
+    if use_cache and seed is not None and not persist_inputs:
+
+        generations = {generation: mobile_params for generation, mobile_params 
+                       in parameters.items() if generation in ['4G', '5G']}
+        digests = [file_digest(path) for path in uq_data_paths(stage)]
+
+        if stage == 'capacity':
+
+            digests += capacity_key_parts(INTERFERERS)
+
+        key = stage_key(stage, generations, iterations, batch_iterations, 
+                        design, seed, digests)
+
+        if fetch_cached(key, spec['filename']):
+            return
+
+    func = spec.get('process') or capacity_chunk_function()
+
+    if func is None:
+        return
+
+    path_out = results_path(spec['filename'])
+    inputs = None
+
+    if persist_inputs:
+
+        inputs = ResultWriter(os.path.join(RESULTS, spec['inputs']), 
+                              MAX_BUFFER_MB, 'csv')
+
+    with ResultWriter(path_out, MAX_BUFFER_MB, RESULTS_FORMAT) as writer:
+
+        for df in uq_input_batches(stage, iterations, batch_iterations, 
+                                   design, seed):
+
+            if inputs is not None:
+
+                inputs.write(df)
+
+            for results in map_chunks(df, func, workers, chunk_size):
+
+                writer.write(results)
+
+    if inputs is not None:
+
+        inputs.close()
+
+    if key is not None:
+
+        CACHE.store(key, path_out)
+
+
+    return writer.rows_written
+
+
+def run_adaptive_uq(stage, tolerance = 0.01, batch_iterations = 10, 
+                    max_iterations = None, design = 'lhs', seed = None, 
+                    confidence = 0.95, workers = WORKERS, 
+                    chunk_size = CHUNK_SIZE):
+    """
+    Run a UQ stage in batches of iterations until the mean output of every 
+    decile and cell generation has settled.
+
+    After each batch the confidence interval of the mean output is updated 
+    per decile and cell generation. Deciles whose intervals are all narrower 
+    than the tolerance stop being sampled. The run ends once every decile has 
+    converged or reached the maximum number of iterations. The results are 
+    written as in the fixed runs, and the convergence summary, including the 
+    iterations each decile needed, is written to 
+    mobile_{stage}_convergence.csv.
+
+    Parameters
+    ----------
+    stage : string
+        One of 'capacity', 'cost' or 'emission'.
+    tolerance : float
+        Allowed half width of the confidence interval as a fraction of the 
+        mean.
+    batch_iterations : int
+        Iterations sampled per batch.
+    max_iterations : int
+        Maximum iterations per decile. Defaults to the number of fading 
+        draws, which bounds the capacity iterations.
+    design : string
+        Experimental design of each batch, one of 'random', 'lhs' or 'sobol'.
+    seed : int
+        Seed of the random draws.
+    confidence : float
+        Confidence level of the interval.
+    workers : int
+        Number of worker processes.
+    chunk_size : int
+        Number of rows in each chunk.
+
+    Returns
+    -------
+    summary : pandas.DataFrame
+        Convergence summary per decile and cell generation.
+
+    """
+    spec = UQ_STAGES[stage]
+    func = spec.get('process') or capacity_chunk_function()
+
+    if func is None:
+        return
+
+    max_iterations = max_iterations or min(mobile_params['draws'] for key, 
+        mobile_params in parameters.items() if key in ['4G', '5G'])
+
+    rng = np.random.default_rng(seed)
+    monitor = ConvergenceMonitor({spec['metric']: tolerance}, 
+                                 confidence = confidence)
+    iterations = dict.fromkeys(sampling.DECILES, 0)
+    done = 0
+
+    path_out = results_path(spec['filename'])
+
+    with ResultWriter(path_out, MAX_BUFFER_MB, RESULTS_FORMAT) as writer:
+
+        while done < max_iterations:
+
+            converged = monitor.converged('decile')
+            active = [decile for decile in sampling.DECILES 
+                      if decile not in converged]
+
+            if not active:
+                break
+
+            batch = min(batch_iterations, max_iterations - done)
+            df = sample_stage_inputs(stage, active, batch, done, rng, design)
+
+            for results in map_chunks(df, func, workers, chunk_size):
+
+                writer.write(results)
+                monitor.update(results)
+
+            done += batch
+
+            for decile in active:
+
+                iterations[decile] = done
+
+            print('{} iterations: {} of {} deciles converged'.format(done, 
+                  len(monitor.converged('decile')), len(sampling.DECILES)))
+
+    summary = monitor.summary()
+    summary['iterations'] = summary['decile'].map(iterations)
+    summary.to_csv(os.path.join(RESULTS, 'mobile_{}_convergence.csv'.format(
+                   stage)), index = False)
+
+
+    return summary
+
+
+def generation_rows(df, generation):
+    """
+    Keep the merged rows of one cell generation, so the samples drawn from 
+    its parameter ranges are not evaluated against the other generation.
+    """
+    if 'cell_generation' in df:
+
+        cell_generation = df['cell_generation']
+
+    else:
+
+        cell_generation = df['frequency_MHz'].map(mb.system_type)
+
+
+    return df[cell_generation == generation].reset_index(drop = True)
+
+
+def run_sensitivity(stage, generation = '4G', n = 1024, bootstrap = 200, 
+                    design = 'sobol', seed = None, workers = WORKERS, 
+                    chunk_size = CHUNK_SIZE):
+    """
+    Estimate the first-order and total-order Sobol indices of every uncertain 
+    input of a stage, per decile, for the rows of one cell generation.
+
+    The Saltelli sample matrices of the low/high parameter ranges are 
+    evaluated through the batched model, n * (k + 2) samples per decile for k 
+    inputs. The output of a sample is its mean over the scenario values and 
+    frequencies of the decile. The fading variate is held at the first draw 
+    so only the parameter ranges vary. The indices are written to 
+    mobile_{stage}_{generation}_sobol_indices.csv.
+
+    Parameters
+    ----------
+    stage : string
+        One of 'capacity', 'cost' or 'emission'.
+    generation : string
+        Cellular generation whose parameter ranges and rows are analysed.
+    n : int
+        Number of base samples, ideally a power of two.
+    bootstrap : int
+        Number of bootstrap resamples of the confidence intervals.
+    design : string
+        Design of the base samples, one of 'random', 'lhs' or 'sobol'.
+    seed : int
+        Seed of the random draws.
+    workers : int
+        Number of worker processes.
+    chunk_size : int
+        Number of rows in each chunk.
+
+    Returns
+    -------
+    indices : pandas.DataFrame
+        Sobol indices with confidence bounds per decile, cell generation and 
+        input.
+
+    """
+    spec = UQ_STAGES[stage]
+    func = spec.get('process') or capacity_chunk_function()
+
+    if func is None:
+        return
+
+    mobile_params = parameters[generation]
+    ranges = spec['ranges'](mobile_params)
+    names = [name for name, low, high, integer in ranges]
+
+    rng = np.random.default_rng(seed)
+    unit = saltelli_design(n, len(ranges), design, rng)
+
+    samples = pd.DataFrame(sampling.scale_unit_samples(unit, ranges))
+    samples['sample'] = np.arange(len(samples))
+    samples['iteration'] = 0
+
+    for column, value in spec['constants'](mobile_params).items():
+
+        samples[column] = value
+
+    frames = []
+
+    for decile in tqdm(sampling.DECILES, desc = 'Sobol analysis'):
+
+        axes = {'decile': [decile]}
+        axes.update(spec['axes'](mobile_params))
+        grid = pd.MultiIndex.from_product(list(axes.values()), 
+                                          names = list(axes)).to_frame(
+                                          index = False)
+        df = spec['merge'](samples.merge(grid, how = 'cross'))
+        df = generation_rows(df, generation)
+
+        results = pd.concat(list(map_chunks(df, func, workers, chunk_size)), 
+                            ignore_index = True)
+        values = results[spec['metric']].replace([np.inf, -np.inf], np.nan)
+        outputs = values.groupby([results['cell_generation'], 
+                                  df['sample'].to_numpy()]).mean()
+
+        for cell_generation, group in outputs.groupby(level = 0):
+
+            y = group.droplevel(0).reindex(samples['sample']).to_numpy()
+            indices = sobol_indices(y, n, names, bootstrap, rng = rng)
+            indices.insert(0, 'metric', spec['metric'])
+            indices.insert(0, 'cell_generation', cell_generation)
+            indices.insert(0, 'decile', decile)
+            frames.append(indices)
+
+    indices = pd.concat(frames, ignore_index = True)
+    indices.to_csv(os.path.join(RESULTS, 'mobile_{}_{}_sobol_indices.csv'
+                   .format(stage, generation)), index = False)
+
+
+    return indices
+
+
+def capacity_raster(generation = '4G', resolution_m = 250, 
+                    max_distance_m = 50000):
+    """
+    Evaluate SINR and capacity per km^2 on a raster grid around the 
+    transmitters in coordinates.csv and write them as GeoTIFFs in EPSG:3857.
+
+    Parameters
+    ----------
+    generation : string
+        Cellular generation whose mid-range parameters are used.
+    resolution_m : float
+        Pixel size in meters.
+    max_distance_m : float
+        Extent of the grid around the transmitters in meters.
+
+    """
+    path = os.path.join(RESULTS, 'coordinates.csv')
+
+    if not os.path.exists(path):
+        print('Cannot locate coordinates.csv')
+        return
 
     df = pd.read_csv(path)
-    df['number_epc_centers'] = (df['mean_poor_connected'] * 1 / 150280)
-    df = df.to_dict('records')
+    transmitters = df[['transmitter_x', 'transmitter_y']].drop_duplicates(
+        ).values
+
+    mobile_params = parameters[generation]
+    params = {
+        'frequency_MHz' : mobile_params['frequencies_mhz'][0],
+        'transmitter_height_m' : (mobile_params['transmitter_height_low_m'] 
+            + mobile_params['transmitter_height_high_m']) / 2,
+        'user_antenna_height_m' : (mobile_params['user_antenna_height_low_m'] 
+            + mobile_params['user_antenna_height_high_m']) / 2,
+        'transmitter_power_dbm' : (mobile_params['transmitter_power_low_dbm'] 
+            + mobile_params['transmitter_power_high_dbm']) / 2,
+        'trans_antenna_gain_dbi' : (mobile_params['trans_antenna_gain_low_dbi'] 
+            + mobile_params['trans_antenna_gain_high_dbi']) / 2,
+        'user_antenna_gain_dbi' : (mobile_params['user_antenna_gain_low_dbi'] 
+            + mobile_params['user_antenna_gain_high_dbi']) / 2,
+        'user_antenna_loss_db' : (mobile_params['user_antenna_loss_low_db'] 
+            + mobile_params['user_antenna_loss_high_db']) / 2,
+        'shadow_fading_db' : mobile_params['shadow_fading_db'],
+        'building_penetration_loss_db' : (
+            mobile_params['building_penetration_loss_db']),
+        'antenna_sectors' : mobile_params['antenna_sectors']
+    }
+
+    x_min = transmitters[:, 0].min() - max_distance_m
+    x_max = transmitters[:, 0].max() + max_distance_m
+    y_min = transmitters[:, 1].min() - max_distance_m
+    y_max = transmitters[:, 1].max() + max_distance_m
+
+    grid_x = np.arange(x_min + resolution_m / 2, x_max, resolution_m)
+    grid_y = np.arange(y_max - resolution_m / 2, y_min, -resolution_m)
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    grids = mb.capacity_grid(grid_x, grid_y, transmitters, params, SE_TABLE)
 
-        results = list(tqdm(executor.map(process_emission_item, df), 
-                desc ="Processing uncertainty mobile results", total = len(df)))
+    folder_out = os.path.join(RESULTS, 'rasters')
 
-    df_results = pd.DataFrame(results)
+    if not os.path.exists(folder_out):
 
-    filename = 'mobile_emission_results.csv'
+        os.makedirs(folder_out)
 
-    if not os.path.exists(RESULTS):
+    for metric in ['sinr_db', 'capacity_mbps_km2']:
 
-        os.makedirs(RESULTS)
+        filename = '{}_{}_{}.tif'.format(generation, params['frequency_MHz'], 
+                                         metric)
 
-    path_out = os.path.join(RESULTS, filename)
-    df_results.to_csv(path_out, index = False)
+        with rasterio.open(os.path.join(folder_out, filename), 'w', 
+                driver = 'GTiff', height = len(grid_y), width = len(grid_x), 
+                count = 1, dtype = 'float32', crs = 'EPSG:3857', 
+                transform = from_origin(x_min, y_max, resolution_m, 
+                resolution_m)) as dst:
+
+            dst.write(grids[metric].astype('float32'), 1)
 
 
     return None
@@ -404,4 +799,10 @@ if __name__ == '__main__':
     #run_uq_processing_cost()
 
     #print('Running mobile broadband emissions model')
-    #run_uq_processing_emission()
\ No newline at end of file
+    #run_uq_processing_emission()
+
+    #print('Running in-memory mobile broadband emissions model')
+    #run_uq_pipeline('emission', seed = 10)
+
+    #print('Running adaptive mobile broadband cost model')
+    #run_adaptive_uq('cost', tolerance = 0.01)
\ No newline at end of file
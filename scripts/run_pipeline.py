@@ -0,0 +1,165 @@
+"""
+Stage graph of the mobile broadband model, from the UQ inputs to the per
+user decile metrics. Only the stages downstream of changed inputs,
+parameters or code are rerun, and the cost and emission stages run
+concurrently.
+
+Written by Bonface Osoro & Ed Oughton.
+
+September 2024
+
+"""
+import configparser
+import os
+from functools import partial
+import geosafi_consav.mobile as mb
+import mobi_preprocess as mp
+import per_user_results as pu
+import mobile_inputs
+import run_mobile as rm
+from mobile_inputs import parameters
+from geosafi_consav import sampling
+from geosafi_consav.pipeline import Stage, StageGraph
+
+CONFIG = configparser.ConfigParser()
+CONFIG.read(os.path.join(os.path.dirname(__file__), 'script_config.ini'))
+STAGE_WORKERS = CONFIG.getint('processing', 'stage_workers', fallback = 2)
+SEED = 10
+STATE_PATH = os.path.join(rm.RESULTS, 'mobile_pipeline_state.json')
+
+
+def sampled_parameters(stage):
+    """
+    Ranges, constants and axes of the 4G and 5G parameters sampled for the
+    capacity, cost or emission stage, so a stage is only rerun when its own
+    parameters change.
+    """
+    functions = {
+        'capacity' : [sampling.capacity_ranges, sampling.capacity_constants,
+                      sampling.capacity_axes],
+        'cost' : [sampling.cost_ranges, sampling.cost_constants,
+                  sampling.cost_axes],
+        'emission' : [sampling.emission_ranges, sampling.emission_constants,
+                      sampling.emission_axes]
+    }
+
+
+    return {key: [func(mobile_params) for func in functions[stage]] for key,
+            mobile_params in parameters.items() if key in ['4G', '5G']}
+
+
+def mobile_stages(seed = SEED, stage_workers = STAGE_WORKERS):
+    """
+    Declare the stages of the mobile broadband model with the files each
+    reads and writes.
+
+    Parameters
+    ----------
+    seed : int
+        Seed of the UQ input draws.
+    stage_workers : int
+        Number of stages run at the same time. The worker processes of the
+        model are split between them, so concurrent stages do not each
+        start a pool sized to every CPU.
+
+    Returns
+    -------
+    stages : list
+        Stages of the mobile broadband model.
+
+    """
+    workers = max(1, (rm.WORKERS or os.cpu_count() or 1) // stage_workers)
+    cellular = lambda filename: os.path.join(rm.RESULTS, filename)
+    ssa = lambda filename: os.path.join(pu.DATA_SSA, filename)
+    generators = {
+        'capacity' : mp.uq_inputs_capacity,
+        'cost' : mp.uq_inputs_costs,
+        'emission' : mp.uq_inputs_emissions
+    }
+    processes = {
+        'capacity' : rm.run_uq_processing_capacity,
+        'cost' : rm.run_uq_processing_cost,
+        'emission' : rm.run_uq_processing_emission
+    }
+
+    stages = []
+
+    for stage in ['capacity', 'cost', 'emission']:
+
+        inputs = cellular('uq_parameters_{}.csv'.format(stage))
+        results = 'mobile_{}_results'.format(stage)
+        process_inputs = [inputs]
+        settings = None
+
+        if stage == 'capacity':
+
+            settings = rm.INTERFERERS
+
+            if rm.INTERFERERS > 0:
+
+                process_inputs.append(cellular('interference_sites.csv'))
+
+        stages += [
+            Stage('{}_inputs'.format(stage), 
+                  partial(generators[stage], parameters),
+                  mp.uq_data_paths(stage), [inputs],
+                  sampled_parameters(stage), {'seed' : seed}, 
+                  [mp, sampling]),
+            Stage(stage, partial(processes[stage], workers = workers), 
+                  process_inputs,
+                  [rm.results_path(results)], settings,
+                  modules = [rm, mb, mobile_inputs]),
+            Stage('{}_per_user'.format(stage), 
+                  partial(pu.decile_per_user_metrics, stages = [stage]),
+                  [rm.results_path(results)], 
+                  [pu.per_user_path(stage)], modules = [pu])
+        ]
+
+    stages.append(Stage('network_dimension', pu.network_dimension,
+        [rm.results_path('mobile_capacity_results'),
+         ssa('SSA_poor_unconnected.csv'),
+         ssa('SSA_subregional_population_deciles.csv')],
+        [ssa('SSA_mobile_capacity_results.csv'),
+         ssa('SSA_number_of_sites.csv')], modules = [pu, mb]))
+
+
+    return stages
+
+
+def run_pipeline(targets = None, force = False, seed = SEED,
+                 workers = STAGE_WORKERS):
+    """
+    Bring the mobile broadband results up to date, rerunning only the stages
+    whose inputs, parameters or code changed and the stages downstream of
+    them.
+
+    Parameters
+    ----------
+    targets : list
+        Names of the stages to be brought up to date, such as
+        'cost_per_user'. Defaults to all stages.
+    force : bool
+        If True, every required stage is rerun.
+    seed : int
+        Seed of the UQ input draws.
+    workers : int
+        Number of independent stages run at the same time.
+
+    Returns
+    -------
+    executed : list
+        Names of the executed stages.
+
+    """
+    graph = StageGraph(mobile_stages(seed, workers), STATE_PATH)
+
+
+    return graph.run(targets, force, workers)
+
+
+if __name__ == '__main__':
+
+    graph = StageGraph(mobile_stages(), STATE_PATH)
+    print('Stale stages: {}'.format(', '.join(graph.plan()) or 'none'))
+
+    graph.run(workers = STAGE_WORKERS)
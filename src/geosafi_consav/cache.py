@@ -0,0 +1,237 @@
+"""
+Content-addressed cache of mobile broadband model results.
+
+Developed by Bonface Osoro and Ed Oughton.
+
+September 2024
+
+"""
+import hashlib
+import inspect
+import json
+import os
+import shutil
+
+
+def file_digest(path, block_size = 1 << 20):
+    """
+    This function hashes the contents of a file.
+
+    Parameters
+    ----------
+    path : string
+        Path of the file.
+    block_size : int
+        Number of bytes read at a time.
+
+    Returns
+    -------
+    digest : string
+        SHA-256 hex digest of the file, or None if it does not exist.
+
+    """
+    if not os.path.exists(path):
+
+        return None
+
+    sha = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+
+        for block in iter(lambda: f.read(block_size), b''):
+
+            sha.update(block)
+
+
+    return sha.hexdigest()
+
+
+def code_version(*modules):
+    """
+    This function hashes the source code of the given modules, so cached
+    results are invalidated when the model code changes.
+
+    Parameters
+    ----------
+    modules : module
+        Modules whose source defines the results.
+
+    Returns
+    -------
+    digest : string
+        SHA-256 hex digest of the module sources.
+
+    """
+    sha = hashlib.sha256()
+
+    for module in modules:
+
+        sha.update((file_digest(inspect.getsourcefile(module)) or '').encode())
+
+
+    return sha.hexdigest()
+
+
+class ResultCache:
+
+    """
+    This class stores result files on disk under a key derived from
+    everything that determines them, such as the hash of the inputs, the
+    model settings and the code version. Entries are evicted least recently
+    used first once the cache exceeds its size limit.
+    """
+
+
+    def __init__(self, folder, max_size_mb = 2048):
+        """
+        A class constructor
+
+        Arguments
+        ---------
+        folder : string
+            Folder holding the cached files.
+        max_size_mb : float
+            Size limit of the cache in megabytes.
+        """
+        self.folder = folder
+        self.max_size_bytes = max_size_mb * 1e6
+
+
+    def key(self, *parts):
+        """
+        Function for deriving a cache key from JSON serializable parts.
+
+        Arguments
+        ---------
+        parts : object
+            Digests, settings and parameters determining the results.
+
+        Returns
+        -------
+        key : string
+            SHA-256 hex digest of the parts.
+        """
+        text = json.dumps(parts, sort_keys = True, default = str)
+
+
+        return hashlib.sha256(text.encode()).hexdigest()
+
+
+    def path(self, key, extension):
+        """
+        Function for returning the location of a cached file.
+        """
+
+        return os.path.join(self.folder, '{}{}'.format(key, extension))
+
+
+    def fetch(self, key, path_out):
+        """
+        Function for copying a cached result file to path_out.
+
+        Arguments
+        ---------
+        key : string
+            Cache key.
+        path_out : string
+            Destination of the results.
+
+        Returns
+        -------
+        hit : bool
+            Whether the results were found in the cache.
+        """
+        path = self.path(key, os.path.splitext(path_out)[1])
+
+        if not os.path.exists(path):
+
+            return False
+
+        # Touching the entry marks it as recently used
+        os.utime(path)
+        shutil.copyfile(path, path_out)
+
+
+        return True
+
+
+    def store(self, key, path_in):
+        """
+        Function for adding a result file to the cache and evicting the least
+        recently used entries beyond the size limit.
+
+        Arguments
+        ---------
+        key : string
+            Cache key.
+        path_in : string
+            Result file to be cached.
+        """
+        if not os.path.exists(path_in):
+
+            return
+
+        if not os.path.exists(self.folder):
+
+            os.makedirs(self.folder)
+
+        path = self.path(key, os.path.splitext(path_in)[1])
+        temporary = path + '.tmp'
+        shutil.copyfile(path_in, temporary)
+        os.replace(temporary, path)
+
+        self.evict()
+
+
+    def evict(self):
+        """
+        Function for removing the least recently used entries until the cache
+        fits its size limit.
+        """
+        entries = []
+
+        for filename in os.listdir(self.folder):
+
+            path = os.path.join(self.folder, filename)
+
+            if filename.endswith('.tmp'):
+
+                continue
+
+            # Entries may be evicted by a stage running at the same time
+            try:
+
+                stat = os.stat(path)
+
+            except FileNotFoundError:
+
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+
+            if total <= self.max_size_bytes:
+
+                break
+
+            try:
+
+                os.remove(path)
+
+            except FileNotFoundError:
+
+                pass
+
+            total -= size
+
+
+    def clear(self):
+        """
+        Function for removing every cached entry.
+        """
+        if os.path.exists(self.folder):
+
+            shutil.rmtree(self.folder)
@@ -0,0 +1,161 @@
+"""
+Convergence tracking of the uncertainty quantification (UQ) runs.
+
+Developed by Bonface Osoro and Ed Oughton.
+
+September 2024
+
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+class ConvergenceMonitor:
+
+    """
+    This class keeps the running mean and variance of model outputs per
+    group, such as decile and cell generation, as batches of results arrive.
+    A group has converged once the confidence interval of the mean of every
+    tracked output is narrower than its relative tolerance.
+    """
+
+
+    def __init__(self, tolerances, group_by = ('decile', 'cell_generation'),
+                 confidence = 0.95, min_samples = 10):
+        """
+        A class constructor
+
+        Arguments
+        ---------
+        tolerances : dict
+            Allowed half width of the confidence interval of each output, as
+            a fraction of its mean.
+        group_by : list
+            Columns identifying a group.
+        confidence : float
+            Confidence level of the interval.
+        min_samples : int
+            Minimum number of samples before a group can converge.
+        """
+        self.tolerances = tolerances
+        self.group_by = list(group_by)
+        self.confidence = confidence
+        self.min_samples = min_samples
+        self.stats = {}
+
+
+    def update(self, df):
+        """
+        Function for adding a batch of results to the running statistics.
+        Batches are combined with the parallel variance formula of Chan et
+        al., so the results do not have to be kept.
+
+        Arguments
+        ---------
+        df : pandas.DataFrame
+            Batch of model results.
+        """
+        for metric in self.tolerances:
+
+            values = df[metric].replace([np.inf, -np.inf], np.nan)
+            grouped = values.groupby([df[column] for column in self.group_by])
+            count = grouped.count()
+            batch = pd.DataFrame({'n': count, 'mean': grouped.mean(),
+                                  'm2': grouped.var(ddof = 0) * count})
+            batch = batch[batch['n'] > 0]
+
+            previous = self.stats.get(metric)
+
+            if previous is None:
+
+                self.stats[metric] = batch
+
+                continue
+
+            previous, batch = previous.align(batch, fill_value = 0)
+            n = previous['n'] + batch['n']
+            delta = batch['mean'] - previous['mean']
+
+            self.stats[metric] = pd.DataFrame({
+                'n': n,
+                'mean': previous['mean'] + delta * batch['n'] / n,
+                'm2': previous['m2'] + batch['m2'] +
+                      delta ** 2 * previous['n'] * batch['n'] / n
+            })
+
+
+    def summary(self):
+        """
+        Function for returning the running statistics of every group and
+        output.
+
+        Returns
+        -------
+        summary : pandas.DataFrame
+            Samples, mean, standard deviation, confidence interval half width
+            and convergence flag of each group and output.
+        """
+        frames = []
+
+        for metric, tolerance in self.tolerances.items():
+
+            df = self.stats.get(metric)
+
+            if df is None:
+
+                continue
+
+            n = df['n'].to_numpy(dtype = float)
+            std = np.sqrt(df['m2'].to_numpy() / np.maximum(n - 1, 1))
+            t_value = stats.t.ppf(0.5 + self.confidence / 2,
+                                  np.maximum(n - 1, 1))
+            half_width = t_value * std / np.sqrt(n)
+            relative = half_width / np.abs(df['mean'].to_numpy())
+
+            summary = df.index.to_frame(index = False)
+            summary['metric'] = metric
+            summary['samples'] = n.astype(int)
+            summary['mean'] = df['mean'].to_numpy()
+            summary['std'] = std
+            summary['ci_half_width'] = half_width
+            summary['relative_half_width'] = relative
+            summary['converged'] = ((n >= self.min_samples) &
+                                    (relative <= tolerance))
+            frames.append(summary)
+
+        if not frames:
+
+            return pd.DataFrame(columns = self.group_by + ['metric',
+                'samples', 'mean', 'std', 'ci_half_width',
+                'relative_half_width', 'converged'])
+
+
+        return pd.concat(frames, ignore_index = True)
+
+
+    def converged(self, level = 'decile'):
+        """
+        Function for listing the values of one grouping column whose groups
+        have all converged for every output.
+
+        Arguments
+        ---------
+        level : string
+            Grouping column, such as decile.
+
+        Returns
+        -------
+        converged : list
+            Converged values of the grouping column.
+        """
+        summary = self.summary()
+
+        if summary.empty:
+
+            return []
+
+        flags = summary.groupby(level)['converged'].all()
+
+
+        return list(flags[flags].index)
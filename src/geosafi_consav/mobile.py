@@ -6,12 +6,15 @@ Developed by Bonface Osoro and Ed Oughton.
 September 2024
 
 """
+import bisect
+import functools
 import math
 import itertools
 import numpy as np
+import pandas as pd
 import geopandas as gpd
+from scipy.spatial import cKDTree
 from shapely.geometry import Point, Polygon
-from collections import OrderedDict
 
 ################################
 ######## CAPACITY MODEL ########
@@ -84,22 +87,195 @@ def generate_log_normal_dist_value(frequency, mu, sigma, seed_value, draws):
         Mean of the random variation over the specified itations.
 
     """
-    frequency_mhz = frequency * 1e6
     if seed_value == None:
 
-        pass
+        generator = np.random
 
     else:
 
-        frequency_seed_value = seed_value * frequency_mhz * 100
-        np.random.seed(int(str(frequency_seed_value)[:2]))
+        generator = np.random.RandomState(fading_seed(frequency, seed_value))
+
+    normal_mean, normal_std = lognormal_parameters(mu, sigma)
+
+    random_variation  = generator.lognormal(normal_mean, normal_std, draws)
+
+    return random_variation
+
+
+def fading_seed(frequency, seed_value):
+    """
+    This is a helper function for deriving the random seed used for a given 
+    carrier frequency.
+
+    Parameters
+    ----------
+    frequency : float
+        Carrier frequency value in megahertz.
+    seed_value : int
+        Starting point for pseudo-random number generator.
+
+    Returns
+    -------
+    frequency_seed : int
+        Seed of the frequency.
+
+    """
+    frequency_mhz = frequency * 1e6
+    frequency_seed_value = seed_value * frequency_mhz * 100
+    frequency_seed = int(str(frequency_seed_value)[:2])
+
+
+    return frequency_seed
+
+
+def lognormal_parameters(mu, sigma):
+    """
+    This is a helper function for converting the mean and standard deviation 
+    of the desired distribution into those of the underlying normal 
+    distribution.
+
+    Parameters
+    ----------
+    mu : int
+        Mean of the desired distribution.
+    sigma : int
+        Standard deviation of the desired distribution.
+
+    Returns
+    -------
+    normal_mean, normal_std : float
+        Mean and standard deviation of the underlying normal distribution.
 
+    """
     normal_std = np.sqrt(np.log10(1 + (sigma/mu) ** 2))
     normal_mean = np.log10(mu) - normal_std ** 2 / 2
 
-    random_variation  = np.random.lognormal(normal_mean, normal_std, draws)
 
-    return random_variation
+    return normal_mean, normal_std
+
+
+class FadingVariateBank:
+
+    """
+    This class keeps one bank of lognormal fading variates for each frequency, 
+    distribution and seed, so each row only indexes into an existing bank 
+    instead of reseeding and drawing all values again. The UQ inputs only 
+    have a few such keys, but the oldest banks are dropped past maxsize so a 
+    long lived bank stays bounded.
+    """
+
+
+    def __init__(self, legacy_seeding = True, maxsize = 256):
+        """
+        A class constructor
+
+        Arguments
+        ---------
+        legacy_seeding : bool
+            If True, banks are drawn with the same seed as 
+            generate_log_normal_dist_value, so results are unchanged. 
+            Otherwise each bank has its own np.random.Generator stream keyed 
+            by the seed value and frequency.
+        maxsize : int
+            Maximum number of banks kept.
+        """
+        self.legacy_seeding = legacy_seeding
+        self.maxsize = maxsize
+        self.banks = {}
+
+
+    def variations(self, frequency, mu, sigma, seed_value, draws):
+        """
+        Function for returning the bank of variates of a frequency. Banks are 
+        read-only and generated deterministically, so they can be shared 
+        between threads and regenerated identically in other processes.
+
+        Arguments
+        ---------
+        frequency : float
+            Carrier frequency value in megahertz.
+        mu : int
+            Mean of the desired distribution.
+        sigma : int
+            Standard deviation of the desired distribution.
+        seed_value : int
+            Starting point for pseudo-random number generator.
+        draws : int
+            Number of required values.
+
+        Returns
+        -------
+        random_variation : array
+            Random variation components.
+        """
+        key = (float(frequency), float(mu), float(sigma), seed_value, 
+               int(draws))
+        bank = self.banks.get(key)
+
+        if bank is None:
+
+            bank = self.generate(*key)
+            bank.setflags(write = False)
+            bank = self.banks.setdefault(key, bank)
+
+            if len(self.banks) > self.maxsize:
+
+                self.banks.pop(next(iter(self.banks)), None)
+
+
+        return bank
+
+
+    def generate(self, frequency, mu, sigma, seed_value, draws):
+        """
+        Function for drawing a new bank of variates.
+        """
+        if self.legacy_seeding or seed_value is None:
+
+            return generate_log_normal_dist_value(frequency, mu, sigma, 
+                                                  seed_value, draws)
+
+        normal_mean, normal_std = lognormal_parameters(mu, sigma)
+        generator = np.random.default_rng([int(seed_value), 
+                                           int(round(frequency * 1e3))])
+
+
+        return generator.lognormal(normal_mean, normal_std, draws)
+
+
+    def lookup_array(self, frequency_mhz, mu, sigma, seed_value, draws, 
+                     iteration):
+        """
+        Function for selecting the random variation of each row in a batch.
+
+        Arguments
+        ---------
+        frequency_mhz, mu, sigma, seed_value, draws : array
+            Fading inputs of each row.
+        iteration : array
+            Iteration number of each row.
+
+        Returns
+        -------
+        random_variation : array
+            Random variation component of each row.
+        """
+        keys = np.column_stack((frequency_mhz, mu, sigma, seed_value, draws))
+        unique_keys, inverse = np.unique(keys, axis = 0, return_inverse = True)
+        inverse = inverse.reshape(-1)
+
+        random_variation = np.empty(len(keys))
+
+        for idx, (frequency, mu_value, sigma_value, seed, n) in enumerate(
+            unique_keys):
+
+            rows = inverse == idx
+            bank = self.variations(frequency, mu_value, sigma_value, int(seed), 
+                                   n)
+            random_variation[rows] = bank[iteration[rows]]
+
+
+        return random_variation
 
 
 def hk_rural_correction_model(frequency_mhz):
@@ -133,19 +309,19 @@ def hk_city_correction_model(frequency_mhz, user_antenna_m):
 
     Parameters
     ----------
-    frequency_mhz : float
+    frequency_mhz : float or array
         Transmission frequency in megahertz.
-    user_antenna_m : float
+    user_antenna_m : float or array
         User antenna height in meters
 
     Returns
     -------
-    correction_loss_db : float
+    correction_loss_db : float or array
         Correction path loss value in dB.
 
     """
-    first_term = ((1.1 * math.log10(frequency_mhz)) - 0.7) * user_antenna_m
-    second_term = (1.56 * math.log10(frequency_mhz)) - 0.8
+    first_term = ((1.1 * np.log10(frequency_mhz)) - 0.7) * user_antenna_m
+    second_term = (1.56 * np.log10(frequency_mhz)) - 0.8
     correction_loss_db = first_term - second_term
 
 
@@ -240,6 +416,75 @@ def calc_intersite_distance(interference_x, interference_y, transmitter_x,
     return intersite_distance
 
 
+def hata_terms(frequency_mhz, transmitter_height, user_antenna_m):
+    """
+    This is a helper function for calculating the distance independent terms 
+    of the Hata Okamura path loss model, so that 
+
+    path loss = intercept + slope * log10(distance) + random variation
+
+    Parameters
+    ----------
+    frequency_mhz : float or array
+        Transmission frequency in megahertz.
+    transmitter_height : float or array
+        Transmitter height in meters
+    user_antenna_m : float or array
+        User antenna height in meters
+
+    Returns
+    -------
+    intercept_db : float or array
+        Path loss terms that do not depend on the distance in dB.
+    slope_db : float or array
+        Multiplier of the log10 of the distance in dB.
+
+    """
+    first_term = 69.55 + (26.16 * np.log10(frequency_mhz))
+    second_term = 13.82 * np.log10(transmitter_height)
+    third_term = hk_city_correction_model(frequency_mhz, user_antenna_m)
+
+    intercept_db = first_term - second_term - third_term
+    slope_db = 44.9 - (6.55 * np.log10(transmitter_height))
+
+
+    return intercept_db, slope_db
+
+
+@functools.lru_cache(maxsize = 4096)
+def hata_scalar_terms(frequency_mhz, transmitter_height, user_antenna_m):
+    """
+    This is a helper function memoizing the distance independent Hata 
+    Okamura terms of one frequency and antenna height combination. These 
+    come from a few frequencies and integer heights, so most rows reuse an 
+    entry.
+
+    Parameters
+    ----------
+    frequency_mhz : float
+        Transmission frequency in megahertz.
+    transmitter_height : float
+        Transmitter height in meters
+    user_antenna_m : float
+        User antenna height in meters
+
+    Returns
+    -------
+    first_term, second_term, third_term, fifth_term : float
+        Frequency, transmitter height and city correction terms, and the 
+        multiplier of the log10 of the distance, in dB.
+
+    """
+    first_term = 69.55 + (26.16 * math.log10(frequency_mhz))
+    second_term = 13.82 * math.log10(transmitter_height)
+    third_term = ((((1.1 * math.log10(frequency_mhz)) - 0.7) * user_antenna_m)
+                  - ((1.56 * math.log10(frequency_mhz)) - 0.8))
+    fifth_term = 44.9 - (6.55 * math.log10(transmitter_height))
+
+
+    return first_term, second_term, third_term, fifth_term
+
+
 def hk_path_loss_model(frequency_mhz, transmitter_height, user_antenna_m, 
                        trans_user_dist_km, i, random_variations):
     """
@@ -267,10 +512,9 @@ def hk_path_loss_model(frequency_mhz, transmitter_height, user_antenna_m,
         Path loss value in dB.
 
     """
-    first_term = 69.55 + (26.16 * math.log10(frequency_mhz))
-    second_term = 13.82 * math.log10(transmitter_height)
-    third_term = hk_city_correction_model(frequency_mhz, user_antenna_m)
-    #fourth_term = math.log10(trans_user_dist_km)
+    first_term, second_term, third_term, fifth_term = hata_scalar_terms(
+        frequency_mhz, transmitter_height, user_antenna_m)
+
     if abs(trans_user_dist_km) > 0:
         
         fourth_term = math.log10(abs(trans_user_dist_km))
@@ -278,8 +522,6 @@ def hk_path_loss_model(frequency_mhz, transmitter_height, user_antenna_m,
     else:
         fourth_term = 1
 
-    fifth_term = 44.9 - (6.55 * math.log10(transmitter_height))
-
     interim_ans = fourth_term * fifth_term
     random_variation = random_variations[i]
 
@@ -467,6 +709,125 @@ def calc_interference(received_power, noise, ue_gain, ue_losses):
     return inteference
 
 
+def hex_site_layout(extent_km, spacing_km):
+    """
+    Generates a hexagonal layout of co-channel sites around a serving site
+    at the origin, in the same km frame as the UQ capacity rows.
+
+    Parameters
+    ----------
+    extent_km : float
+        Radius around the serving site covered by the layout in km.
+    spacing_km : float
+        Distance between neighbouring sites in km.
+
+    Returns
+    -------
+    site_x, site_y : array
+        Offsets of the sites from the serving site in km. The serving site
+        itself is at (0, 0).
+
+    """
+    dx = spacing_km
+    dy = spacing_km * 3**0.5 / 2
+    i = np.arange(-int(extent_km // dx) - 1, int(extent_km // dx) + 2)
+    j = np.arange(-int(extent_km // dy) - 1, int(extent_km // dy) + 2)
+    i, j = np.meshgrid(i, j, indexing = 'ij')
+
+    site_x = (i * dx + (j % 2) * dx / 2).ravel()
+    site_y = (j * dy).ravel()
+    inside = np.hypot(site_x, site_y) <= extent_km
+
+
+    return site_x[inside], site_y[inside]
+
+
+def nearest_interferers(site_x, site_y, receiver_x, receiver_y, 
+                        transmitter_x, transmitter_y, k):
+    """
+    Finds the k nearest co-channel sites of each receiver with a KD-tree over 
+    the site layout, leaving out the serving transmitter. Each receiver costs 
+    O(log N) for N sites.
+
+    Parameters
+    ----------
+    site_x, site_y : array
+        Coordinates of the co-channel sites (km).
+    receiver_x, receiver_y : array
+        Coordinates of the receivers (km).
+    transmitter_x, transmitter_y : array
+        Coordinates of the serving transmitter of each receiver (km).
+    k : int
+        Number of interfering sites.
+
+    Returns
+    -------
+    interference_user_distance : array
+        Distances to the k nearest interfering sites of each receiver in km, 
+        sorted from nearest. Missing sites have an infinite distance.
+
+    """
+    sites = np.column_stack((site_x, site_y))
+    receivers = np.column_stack((receiver_x, receiver_y))
+    n_query = min(k + 1, len(sites))
+
+    distances, idx = cKDTree(sites).query(receivers, k = n_query)
+    distances = distances.reshape(len(receivers), n_query)
+    idx = idx.reshape(len(receivers), n_query)
+
+    found = idx < len(sites)
+    idx = np.where(found, idx, 0)
+    serving = (np.isclose(sites[idx, 0], transmitter_x[:, None], rtol = 1e-12) 
+               & np.isclose(sites[idx, 1], transmitter_y[:, None], 
+                            rtol = 1e-12))
+    distances = np.where(found & ~serving, distances, np.inf)
+
+    interference_user_distance = np.sort(distances, axis = 1)[:, :k]
+
+    if interference_user_distance.shape[1] < k:
+
+        interference_user_distance = np.pad(interference_user_distance, 
+            ((0, 0), (0, k - interference_user_distance.shape[1])), 
+            constant_values = np.inf)
+
+
+    return interference_user_distance
+
+
+def calc_aggregate_interference(received_power, noise, ue_gain, ue_losses):
+    """
+    Calculate the noise from several interfering sites by summing their 
+    received powers in the linear domain.
+
+    Parameters
+    ----------
+    received_power : array
+        Received power of each interfering site in dB, with the sites along 
+        the last axis.
+    noise : float
+        Received noise power spectral density in dBm.
+    ue_gain : float
+        User equipment antenna gain in dBi
+    ue_losses : float
+        User equipment antenna losses in dBi
+
+    Returns
+    -------
+    inteference : float
+        Interefernce dB.
+
+    """
+    with np.errstate(divide = 'ignore'):
+
+        total_power_db = 10 * np.log10(np.sum(10 ** (received_power / 10), 
+                                              axis = -1))
+
+    inteference = calc_interference(total_power_db, noise, ue_gain, ue_losses)
+
+
+    return inteference
+
+
 def get_spectral_efficiency(lut, network_type, cnr_value):
     """
     Given a carrier-to-noise ratio, the function calculates the spectral 
@@ -510,6 +871,125 @@ def get_spectral_efficiency(lut, network_type, cnr_value):
     return None
 
 
+class SpectralEfficiencyTable:
+
+    """
+    This class holds the SINR to spectral efficiency lookup table as sorted 
+    arrays for each cellular generation, so it is built once and then queried 
+    with a binary search.
+    """
+
+
+    def __init__(self, lut, interpolate = False):
+        """
+        A class constructor
+
+        Arguments
+        ---------
+        lut : list of tuples
+            Lookup table for SINR to spectral efficiency.
+        interpolate : bool
+            If True, spectral efficiency is linearly interpolated between the 
+            table entries instead of taking the value of the lower entry.
+        """
+        self.interpolate = interpolate
+        self.tables = {}
+
+        for network_type in dict.fromkeys(entry[0] for entry in lut):
+
+            entries = sorted((entry[6], entry[5]) for entry in lut 
+                             if entry[0] == network_type)
+            sinr_values, efficiencies = zip(*entries)
+
+            self.tables[network_type] = (
+                np.array(sinr_values, dtype = float), 
+                np.array(efficiencies, dtype = float))
+
+
+    def lookup(self, network_type, sinr_db):
+        """
+        Function for finding the spectral efficiency of one or more SINR values. 
+        Values outside the table are clamped to the first or last entry.
+
+        Arguments
+        ---------
+        network_type : string or array
+            Cellular generation, either a single value or one per SINR value.
+        sinr_db : float or array
+            SINR values in dB.
+
+        Returns
+        -------
+        spectral_efficiency : float or array
+            The number of bits per Hertz able to be transmitted.
+        """
+        if np.ndim(sinr_db) == 0 and np.ndim(network_type) == 0:
+
+            return self.lookup_scalar(network_type, sinr_db)
+
+        sinr_db = np.asarray(sinr_db, dtype = float)
+
+        if np.ndim(network_type) == 0:
+
+            return self.lookup_array(network_type, sinr_db)
+
+        network_type = np.asarray(network_type)
+        spectral_efficiency = np.full(sinr_db.shape, np.nan)
+
+        for generation in np.unique(network_type):
+
+            rows = network_type == generation
+            spectral_efficiency[rows] = self.lookup_array(generation, 
+                                                          sinr_db[rows])
+
+
+        return spectral_efficiency
+
+
+    def lookup_scalar(self, network_type, sinr_db):
+        """
+        Function for finding the spectral efficiency of a single SINR value.
+        """
+        sinr_values, efficiencies = self.tables[network_type]
+
+        if sinr_db != sinr_db:
+
+            return np.nan
+
+        if self.interpolate:
+
+            return float(np.interp(sinr_db, sinr_values, efficiencies))
+
+        idx = bisect.bisect_right(sinr_values, sinr_db) - 1
+
+
+        return float(efficiencies[min(max(idx, 0), len(efficiencies) - 1)])
+
+
+    def lookup_array(self, network_type, sinr_db):
+        """
+        Function for finding the spectral efficiency of an array of SINR values 
+        from one cellular generation.
+        """
+        sinr_values, efficiencies = self.tables[network_type]
+
+        if self.interpolate:
+
+            spectral_efficiency = np.interp(sinr_db, sinr_values, efficiencies)
+
+        else:
+
+            idx = np.searchsorted(sinr_values, sinr_db, side = 'right') - 1
+            idx = np.clip(idx, 0, len(efficiencies) - 1)
+            spectral_efficiency = efficiencies[idx]
+
+        spectral_efficiency = np.where(np.isnan(sinr_db), np.nan, 
+                                       spectral_efficiency)
+
+
+        return spectral_efficiency
+
+
 def calc_maximum_distance(geometry):
 
     """
@@ -607,6 +1087,488 @@ def calc_area_capacity(capacity_mbps, site_area_sqkm):
     return capacity_mbps_km2
 
 
+def hk_path_loss_array(frequency_mhz, transmitter_height, user_antenna_m,
+                       trans_user_dist_km, random_variation, terms = None):
+    """
+    This is the array version of the Hata Okamura path loss model.
+
+    Parameters
+    ----------
+    frequency_mhz : array
+        Transmission frequency in megahertz.
+    transmitter_height : array
+        Transmitter height in meters
+    user_antenna_m : array
+        User antenna height in meters
+    trans_user_dist_km : array
+        Distance between the transmitter and the receiver in km.
+    random_variation : array
+        Random variation component of each row.
+    terms : tuple
+        Intercept and slope from hata_terms, if already calculated.
+
+    Returns
+    -------
+    path_loss_db : array
+        Path loss values in dB.
+
+    """
+    if terms is None:
+
+        terms = hata_terms(frequency_mhz, transmitter_height, user_antenna_m)
+
+    intercept_db, slope_db = terms
+
+    distance_km = np.abs(trans_user_dist_km)
+    fourth_term = np.ones(distance_km.shape)
+    np.log10(distance_km, out = fourth_term, where = distance_km > 0)
+
+    path_loss_db = intercept_db + fourth_term * slope_db + random_variation
+
+
+    return path_loss_db
+
+
+def capacity_batch(data, lut, fading = None, sites = None, interferers = 1):
+    """
+    This function runs the capacity model over a whole batch of UQ rows at
+    once.
+
+    Every input is handled as a NumPy array so path loss, received power,
+    noise, interference, SINR, spectral efficiency, capacity and area capacity
+    are computed in one vectorized pass, giving the same values as chaining
+    the scalar functions above row by row.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame or dict
+        Capacity inputs with the columns of uq_parameters_capacity.csv, either
+        as a dataframe or as a dictionary of arrays.
+    lut : list of tuples or SpectralEfficiencyTable
+        Lookup table for SINR to spectral efficiency.
+    fading : FadingVariateBank
+        Bank of fading variates to reuse across batches. A new bank is used 
+        if not given.
+    sites : pandas.DataFrame or dict
+        Co-channel site layout with site_x and site_y columns holding the km 
+        offsets of the sites from the serving site, such as the output of 
+        hex_site_layout, and optionally frequency_mhz. The layout is placed 
+        at the transmitter of each row, and the interference of each receiver 
+        is the sum of its nearest sites instead of the single 
+        interference_x/y site.
+    interferers : int
+        Number of nearest sites contributing interference when sites are 
+        given.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        Capacity results for each row, in the same order as the inputs.
+
+    """
+    frequency_mhz = np.asarray(data['frequency_MHz'], dtype = float)
+    transmitter_height_m = np.asarray(data['transmitter_height_m'],
+                                      dtype = float)
+    user_antenna_height_m = np.asarray(data['user_antenna_height_m'],
+                                       dtype = float)
+    transmitter_x = np.asarray(data['transmitter_x'], dtype = float)
+    transmitter_y = np.asarray(data['transmitter_y'], dtype = float)
+    receiver_x = np.asarray(data['receiver_x'], dtype = float)
+    receiver_y = np.asarray(data['receiver_y'], dtype = float)
+    interference_x = np.asarray(data['interference_x'], dtype = float)
+    interference_y = np.asarray(data['interference_y'], dtype = float)
+    iteration = np.asarray(data['iteration'], dtype = int)
+
+    if not isinstance(lut, SpectralEfficiencyTable):
+
+        lut = SpectralEfficiencyTable(lut)
+
+    if fading is None:
+
+        fading = FadingVariateBank()
+
+    random_variation = fading.lookup_array(frequency_mhz, 
+        np.asarray(data['mu']), np.asarray(data['sigma']),
+        np.asarray(data['seed_value']), np.asarray(data['draws']), iteration)
+
+    # Terms depending on the frequency only are evaluated once per frequency
+    frequencies, inverse = np.unique(frequency_mhz, return_inverse = True)
+    inverse = inverse.reshape(-1)
+    cell_generations = [system_type(frequency) for frequency in frequencies]
+
+    cell_generation = np.array(cell_generations)[inverse]
+    channel_bandwidth_mhz = np.array([bandwidth(generation) for generation
+                                      in cell_generations])[inverse]
+    noise_db = np.array([calc_noise(frequency, bandwidth(generation)) for
+                         frequency, generation in zip(frequencies,
+                         cell_generations)])[inverse]
+    hk_rural_correction_db = np.array([hk_rural_correction_model(frequency)
+                                       for frequency in frequencies])[inverse]
+
+    hk_city_correction_db = hk_city_correction_model(frequency_mhz, 
+                                                     user_antenna_height_m)
+
+    intersite_distance_km = np.hypot(receiver_x - transmitter_x,
+                                     receiver_y - transmitter_y)
+
+    if sites is None:
+
+        interference_distances_km = np.hypot(receiver_x - interference_x,
+                                    receiver_y - interference_y)[:, None]
+
+    else:
+
+        interference_distances_km = np.full((len(frequency_mhz), interferers), 
+                                            np.inf)
+        site_x = np.asarray(sites['site_x'], dtype = float)
+        site_y = np.asarray(sites['site_y'], dtype = float)
+        origin = np.zeros(len(frequency_mhz))
+
+        for frequency in frequencies:
+
+            rows = frequency_mhz == frequency
+
+            if 'frequency_mhz' in sites:
+
+                co_channel = np.asarray(sites['frequency_mhz']) == frequency
+
+            else:
+
+                co_channel = np.ones(len(site_x), dtype = bool)
+
+            if co_channel.any():
+
+                # Receivers are positioned relative to their serving site
+                interference_distances_km[rows] = nearest_interferers(
+                    site_x[co_channel], site_y[co_channel], 
+                    receiver_x[rows] - transmitter_x[rows], 
+                    receiver_y[rows] - transmitter_y[rows], origin[rows], 
+                    origin[rows], interferers)
+
+    interference_signal_path_km = interference_distances_km[:, 0]
+
+    terms = hata_terms(frequency_mhz, transmitter_height_m, 
+                       user_antenna_height_m)
+
+    path_loss_db = hk_path_loss_array(frequency_mhz, transmitter_height_m,
+                    user_antenna_height_m, intersite_distance_km,
+                    random_variation, terms)
+    int_path_loss_db = hk_path_loss_array(frequency_mhz[:, None], 
+                    transmitter_height_m[:, None], 
+                    user_antenna_height_m[:, None], interference_distances_km, 
+                    random_variation[:, None], 
+                    (terms[0][:, None], terms[1][:, None]))
+
+    transmitter_power_dbm = np.asarray(data['transmitter_power_dbm'])
+    trans_antenna_gain_dbi = np.asarray(data['trans_antenna_gain_dbi'])
+    shadow_fading_db = np.asarray(data['shadow_fading_db'])
+    building_penetration_loss_db = np.asarray(
+        data['building_penetration_loss_db'])
+    user_antenna_gain_dbi = np.asarray(data['user_antenna_gain_dbi'])
+    user_antenna_loss_db = np.asarray(data['user_antenna_loss_db'])
+
+    received_power_db = calc_power_received(transmitter_power_dbm,
+                    trans_antenna_gain_dbi, path_loss_db, shadow_fading_db,
+                    building_penetration_loss_db)
+    int_received_power_db = calc_power_received(
+                    transmitter_power_dbm[:, None], 
+                    trans_antenna_gain_dbi[:, None], int_path_loss_db, 
+                    shadow_fading_db[:, None], 
+                    building_penetration_loss_db[:, None])
+
+    if sites is None:
+
+        interference_db = calc_interference(int_received_power_db[:, 0], 
+                    noise_db, user_antenna_gain_dbi, user_antenna_loss_db)
+
+    else:
+
+        interference_db = calc_aggregate_interference(int_received_power_db, 
+                    noise_db, user_antenna_gain_dbi, user_antenna_loss_db)
+
+    int_path_loss_db = int_path_loss_db[:, 0]
+    sinr_db = calc_sinr(received_power_db, noise_db, user_antenna_gain_dbi,
+                    user_antenna_loss_db, interference_db)
+
+    spectral_efficiency_bpshz = lut.lookup(cell_generation, sinr_db)
+
+    capacity_mbps = calc_capacity(spectral_efficiency_bpshz,
+                    channel_bandwidth_mhz, np.asarray(data['antenna_sectors'])
+                    ) * 3
+
+    with np.errstate(divide = 'ignore'):
+
+        site_area_sqkm = calc_site_area(intersite_distance_km)
+
+    capacity_mbps_km2 = calc_area_capacity(capacity_mbps, site_area_sqkm)
+
+    results = pd.DataFrame({
+        'transmitter_x' : transmitter_x,
+        'transmitter_y' : transmitter_y,
+        'receiver_x' : receiver_x,
+        'receiver_y' : receiver_y,
+        'cell_generation' : cell_generation,
+        'frequency_mhz' : np.asarray(data['frequency_MHz']),
+        'intersite_distance_km' : intersite_distance_km,
+        'interference_signal_path_km' : interference_signal_path_km,
+        'hk_rural_correction_db' : hk_rural_correction_db,
+        'hk_city_correction_db' : hk_city_correction_db,
+        'path_loss_db' : path_loss_db,
+        'int_path_loss_db' : int_path_loss_db,
+        'received_power_db' : received_power_db,
+        'noise_db' : noise_db,
+        'interference_db' : interference_db,
+        'sinr_db' : sinr_db,
+        'spectral_efficiency_bpshz' : spectral_efficiency_bpshz,
+        'capacity_mbps' : capacity_mbps,
+        'site_area_sqkm' : site_area_sqkm,
+        'capacity_mbps_km2' : capacity_mbps_km2,
+        'mean_monthly_demand_GB' : np.asarray(data['mean_monthly_demand_GB']),
+        'traffic_busy_hour' : np.asarray(data['traffic_busy_hour']),
+        'channel_bandwidth_mhz' : channel_bandwidth_mhz,
+        'smartphone_penetration' : np.asarray(data['smartphone_penetration']),
+        'decile' : np.asarray(data['decile'])
+    })
+
+
+    return results
+
+
+def capacity_grid(grid_x, grid_y, transmitters, params, lut, 
+                  random_variation = 0):
+    """
+    This function evaluates the capacity model on a full 2-D grid of 
+    receivers around one or more transmitters by broadcasting, instead of 
+    running each receiver point through the model.
+
+    Each pixel is served by the transmitter with the strongest received 
+    power, and the other transmitters are summed as interference. With a 
+    single transmitter there is no interference term.
+
+    Parameters
+    ----------
+    grid_x : array
+        x coordinates of the pixel centres in meters (EPSG:3857).
+    grid_y : array
+        y coordinates of the pixel centres in meters (EPSG:3857).
+    transmitters : array
+        x and y coordinates of each transmitter in meters (EPSG:3857).
+    params : dict
+        Radio parameters with the same keys as the capacity UQ inputs, i.e. 
+        frequency_MHz, transmitter_height_m, user_antenna_height_m, 
+        transmitter_power_dbm, trans_antenna_gain_dbi, shadow_fading_db, 
+        building_penetration_loss_db, user_antenna_gain_dbi, 
+        user_antenna_loss_db and antenna_sectors.
+    lut : list of tuples or SpectralEfficiencyTable
+        Lookup table for SINR to spectral efficiency.
+    random_variation : float
+        Random variation component added to the path loss in dB.
+
+    Returns
+    -------
+    grids : dict
+        2-D arrays of intersite_distance_km, path_loss_db, received_power_db, 
+        interference_db, sinr_db, spectral_efficiency_bpshz, capacity_mbps 
+        and capacity_mbps_km2, with rows following grid_y.
+
+    """
+    if not isinstance(lut, SpectralEfficiencyTable):
+
+        lut = SpectralEfficiencyTable(lut)
+
+    frequency_mhz = params['frequency_MHz']
+    cell_generation = system_type(frequency_mhz)
+    channel_bandwidth_mhz = bandwidth(cell_generation)
+    noise_db = calc_noise(frequency_mhz, channel_bandwidth_mhz)
+    terms = hata_terms(frequency_mhz, params['transmitter_height_m'], 
+                       params['user_antenna_height_m'])
+
+    transmitters = np.asarray(transmitters, dtype = float).reshape(-1, 2)
+    grid_xx, grid_yy = np.meshgrid(np.asarray(grid_x, dtype = float), 
+                                   np.asarray(grid_y, dtype = float))
+
+    # One layer per transmitter: (transmitters, rows, columns)
+    distance_km = np.hypot(
+        grid_xx[None] - transmitters[:, 0, None, None], 
+        grid_yy[None] - transmitters[:, 1, None, None]) / 1000
+
+    path_loss_db = hk_path_loss_array(frequency_mhz, 
+                    params['transmitter_height_m'], 
+                    params['user_antenna_height_m'], distance_km, 
+                    random_variation, terms)
+
+    received_power_db = calc_power_received(params['transmitter_power_dbm'], 
+                    params['trans_antenna_gain_dbi'], path_loss_db, 
+                    params['shadow_fading_db'], 
+                    params['building_penetration_loss_db'])
+
+    serving = np.argmax(received_power_db, axis = 0)[None]
+
+    if len(transmitters) > 1:
+
+        interferer_power_db = received_power_db.copy()
+        np.put_along_axis(interferer_power_db, serving, -np.inf, axis = 0)
+        interference_db = calc_aggregate_interference(
+                    np.moveaxis(interferer_power_db, 0, -1), noise_db, 
+                    params['user_antenna_gain_dbi'], 
+                    params['user_antenna_loss_db'])
+
+    else:
+
+        interference_db = np.zeros(grid_xx.shape)
+
+    intersite_distance_km = np.take_along_axis(distance_km, serving, 
+                                               axis = 0)[0]
+    path_loss_db = np.take_along_axis(path_loss_db, serving, axis = 0)[0]
+    received_power_db = np.take_along_axis(received_power_db, serving, 
+                                           axis = 0)[0]
+
+    sinr_db = calc_sinr(received_power_db, noise_db, 
+                        params['user_antenna_gain_dbi'], 
+                        params['user_antenna_loss_db'], interference_db)
+
+    spectral_efficiency_bpshz = lut.lookup(cell_generation, sinr_db)
+
+    capacity_mbps = calc_capacity(spectral_efficiency_bpshz, 
+                    channel_bandwidth_mhz, params['antenna_sectors']) * 3
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+
+        site_area_sqkm = calc_site_area(intersite_distance_km)
+        capacity_mbps_km2 = calc_area_capacity(capacity_mbps, site_area_sqkm)
+
+    grids = {
+        'intersite_distance_km' : intersite_distance_km,
+        'path_loss_db' : path_loss_db,
+        'received_power_db' : received_power_db,
+        'interference_db' : interference_db,
+        'sinr_db' : sinr_db,
+        'spectral_efficiency_bpshz' : spectral_efficiency_bpshz,
+        'capacity_mbps' : capacity_mbps,
+        'capacity_mbps_km2' : capacity_mbps_km2
+    }
+
+
+    return grids
+
+
+DIMENSION_COLUMNS = ['cell_generation', 'frequency_mhz', 'channel_bandwidth_mhz',
+                     'intersite_distance_km', 'spectral_efficiency_bpshz',
+                     'capacity_mbps', 'site_area_sqkm', 'capacity_mbps_km2',
+                     'mean_monthly_demand_GB', 'traffic_busy_hour',
+                     'smartphone_penetration', 'decile']
+
+
+def network_demand(capacity, decile_stats, demand_gb = 30):
+    """
+    Calculate the traffic demand and the number of sites required to serve
+    it for every capacity result.
+
+    Parameters
+    ----------
+    capacity : pandas.DataFrame
+        Capacity model results, such as the output of capacity_batch merged
+        with the decile mobile data.
+    decile_stats : pandas.DataFrame
+        Mean unconnected population (mean_decile_population) and mean area
+        (mean_decile_area) of each decile.
+    demand_gb : float
+        Monthly demand in GB of the results kept. All results are kept if
+        None.
+
+    Returns
+    -------
+    demand : pandas.DataFrame
+        Capacity results with the user demand and required sites.
+
+    """
+    if demand_gb is not None:
+
+        capacity = capacity[capacity['mean_monthly_demand_GB'] == demand_gb]
+
+    df = pd.merge(capacity[DIMENSION_COLUMNS], decile_stats, on = 'decile',
+                  how = 'inner')
+
+    df['average_user_demand_mbps'] = user_demand(df['mean_monthly_demand_GB'],
+                    df['traffic_busy_hour'], df['smartphone_penetration'],
+                    df['mean_decile_population'], df['mean_decile_area'])
+    df['required_mbps'] = (df['average_user_demand_mbps']
+                           * df['mean_decile_population'])
+    df['no_of_required_sites'] = df['required_mbps'] / df['capacity_mbps_km2']
+    df['average_user_capacity_mbps'] = (df['required_mbps']
+                                        / df['mean_decile_population'])
+
+
+    return df
+
+
+def required_sites(demand, generation_ratio = 1.5):
+    """
+    Calculate the number of sites required in each decile, cell generation
+    and channel bandwidth. 5G needs generation_ratio times the sites of the
+    first 4G bandwidth of the same decile.
+
+    Parameters
+    ----------
+    demand : pandas.DataFrame
+        Output of network_demand.
+    generation_ratio : float
+        Ratio of the 5G to the 4G sites.
+
+    Returns
+    -------
+    sites : pandas.DataFrame
+        Number of required sites of each decile, cell generation and
+        channel bandwidth.
+
+    """
+    sites = demand.groupby(['decile', 'cell_generation',
+                            'channel_bandwidth_mhz']).agg(no_of_required_sites
+                            = ('no_of_required_sites', 'sum')).reset_index()
+
+    sites_4g = sites[sites['cell_generation'] == '4G'].drop_duplicates(
+        'decile').set_index('decile')['no_of_required_sites']
+
+    is_5g = sites['cell_generation'] == '5G'
+    sites.loc[is_5g, 'no_of_required_sites'] = (sites.loc[is_5g, 'decile']
+        .map(sites_4g * generation_ratio)
+        .fillna(sites.loc[is_5g, 'no_of_required_sites']))
+
+    sites['no_of_required_sites'] = (sites['no_of_required_sites'].round()
+                                     .astype(int))
+
+
+    return sites
+
+
+def dimension_network(capacity, decile_stats, demand_gb = 30,
+                      generation_ratio = 1.5):
+    """
+    Calculate the number of sites required in each decile, cell generation
+    and channel bandwidth from in-memory capacity results.
+
+    Parameters
+    ----------
+    capacity : pandas.DataFrame
+        Capacity model results.
+    decile_stats : pandas.DataFrame
+        Mean unconnected population and area of each decile.
+    demand_gb : float
+        Monthly demand in GB the network is dimensioned for.
+    generation_ratio : float
+        Ratio of the 5G to the 4G sites.
+
+    Returns
+    -------
+    sites : pandas.DataFrame
+        Number of required sites.
+
+    """
+
+    return required_sites(network_demand(capacity, decile_stats, demand_gb),
+                          generation_ratio)
+
+
 ############################
 ######## COST MODEL ########
 ############################
@@ -753,6 +1715,48 @@ def opex_cost(site_rental, base_station_energy, staff_costs, antenna_upgrade,
     return annual_opex
 
 
+def discount_factor(discount_rate, assessment_period):
+    """
+    This function calculates the factor turning an annual operating cost into 
+    its discounted total over the assessment period, with the first year 
+    undiscounted and year t discounted by (1 + r)^t.
+
+    The geometric sum is evaluated in closed form, once for each distinct 
+    pair of discount rate and assessment period.
+
+    Parameters
+    ----------
+    discount_rate : float or array
+        Discount rate in percent.
+    assessment_period : int or array
+        Assessment period in years.
+
+    Returns
+    -------
+    factor : float or array
+        Discount factor of each row.
+
+    """
+    pairs = np.broadcast_arrays(np.asarray(discount_rate, dtype = float), 
+                                np.asarray(assessment_period, dtype = float))
+    shape = pairs[0].shape
+    keys = np.column_stack([pair.reshape(-1) for pair in pairs])
+    unique_keys, inverse = np.unique(keys, axis = 0, return_inverse = True)
+
+    rate = unique_keys[:, 0] / 100
+    years = np.maximum(np.ceil(unique_keys[:, 1]) - 1, 0)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+
+        annuity = np.where(rate == 0, years, 
+                           (1 - (1 + rate) ** -years) / rate)
+
+    factor = (1 + annuity)[inverse.reshape(-1)].reshape(shape)
+
+
+    return factor if shape else factor.item()
+
+
 def total_cost_ownership(total_capex, total_opex, discount_rate, 
                          assessment_period):
     """
@@ -775,18 +1779,86 @@ def total_cost_ownership(total_capex, total_opex, discount_rate,
             The total cost of ownership.
 
     """
+    total_cost_ownership = total_capex + total_opex * discount_factor(
+        discount_rate, assessment_period)
 
-    year_costs = []
 
-    for time in np.arange(1, assessment_period):  
+    return total_cost_ownership
 
-        yearly_opex = total_opex / (((discount_rate / 100) + 1) ** time)
-        year_costs.append(yearly_opex)
 
-    total_cost_ownership = total_capex + sum(year_costs) + total_opex
+def cost_batch(data):
+    """
+    This function runs the cost model over a whole batch of UQ rows at once.
 
+    Equipment, spectrum, capital and operating costs are computed on whole 
+    arrays and the total cost of ownership uses one discount factor per 
+    discount rate and assessment period, giving the same values as chaining 
+    the scalar functions above row by row.
 
-    return total_cost_ownership
+    Parameters
+    ----------
+    data : pandas.DataFrame or dict
+        Cost inputs with the columns of uq_parameters_cost.csv, either as a 
+        dataframe or as a dictionary of arrays.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        Cost results for each row, in the same order as the inputs.
+
+    """
+    def column(name):
+
+        return np.asarray(data[name])
+
+    equipment_cost_usd = equipment_cost(column('sector_antenna_usd'),
+        column('remote_radio_unit_usd'), column('io_fronthaul_usd'),
+        column('control_unit_usd'), column('cooling_fans_usd'), 
+        column('battery_power_usd'), column('bbu_cabinet_usd'), 
+        column('tower_usd'), column('civil_materials_usd'), 
+        column('router_usd'))
+
+    spectrum_cost_usd = spectrum_cost(column('channel_bandwidth_mhz'), 
+        column('mean_poor_connected'), column('mhz_per_pop_usd'))
+
+    capex_cost_usd = capex_cost(equipment_cost_usd, spectrum_cost_usd,
+        column('installation_usd'), column('transportation_usd'))
+
+    opex_cost_usd = opex_cost(column('site_rental_usd'), 
+        column('base_station_energy_usd'), column('staff_costs_usd'), 
+        column('sector_antenna_usd'), column('remote_radio_unit_usd'), 
+        column('bbu_cabinet_usd'), column('router_usd'), 
+        column('fiber_link_usd'))
+
+    total_base_station_tco_usd = total_cost_ownership(capex_cost_usd, 
+        opex_cost_usd, column('discount_rate'), column('assessment_years'))
+
+    results = pd.DataFrame({
+        'cell_generation': column('cell_generation'),
+        'frequency_mhz': column('channel_bandwidth_mhz'),
+        'equipment_cost_usd': equipment_cost_usd,
+        'spectrum_cost_usd': spectrum_cost_usd,
+        'capex_cost_usd': capex_cost_usd,
+        'opex_cost_usd': opex_cost_usd,
+        'total_base_station_tco_usd': total_base_station_tco_usd,
+        'total_decile_tco_usd' : (total_base_station_tco_usd 
+                                  * column('no_of_required_sites')),
+        'total_poor_unconnected' : column('total_poor_unconnected'),
+        'mean_area_sqkm': column('mean_area_sqkm'),
+        'mean_poor_connected': column('mean_poor_connected'),
+        'total_area_sqkm' : column('total_area_sqkm'),
+        'cost_per_1GB_usd': column('cost_per_1GB_usd'),
+        'monthly_income_usd': column('monthly_income_usd'),
+        'cost_per_month_usd': column('cost_per_month_usd'),
+        'arpu_usd': column('arpu_usd'),
+        'assessment_years': column('assessment_years'),
+        'adoption_rate' : column('adoption_rate'),
+        'existing_tower_no' : column('existing_tower_no'),
+        'number_of_sites' : column('no_of_required_sites'),
+        'decile': column('decile')})
+
+
+    return results
 
 
 #################################
@@ -1132,6 +2204,215 @@ def phase_emission_ghg(cell_generation, emission_type_value, number_of_sites):
     return phase_emission_kg
 
 
+LCA_MATERIALS = ['bbu_rru_pcb_kg', 'bbu_rru_aluminium_kg', 'copper_antenna_kg', 
+                 'aluminium_antenna_kg', 'pvc_antenna_kg', 'iron_antenna_kg', 
+                 'steel_antenna_kg', 'steel_tower_kg', 'aluminium_frame_kg', 
+                 'steel_pole_kg', 'machine_concrete_kg', 'machine_steel_kg', 
+                 'basic_aluminium_device_kg']
+
+LCA_FACTORS = ['pcb_kg_co2e', 'aluminium_kg_co2e', 'copper_kg_co2e', 
+               'pvc_kg_co2e', 'iron_kg_co2e', 'steel_kg_co2e', 
+               'concrete_kg_co2e', 'metals_factor_kgco2e', 
+               'plastics_factor_kgco2e']
+
+LCA_SUBTOTALS = ['aluminium_mfg_ghg_kg', 'steel_iron_mfg_ghg_kg', 
+                 'concrete_mfg_ghg_kg', 'plastics_mfg_ghg_kg', 
+                 'other_metals_mfg_ghg_kg', 'aluminium_eolt_ghg', 
+                 'steel_iron_eolt_ghg', 'plastics_eolt_ghg', 
+                 'other_metals_eolt_ghg']
+
+
+def emission_factor_matrix(factors):
+    """
+    This function builds the matrix mapping the material masses of a base 
+    station onto the manufacturing and end-of-life treatment emissions of 
+    each material group, as in lca_manufacturing and lca_eolt.
+
+    Parameters
+    ----------
+    factors : dict
+        Carbon emission factors keyed by the names in LCA_FACTORS.
+
+    Returns
+    -------
+    matrix : numpy.ndarray
+        Factor matrix with one row per material in LCA_MATERIALS and one 
+        column per subtotal in LCA_SUBTOTALS.
+
+    """
+    pcb, alu, cu, pvc, fe, steel, concrete, metals, plastics = [
+        factors[key] for key in LCA_FACTORS]
+
+    # Material group and factor of each material in the manufacturing and 
+    # end-of-life phases. Concrete is not treated at end of life.
+    groups = [
+        ('plastics', pcb, 'plastics', plastics),
+        ('aluminium', alu, 'aluminium', metals),
+        ('other_metals', cu, 'other_metals', metals),
+        ('aluminium', alu, 'aluminium', metals),
+        ('plastics', pvc, 'plastics', plastics),
+        ('steel_iron', fe, 'steel_iron', metals),
+        ('steel_iron', steel, 'steel_iron', metals),
+        ('steel_iron', steel, 'steel_iron', metals),
+        ('aluminium', alu, 'aluminium', metals),
+        ('steel_iron', steel, 'steel_iron', metals),
+        ('concrete', concrete, None, 0),
+        ('steel_iron', steel, 'steel_iron', metals),
+        ('aluminium', alu, 'aluminium', metals),
+    ]
+
+    matrix = np.zeros((len(LCA_MATERIALS), len(LCA_SUBTOTALS)))
+
+    for row, (mfg_group, mfg_factor, eolt_group, eolt_factor) in enumerate(
+        groups):
+
+        matrix[row, LCA_SUBTOTALS.index(mfg_group + '_mfg_ghg_kg')] = mfg_factor
+
+        if eolt_group is not None:
+
+            matrix[row, LCA_SUBTOTALS.index(eolt_group + '_eolt_ghg')] = (
+                eolt_factor)
+
+
+    return matrix
+
+
+def material_emissions(masses, factors):
+    """
+    This function calculates the manufacturing and end-of-life treatment 
+    emissions of every material group for a batch of base stations.
+
+    Rows sharing the same carbon factors are multiplied by one factor matrix, 
+    so a batch with constant factors takes a single matrix product.
+
+    Parameters
+    ----------
+    masses : numpy.ndarray
+        Material masses with one row per base station and one column per 
+        material in LCA_MATERIALS.
+    factors : numpy.ndarray
+        Carbon emission factors with one row per base station and one column 
+        per factor in LCA_FACTORS.
+
+    Returns
+    -------
+    subtotals : numpy.ndarray
+        Emissions with one column per subtotal in LCA_SUBTOTALS.
+
+    """
+    unique_factors, inverse = np.unique(factors, axis = 0, 
+                                        return_inverse = True)
+    inverse = inverse.reshape(-1)
+
+    if len(unique_factors) == 1:
+
+        return masses @ emission_factor_matrix(dict(zip(LCA_FACTORS, 
+                                               unique_factors[0])))
+
+    subtotals = np.empty((len(masses), len(LCA_SUBTOTALS)))
+
+    for idx, values in enumerate(unique_factors):
+
+        rows = inverse == idx
+        subtotals[rows] = masses[rows] @ emission_factor_matrix(dict(zip(
+            LCA_FACTORS, values)))
+
+
+    return subtotals
+
+
+def emission_batch(data, factors = None):
+    """
+    This function runs the emissions model over a whole batch of UQ rows at 
+    once.
+
+    The material subtotals of the manufacturing and end-of-life treatment 
+    phases come out of one product of the material masses with the factor 
+    matrix. Transportation, construction and operations are computed on 
+    whole arrays. The values are the same as chaining the lca_* functions 
+    row by row.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame or dict
+        Emission inputs with the columns of uq_parameters_emission.csv and 
+        number_epc_centers, either as a dataframe or as a dictionary of 
+        arrays.
+    factors : dict
+        Carbon emission factors keyed by the names in LCA_FACTORS, such as 
+        carbon_factors['mfg_emissions'] in mobile_inputs. These replace the 
+        factor columns of the inputs. Factors not given are read from the 
+        inputs.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        Emission results for each row, in the same order as the inputs.
+
+    """
+    def column(name):
+
+        return np.asarray(data[name])
+
+    factors = factors or {}
+    length = len(column('decile'))
+
+    masses = np.column_stack([column(name).astype(float) for name in 
+                              LCA_MATERIALS])
+    factor_values = np.column_stack([np.full(length, factors[name], 
+        dtype = float) if name in factors else column(name).astype(float) 
+        for name in LCA_FACTORS])
+
+    subtotals = material_emissions(masses, factor_values)
+    sites = column('no_of_required_sites')
+
+    total_mfg_ghg = subtotals[:, :5].sum(axis = 1) * sites
+
+    total_trans_ghg_kg = ((column('maritime_km') 
+        * column('container_ship_kgco2e') + column('mean_distance_km') 
+        * column('consumption_lt_per_km') * column('diesel_factor_kgco2e')) 
+        * sites)
+
+    total_construction_ghg = (column('machine_fuel_eff_lt_per_hr') 
+        * column('machine_operation_hrs') * column('diesel_factor_kgco2e') 
+        * sites)
+
+    users = column('mean_poor_connected')
+    total_power_kwh = (column('smartphone_kwh') * users 
+        + column('ict_kwh') * users * 0.3 
+        + (column('base_band_unit_kwh') + column('radio_frequency_kwh')) 
+        * sites + column('epc_center_kwh') * column('number_epc_centers'))
+    total_operations_ghg = (total_power_kwh * column('electricity_kg_co2e') 
+                            * sites)
+
+    total_eolt_ghg = subtotals[:, 5:].sum(axis = 1) * sites
+
+    total_emissions_ghg_kg = (total_mfg_ghg + total_trans_ghg_kg 
+        + total_construction_ghg + total_operations_ghg + total_eolt_ghg)
+
+    results = pd.DataFrame({'cell_generation': column('cell_generation')})
+
+    for idx, name in enumerate(LCA_SUBTOTALS):
+
+        results[name] = subtotals[:, idx]
+
+    results['total_mfg_ghg'] = total_mfg_ghg
+    results['total_trans_ghg_kg'] = total_trans_ghg_kg
+    results['total_construction_ghg_kg'] = total_construction_ghg
+    results['total_operations_ghg_kg'] = total_operations_ghg
+    results['total_eolt_ghg_kg'] = total_eolt_ghg
+    results['total_emissions_ghg_kg'] = total_emissions_ghg_kg
+
+    for name in ['total_population', 'total_poor_unconnected', 
+                 'mean_poor_connected', 'social_carbon_cost_usd', 
+                 'no_of_required_sites', 'assessment_period', 'decile']:
+
+        results[name] = column(name)
+
+
+    return results
+
+
 def maritime_distance(iso3, maritime_dict):
     """
     This function calculates the distance between the origin Port of China and 
@@ -0,0 +1,287 @@
+"""
+Chunked process-pool execution of the mobile broadband model.
+
+Developed by Bonface Osoro and Ed Oughton.
+
+September 2024
+
+"""
+import multiprocessing
+import os
+import threading
+import numpy as np
+import pandas as pd
+from collections import deque
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+
+
+def attach_shared_memory(name):
+    """
+    This is a helper function for attaching to an existing shared memory 
+    block from a worker. The parent process owns and unlinks the block, so the 
+    worker does not track it where Python allows it. Otherwise the pool 
+    workers share the resource tracker of the parent, which registers each 
+    block only once.
+
+    Parameters
+    ----------
+    name : string
+        Name of the shared memory block.
+
+    Returns
+    -------
+    shm : SharedMemory
+        Attached shared memory block.
+
+    """
+    try:
+
+        shm = shared_memory.SharedMemory(name = name, track = False)
+
+    except TypeError:
+
+        shm = shared_memory.SharedMemory(name = name)
+
+
+    return shm
+
+
+class SharedFrame:
+
+    """
+    This class copies the columns of a dataframe into shared memory blocks, so
+    worker processes can read any contiguous slice of rows without the frame
+    being pickled. Text columns are stored as categorical codes.
+    """
+
+
+    def __init__(self, df):
+        """
+        A class constructor
+
+        Arguments
+        ---------
+        df : pandas.DataFrame
+            Dataframe to be shared.
+        """
+        self.length = len(df)
+        self.blocks = []
+        self.columns = []
+
+        for column in df.columns:
+
+            values = df[column]
+            categories = None
+
+            if not pd.api.types.is_numeric_dtype(values):
+
+                codes, uniques = pd.factorize(values)
+                values = codes
+                categories = list(uniques)
+
+            values = np.ascontiguousarray(values)
+            shm = shared_memory.SharedMemory(create = True,
+                                             size = max(values.nbytes, 1))
+            shared = np.ndarray(values.shape, dtype = values.dtype,
+                                buffer = shm.buf)
+            shared[:] = values
+
+            self.blocks.append(shm)
+            self.columns.append((column, shm.name, values.dtype.str,
+                                 categories))
+
+
+    def descriptor(self):
+        """
+        Function for returning the picklable description of the shared
+        columns that is sent to the workers.
+        """
+
+        return self.length, self.columns
+
+
+    def close(self):
+        """
+        Function for releasing and unlinking all the shared memory blocks.
+        """
+        for shm in self.blocks:
+
+            shm.close()
+            shm.unlink()
+
+        self.blocks = []
+
+
+    def __enter__(self):
+
+        return self
+
+
+    def __exit__(self, *args):
+
+        self.close()
+
+
+def read_shared_chunk(descriptor, start, stop):
+    """
+    This function rebuilds rows start to stop of a shared dataframe inside a
+    worker process.
+
+    Parameters
+    ----------
+    descriptor : tuple
+        Shared frame description from SharedFrame.descriptor.
+    start, stop : int
+        Row range of the chunk.
+
+    Returns
+    -------
+    chunk : pandas.DataFrame
+        Copy of the requested rows.
+
+    """
+    length, columns = descriptor
+    data = {}
+
+    for column, name, dtype, categories in columns:
+
+        shm = attach_shared_memory(name)
+        shared = np.ndarray((length,), dtype = np.dtype(dtype),
+                            buffer = shm.buf)
+        values = np.array(shared[start:stop])
+
+        del shared
+        shm.close()
+
+        if categories is not None:
+
+            # Missing values are coded as -1, which picks the trailing NaN
+            values = np.asarray(categories + [np.nan], dtype = object)[values]
+
+        data[column] = values
+
+
+    return pd.DataFrame(data, index = pd.RangeIndex(start, stop))
+
+
+def process_shared_chunk(func, descriptor, start, stop):
+    """
+    This is the worker function evaluating func on one chunk of a shared
+    dataframe.
+    """
+    chunk = read_shared_chunk(descriptor, start, stop)
+
+
+    return func(chunk)
+
+
+def chunk_bounds(length, chunk_size):
+    """
+    This function splits a number of rows into contiguous chunks.
+
+    Parameters
+    ----------
+    length : int
+        Number of rows.
+    chunk_size : int
+        Maximum number of rows in each chunk.
+
+    Returns
+    -------
+    bounds : list of tuples
+        Start and stop row of each chunk.
+
+    """
+    chunk_size = max(int(chunk_size), 1)
+
+
+    return [(start, min(start + chunk_size, length)) for start in
+            range(0, length, chunk_size)]
+
+
+def map_chunks(df, func, workers = None, chunk_size = 100000, desc = None,
+               mp_context = None):
+    """
+    This function evaluates func over contiguous chunks of a dataframe in a
+    pool of worker processes and yields the results in input order.
+
+    The columns are shared with the workers through shared memory, so only
+    the chunk boundaries and the results are passed between processes. func
+    must be a module level function taking and returning a dataframe.
+
+    Forking a process while other threads hold locks can deadlock the 
+    workers, so pools started outside the main thread, such as from the 
+    stages of a pipeline, spawn their workers instead.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Model inputs.
+    func : function
+        Function evaluating one chunk of inputs.
+    workers : int
+        Number of worker processes. Defaults to the number of CPUs. With one
+        worker the chunks are evaluated in the current process.
+    chunk_size : int
+        Maximum number of rows in each chunk.
+    desc : string
+        Progress bar description. No progress bar is shown if not given.
+    mp_context : multiprocessing.context.BaseContext
+        Context starting the worker processes. Defaults to spawn outside the 
+        main thread, and to the platform default otherwise.
+
+    Yields
+    ------
+    results : pandas.DataFrame
+        Results of each chunk, in input order.
+
+    """
+    bounds = chunk_bounds(len(df), chunk_size)
+    workers = workers or os.cpu_count() or 1
+    progress = tqdm(total = len(bounds), desc = desc, disable = desc is None)
+
+    if workers == 1 or len(bounds) <= 1:
+
+        for start, stop in bounds:
+
+            yield func(df.iloc[start:stop])
+            progress.update()
+
+        progress.close()
+
+        return
+
+    if mp_context is None and (threading.current_thread() is not 
+                               threading.main_thread()):
+
+        mp_context = multiprocessing.get_context('spawn')
+
+    with SharedFrame(df) as shared:
+
+        descriptor = shared.descriptor()
+
+        with ProcessPoolExecutor(max_workers = workers, 
+                                 mp_context = mp_context) as executor:
+
+            # At most two chunks per worker are in flight, so finished 
+            # results do not pile up ahead of the consumer
+            pending = deque()
+
+            for start, stop in bounds:
+
+                pending.append(executor.submit(process_shared_chunk, func, 
+                               descriptor, start, stop))
+
+                if len(pending) >= 2 * workers:
+
+                    yield pending.popleft().result()
+                    progress.update()
+
+            while pending:
+
+                yield pending.popleft().result()
+                progress.update()
+
+    progress.close()
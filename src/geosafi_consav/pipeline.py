@@ -0,0 +1,313 @@
+"""
+Stage graph of the mobile broadband model runs, re-executing only the stages
+downstream of changed inputs.
+
+Developed by Bonface Osoro and Ed Oughton.
+
+September 2024
+
+"""
+import hashlib
+import inspect
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from geosafi_consav.cache import code_version, file_digest
+
+
+class Stage:
+
+    """
+    This class declares one stage of the model: the function running it, the
+    files it reads and writes, and the parameters its results depend on.
+    """
+
+
+    def __init__(self, name, func, inputs = (), outputs = (), params = None,
+                 kwargs = None, modules = None):
+        """
+        A class constructor
+
+        Arguments
+        ---------
+        name : string
+            Name of the stage.
+        func : function
+            Function running the stage.
+        inputs : list
+            Paths of the files read by the stage.
+        outputs : list
+            Paths of the files written by the stage.
+        params : object
+            JSON serializable parameters the results depend on, such as the
+            ranges of the sampled inputs.
+        kwargs : dict
+            Keyword arguments passed to func.
+        modules : list
+            Modules whose source defines the results. Defaults to the module
+            of func.
+        """
+        self.name = name
+        self.func = func
+        self.inputs = [os.path.normpath(path) for path in inputs]
+        self.outputs = [os.path.normpath(path) for path in outputs]
+        self.params = params
+        self.kwargs = kwargs or {}
+        self.modules = modules or [inspect.getmodule(func)]
+
+
+    def fingerprint(self):
+        """
+        Function for hashing the input files, parameters and code of the
+        stage.
+
+        Returns
+        -------
+        fingerprint : string
+            SHA-256 hex digest identifying the stage results.
+        """
+        parts = {
+            'inputs' : {path: file_digest(path) for path in self.inputs},
+            'params' : self.params,
+            'kwargs' : self.kwargs,
+            'code' : code_version(*self.modules)
+        }
+        text = json.dumps(parts, sort_keys = True, default = str)
+
+
+        return hashlib.sha256(text.encode()).hexdigest()
+
+
+class StageGraph:
+
+    """
+    This class links stages through the files one writes and another reads.
+    The fingerprint of every completed stage is kept in a state file, so a
+    run only executes the stages whose inputs, parameters or code changed and
+    those downstream of them. Independent stages run concurrently.
+    """
+
+
+    def __init__(self, stages, state_path):
+        """
+        A class constructor
+
+        Arguments
+        ---------
+        stages : list
+            Stages of the model.
+        state_path : string
+            JSON file holding the fingerprints of the completed stages.
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        self.lock = threading.Lock()
+
+        producers = {}
+
+        for stage in stages:
+
+            for path in stage.outputs:
+
+                producers[path] = stage.name
+
+        self.upstream = {stage.name: {producers[path] for path in stage.inputs
+                         if path in producers and producers[path] != stage.name}
+                         for stage in stages}
+
+
+    def load_state(self):
+        """
+        Function for reading the fingerprints of the completed stages.
+        """
+        if not os.path.exists(self.state_path):
+
+            return {}
+
+        with open(self.state_path) as f:
+
+            return json.load(f)
+
+
+    def save_state(self, name, fingerprint):
+        """
+        Function for recording the fingerprint of a completed stage.
+        """
+        with self.lock:
+
+            state = self.load_state()
+            state[name] = fingerprint
+            folder = os.path.dirname(self.state_path)
+
+            if folder and not os.path.exists(folder):
+
+                os.makedirs(folder)
+
+            temporary = self.state_path + '.tmp'
+
+            with open(temporary, 'w') as f:
+
+                json.dump(state, f, indent = 2, sort_keys = True)
+
+            os.replace(temporary, self.state_path)
+
+
+    def required(self, targets = None):
+        """
+        Function for listing the targets and every stage upstream of them.
+
+        Arguments
+        ---------
+        targets : list
+            Names of the stages to be brought up to date. Defaults to all.
+
+        Returns
+        -------
+        names : set
+            Names of the required stages.
+        """
+        if targets is None:
+
+            return set(self.stages)
+
+        names = set()
+        pending = list(targets)
+
+        while pending:
+
+            name = pending.pop()
+
+            if name not in names:
+
+                names.add(name)
+                pending.extend(self.upstream[name])
+
+
+        return names
+
+
+    def is_stale(self, stage, state, fingerprint):
+        """
+        Function for checking whether a stage has to be executed.
+        """
+        missing = any(not os.path.exists(path) for path in stage.outputs)
+
+
+        return missing or state.get(stage.name) != fingerprint
+
+
+    def plan(self, targets = None):
+        """
+        Function for listing the stages a run would execute, given the
+        current files. Stages downstream of a stale stage are assumed stale.
+
+        Arguments
+        ---------
+        targets : list
+            Names of the stages to be brought up to date. Defaults to all.
+
+        Returns
+        -------
+        stale : list
+            Names of the stale stages in execution order.
+        """
+        state = self.load_state()
+        names = self.required(targets)
+        stale = []
+        done = set()
+
+        while len(done) < len(names):
+
+            ready = sorted(name for name in names - done
+                           if self.upstream[name] <= done)
+
+            if not ready:
+
+                raise ValueError('Stage graph has a cycle')
+
+            for name in ready:
+
+                stage = self.stages[name]
+
+                if (self.upstream[name] & set(stale) or
+                    self.is_stale(stage, state, stage.fingerprint())):
+
+                    stale.append(name)
+
+                done.add(name)
+
+
+        return stale
+
+
+    def run(self, targets = None, force = False, workers = 2):
+        """
+        Function for executing the stale stages in dependency order. A stage
+        is fingerprinted once its upstream stages are complete, so it is
+        skipped if their outputs did not change.
+
+        Arguments
+        ---------
+        targets : list
+            Names of the stages to be brought up to date. Defaults to all.
+        force : bool
+            If True, every required stage is executed.
+        workers : int
+            Number of stages executed at the same time.
+
+        Returns
+        -------
+        executed : list
+            Names of the executed stages in order of completion.
+        """
+        state = {} if force else self.load_state()
+        names = self.required(targets)
+        done = set()
+        executed = []
+        running = {}
+
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+
+            while len(done) < len(names):
+
+                ready = sorted(name for name in names - done - set(
+                    running.values()) if self.upstream[name] <= done)
+
+                for name in ready:
+
+                    stage = self.stages[name]
+                    fingerprint = stage.fingerprint()
+
+                    if not self.is_stale(stage, state, fingerprint):
+
+                        print('Skipping up to date stage {}'.format(name))
+                        done.add(name)
+
+                        continue
+
+                    print('Running stage {}'.format(name))
+                    future = executor.submit(stage.func, **stage.kwargs)
+                    future.fingerprint = fingerprint
+                    running[future] = name
+
+                if not running:
+
+                    if len(done) < len(names) and not ready:
+
+                        raise ValueError('Stage graph has a cycle')
+
+                    continue
+
+                finished, _ = wait(running, return_when = FIRST_COMPLETED)
+
+                for future in finished:
+
+                    name = running.pop(future)
+                    future.result()
+                    self.save_state(name, future.fingerprint)
+                    done.add(name)
+                    executed.append(name)
+
+
+        return executed
@@ -1,12 +1,22 @@
 import configparser
+import functools
+import itertools
 import json
 import os
 import rasterio
 import shutil
+import threading
 import warnings
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
+from concurrent.futures import ThreadPoolExecutor
+from rasterio.features import rasterize, shapes
+from rasterio.features import geometry_mask
 from rasterio.mask import mask
+from rasterio.transform import Affine
+from rasterio.windows import Window
 from rasterstats import zonal_stats
 from shapely.geometry import Polygon
 from shapely.geometry import MultiPolygon
@@ -94,6 +104,494 @@ def remove_small_shapes(x):
         return MultiPolygon(new_geom)
 
 
+def region_labels(geometries, shape, transform):
+    """
+    Rasterize region geometries into an array of region labels. Each pixel 
+    holds a single label, so the regions must not overlap: a pixel inside 
+    several geometries takes the label of the last one.
+
+    Parameters
+    ---------
+    geometries : list
+        Region geometries.
+    shape : tuple
+        Height and width of the raster.
+    transform : affine.Affine
+        Transform of the raster.
+
+    Returns
+    -------
+    labels : numpy.ndarray
+        Label of the region whose geometry contains each pixel center, 
+        numbered from 1 in the order of geometries, and 0 elsewhere.
+
+    """
+    pairs = [(geometry, label) for label, geometry in enumerate(geometries, 1)
+             if geometry is not None and not geometry.is_empty]
+
+    if not pairs:
+
+        return np.zeros(shape, dtype = 'int32')
+
+
+    return rasterize(pairs, out_shape = shape, transform = transform, 
+                     fill = 0, dtype = 'int32')
+
+
+def zonal_population(geometries, path_raster, stats = ('sum',), nodata = 255):
+    """
+    Calculate population statistics of every region in a single pass over 
+    the population raster.
+
+    Parameters
+    ---------
+    geometries : list
+        Region geometries, which must not overlap. Unlike zonal_stats, a 
+        pixel shared by several regions is only counted in the last one.
+    path_raster : string
+        Path of the population raster.
+    stats : list
+        Statistics to calculate, any of 'sum', 'count', 'mean' and 'max'.
+    nodata : float
+        Value of the pixels left out of the statistics. Negative pixels are 
+        counted as zero population.
+
+    Returns
+    -------
+    output : pandas.DataFrame
+        Statistics of each region, in the order of geometries. Regions 
+        without pixels have missing statistics.
+
+    """
+    with rasterio.open(path_raster) as src:
+
+        array = src.read(1)
+        labels = region_labels(geometries, array.shape, src.transform)
+
+    array[array <= 0] = 0
+    valid = (labels > 0) & (array != nodata)
+    labels = labels[valid]
+    values = array[valid].astype('float64')
+
+    size = len(geometries) + 1
+    count = np.bincount(labels, minlength = size)[1:]
+    total = np.bincount(labels, weights = values, minlength = size)[1:]
+    empty = count == 0
+
+    output = {}
+
+    for stat in stats:
+
+        if stat == 'sum':
+
+            result = total
+
+        elif stat == 'count':
+
+            result = count
+
+        elif stat == 'mean':
+
+            result = total / np.where(empty, 1, count)
+
+        elif stat == 'max':
+
+            result = np.full(size, -np.inf)
+            np.maximum.at(result, labels, values)
+            result = result[1:]
+
+        else:
+
+            raise ValueError('Unknown statistic {}'.format(stat))
+
+        output[stat] = result if stat == 'count' else np.where(empty, np.nan, 
+                                                                result)
+
+
+    return pd.DataFrame(output)
+
+
+def unconnected_population(path_raster, geometries, coverage, nodata = 255):
+    """
+    Calculate the population of every region outside the coverage of each 
+    cellular technology on the population raster grid.
+
+    The regions and coverage polygons are rasterized onto the population 
+    grid, and the population of the pixels whose center lies in a region 
+    but outside the coverage is summed, instead of overlaying polygonized 
+    pixels with the uncovered areas.
+
+    Parameters
+    ---------
+    path_raster : string
+        Path of the population raster.
+    geometries : list
+        Region geometries, which must not overlap.
+    coverage : dict
+        Coverage geometries of each technology, or None for a technology 
+        without coverage.
+    nodata : float
+        Value of the pixels without data.
+
+    Returns
+    -------
+    output : pandas.DataFrame
+        Unconnected population of each region (rows, in the order of 
+        geometries) and technology (columns).
+
+    """
+    with rasterio.open(path_raster) as src:
+
+        array = src.read(1)
+        transform = src.transform
+
+    array[array <= 0] = 0
+    labels = region_labels(geometries, array.shape, transform)
+    populated = (labels > 0) & (array != nodata)
+    size = len(geometries) + 1
+
+    output = {}
+
+    for technology, covered in coverage.items():
+
+        pairs = [(geometry, 1) for geometry in (covered if covered is not 
+                 None else []) if geometry is not None and not 
+                 geometry.is_empty]
+        uncovered = populated
+
+        if pairs:
+
+            uncovered = populated & (rasterize(pairs, out_shape = 
+                        array.shape, transform = transform, fill = 0, 
+                        dtype = 'uint8') == 0)
+
+        output[technology] = np.bincount(labels[uncovered], weights = 
+                             array[uncovered].astype('float64'), 
+                             minlength = size)[1:]
+
+
+    return pd.DataFrame(output)
+
+
+def clip_regions(path_raster, geometries, workers = None, nodata = 255):
+    """
+    Clip a population raster to every region, reading only the window 
+    covering each region's bounds.
+
+    The raster is opened read-only once in each worker thread, and the 
+    regions are clipped concurrently.
+
+    Parameters
+    ---------
+    path_raster : string
+        Path of the population raster.
+    geometries : dict
+        Geometry of each region id.
+    workers : int
+        Number of threads. Defaults to the number of CPUs.
+    nodata : float
+        Value of the pixels outside the region.
+
+    Returns
+    -------
+    clips : dict
+        Clipped array and its transform of each region id.
+
+    """
+    local = threading.local()
+    datasets = []
+
+    def clip(item):
+
+        region_id, geometry = item
+
+        if not hasattr(local, 'src'):
+
+            local.src = rasterio.open(path_raster)
+            datasets.append(local.src)
+
+        out_img, out_transform = mask(local.src, [geometry], crop = True, 
+                                      nodata = nodata)
+
+        return region_id, (out_img, out_transform)
+
+    try:
+
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+
+            clips = dict(executor.map(clip, geometries.items()))
+
+    finally:
+
+        for src in datasets:
+
+            src.close()
+
+
+    return clips
+
+
+def population_polygons(array, transform, nodata = 255):
+    """
+    Polygonize the populated pixels of a population raster.
+
+    Connected pixels of equal value are merged into one polygon, whose 
+    exterior ring is kept. The rings are mapped to coordinates by the 
+    polygonization itself and turned into geometries with the shapely 
+    array constructors.
+
+    Parameters
+    ---------
+    array : numpy.ndarray
+        Population raster.
+    transform : affine.Affine
+        Transform of the raster.
+    nodata : float
+        Value of the pixels without data.
+
+    Returns
+    -------
+    output : geopandas.GeoDataFrame
+        Polygon and population value of each group of pixels.
+
+    """
+    populated = (array > 0) & (array != nodata)
+    rings = []
+    values = []
+
+    for geometry, value in shapes(array, mask = populated, 
+                                  transform = transform):
+
+        rings.append(geometry['coordinates'][0])
+        values.append(value)
+
+    lengths = [len(ring) for ring in rings]
+    coords = np.array(list(itertools.chain.from_iterable(rings)), 
+                      dtype = 'float64').reshape(-1, 2)
+    polygons = shapely.polygons(shapely.linearrings(coords, indices = 
+               np.repeat(np.arange(len(rings)), lengths)))
+
+
+    return gpd.GeoDataFrame({'value': values}, geometry = polygons, 
+                            crs = 'epsg:4326')
+
+
+def read_clips(folder):
+    """
+    Read the population array and transform of every region .tif in a 
+    folder, one region at a time.
+    """
+    for filename in sorted(os.listdir(folder)):
+
+        if not filename.endswith('.tif'):
+
+            continue
+
+        with rasterio.open(os.path.join(folder, filename)) as src:
+
+            yield os.path.splitext(filename)[0], (src.read(1), src.transform)
+
+
+SSA_BOUNDS = (-26.0, -47.0, 64.0, 28.0)
+
+
+def build_population_store(path_tiff, folder_out, bounds = SSA_BOUNDS, 
+                           block_rows = 1024):
+    """
+    Convert the extent of a population raster into a memory-mappable .npy 
+    array with a json index of its transform, so processes can read slices 
+    from the OS page cache instead of decoding the GeoTIFF.
+
+    Parameters
+    ---------
+    path_tiff : string
+        Path of the population raster, such as the global WorldPop layer.
+    folder_out : string
+        Folder of the store.
+    bounds : tuple
+        West, south, east and north bounds of the store. Defaults to Sub-
+        Saharan Africa.
+    block_rows : int
+        Number of raster rows converted at a time.
+
+    """
+    with rasterio.open(path_tiff) as src:
+
+        window = rasterio.windows.from_bounds(*bounds, src.transform)
+        col_off = max(int(np.floor(window.col_off)), 0)
+        row_off = max(int(np.floor(window.row_off)), 0)
+        width = min(int(np.ceil(window.col_off + window.width)), 
+                    src.width) - col_off
+        height = min(int(np.ceil(window.row_off + window.height)), 
+                     src.height) - row_off
+        window = Window(col_off, row_off, width, height)
+
+        if not os.path.exists(folder_out):
+
+            os.makedirs(folder_out)
+
+        array = np.lib.format.open_memmap(os.path.join(folder_out, 
+                'population.npy'), mode = 'w+', dtype = src.dtypes[0], 
+                shape = (height, width))
+
+        for start in range(0, height, block_rows):
+
+            rows = min(block_rows, height - start)
+            array[start:start + rows] = src.read(1, window = Window(col_off, 
+                                        row_off + start, width, rows))
+
+        array.flush()
+        del array
+
+        index = {
+            'transform' : list(src.window_transform(window))[:6],
+            'crs' : src.crs.to_string() if src.crs else 'EPSG:4326',
+            'shape' : [height, width],
+            'dtype' : src.dtypes[0],
+            'source' : os.path.abspath(path_tiff)
+        }
+
+    with open(os.path.join(folder_out, 'index.json'), 'w') as f:
+
+        json.dump(index, f, indent = 2)
+
+
+    return None
+
+
+class PopulationStore:
+
+    """
+    This class reads windows of a population store created by 
+    build_population_store. The array is memory-mapped read-only, so every 
+    process shares the pages cached by the operating system.
+    """
+
+
+    def __init__(self, folder):
+        """
+        A class constructor
+
+        Arguments
+        ---------
+        folder : string
+            Folder of the store.
+        """
+        with open(os.path.join(folder, 'index.json')) as f:
+
+            index = json.load(f)
+
+        self.folder = folder
+        self.transform = Affine(*index['transform'])
+        self.crs = index['crs']
+        self.source = index.get('source')
+        self.array = np.load(os.path.join(folder, 'population.npy'), 
+                             mmap_mode = 'r')
+
+        height, width = self.array.shape
+        west, north = self.transform * (0, 0)
+        east, south = self.transform * (width, height)
+        self.bounds = (west, south, east, north)
+
+
+    def contains(self, bounds):
+        """
+        Function for checking whether the bounds lie inside the store extent.
+        """
+        west, south, east, north = bounds
+
+
+        return (west >= self.bounds[0] and south >= self.bounds[1] and 
+                east <= self.bounds[2] and north <= self.bounds[3])
+
+
+    def window(self, bounds):
+        """
+        Function for returning the pixel window covering the bounds. Raises 
+        a ValueError if the bounds extend beyond the store extent, as the 
+        window would be empty or truncated.
+        """
+        if not self.contains(bounds):
+
+            raise ValueError('Bounds {} extend beyond the population store '
+                'extent {}'.format(tuple(bounds), self.bounds))
+
+        west, south, east, north = bounds
+        cols, rows = ~self.transform * (np.array([west, east, west, east]), 
+                                        np.array([north, north, south, south]))
+        height, width = self.array.shape
+
+        row_start = int(np.clip(np.floor(rows.min()), 0, height))
+        row_stop = int(np.clip(np.ceil(rows.max()), 0, height))
+        col_start = int(np.clip(np.floor(cols.min()), 0, width))
+        col_stop = int(np.clip(np.ceil(cols.max()), 0, width))
+
+
+        return (slice(row_start, row_stop), slice(col_start, col_stop))
+
+
+    def read(self, bounds):
+        """
+        Function for reading the population inside the bounds without 
+        copying.
+
+        Returns
+        -------
+        array : numpy.ndarray
+            Read-only view of the population.
+        transform : affine.Affine
+            Transform of the view.
+        """
+        rows, cols = self.window(bounds)
+        transform = self.transform * Affine.translation(cols.start, rows.start)
+
+
+        return self.array[rows, cols], transform
+
+
+    def clip(self, geometry, nodata = 255):
+        """
+        Function for clipping the population to a geometry, matching 
+        rasterio.mask.mask with crop = True.
+
+        Returns
+        -------
+        out_img : numpy.ndarray
+            Population inside the geometry, with a band axis, and nodata 
+            outside it.
+        out_transform : affine.Affine
+            Transform of the clip.
+        """
+        array, transform = self.read(geometry.bounds)
+        outside = geometry_mask([geometry], out_shape = array.shape, 
+                                transform = transform)
+        out_img = np.where(outside, np.array(nodata, dtype = array.dtype), 
+                           array)
+
+
+        return out_img[np.newaxis], transform
+
+
+    def meta(self, out_img, out_transform, nodata = 255):
+        """
+        Function for returning the GeoTIFF metadata of a clip.
+        """
+
+        return {'driver': 'GTiff', 'dtype': str(out_img.dtype), 
+                'nodata': nodata, 'width': out_img.shape[2], 
+                'height': out_img.shape[1], 'count': out_img.shape[0], 
+                'crs': 'epsg:4326', 'transform': out_transform}
+
+
+@functools.lru_cache(maxsize = None)
+def open_population_store(folder):
+    """
+    Open a population store once per process.
+    """
+
+    return PopulationStore(folder)
+
+
 class ProcessCountry:
 
     """
@@ -306,7 +804,8 @@ class ProcessPopulation:
         gid_region: string
             GID boundary spatial level to process
         pop_tiff: string
-            Filename of the population raster layer
+            Filename of the population raster layer, or folder of a 
+            population store
 
         """
         self.csv_country = csv_country
@@ -320,17 +819,14 @@ class ProcessPopulation:
         """
         This function creates a national population .tiff
         using national boundary files created in 
-        process_national_boundary function
+        process_national_boundary function. If pop_tiff is the folder of 
+        a store created by build_population_store, the country is read from 
+        the memory-mapped store instead of the GeoTIFF, unless it extends 
+        beyond the store.
         """
 
         iso3 = self.country_iso3
 
-        filename = self.pop_tiff
-        path_pop = os.path.join(filename)
-        hazard = rasterio.open(path_pop, 'r+')
-        hazard.nodata = 255                       
-        hazard.crs.from_epsg(4326) 
-
         filename = 'national_outline.shp'
         folder = os.path.join('results', 'processed', self.country_iso3)
         
@@ -344,17 +840,44 @@ class ProcessPopulation:
         #this line sets geometry for resulting geodataframe
         geo = geo.rename(columns={0:'geometry'}).set_geometry('geometry')
 
-        #convert to json
-        coords = [json.loads(geo.to_json())['features'][0]['geometry']]        
+        geometry = geo['geometry'].iloc[0]
+        path_pop = self.pop_tiff
+        store = None
+
+        if os.path.isdir(self.pop_tiff):
+
+            store = open_population_store(self.pop_tiff)
+
+            if not store.contains(geometry.bounds) and store.source:
+
+                #countries beyond the store are clipped from its source raster
+                print('{} extends beyond the population store'.format(iso3))
+                path_pop = store.source
+                store = None
+
+        if store is not None:
+
+            #clip the memory-mapped population store
+            out_img, out_transform = store.clip(geometry)
+            out_meta = store.meta(out_img, out_transform)
+
+        else:
+
+            hazard = rasterio.open(path_pop, 'r+')
+            hazard.nodata = 255                       
+            hazard.crs.from_epsg(4326) 
 
-        #carry out the clip using our mask
-        out_img, out_transform = mask(hazard, coords, crop = True)
+            #convert to json
+            coords = [json.loads(geo.to_json())['features'][0]['geometry']]        
 
-        #update our metadata
-        out_meta = hazard.meta.copy()
-        out_meta.update({'driver': 'GTiff', 'height': out_img.shape[1],
-                        'width': out_img.shape[2], 'transform': out_transform,
-                        'crs': 'epsg:4326'})
+            #carry out the clip using our mask
+            out_img, out_transform = mask(hazard, coords, crop = True)
+
+            #update our metadata
+            out_meta = hazard.meta.copy()
+            out_meta.update({'driver': 'GTiff', 'height': out_img.shape[1],
+                            'width': out_img.shape[2], 'transform': out_transform,
+                            'crs': 'epsg:4326'})
         
         #now we write out at the regional level
         filename_out = 'ppp_2020_1km_Aggregated.tif' 
@@ -375,7 +898,8 @@ class ProcessPopulation:
 
     def process_population_tif(self):
         """
-        Process population layer.
+        Process population layer. The raster is read once and the population 
+        of all regions summed in a single pass.
         
         Parameters
         ----------
@@ -399,49 +923,26 @@ class ProcessPopulation:
 
         boundaries = gpd.read_file(path_regions, crs = 'epsg:4326')
 
-        output = []
         print('Working on {}'.format(iso))
-        for idx, boundary in boundaries.iterrows():
-    
-            with rasterio.open(path_raster) as src:
-                
-                affine = src.transform
-                array = src.read(1)
-                array[array <= 0] = 0
-                
-                population = [i['sum'] for i in zonal_stats(
-                    boundary['geometry'], array, nodata = 255,
-                    stats = ['sum'], affine = affine)][0]
-
-                #Calculate the central coordinates of each of the polygons
-                boundary['centroid'] = boundary['geometry'].centroid
-                boundary['longitude'] = boundary['centroid'].x
-                boundary['latitude'] = boundary['centroid'].y
-                try:
-                    output.append({
-                        'iso3':boundary['GID_0'],
-                        'region':boundary['NAME_1'],
-                        'GID_1': boundary['GID_2'],
-                        'population': population,
-                        'latitude': boundary['latitude'],
-                        'longitude': boundary['longitude'],
-                        'geometry': boundary['geometry'],
-                        'area': (boundary['geometry'].area) * 12309
-                    })
-                    
-                except:
-                    output.append({
-                        'iso3':boundary['GID_0'],
-                        'region':boundary['NAME_1'],
-                        'GID_1': boundary['GID_1'],
-                        'population': population,
-                        'latitude': boundary['latitude'],
-                        'longitude': boundary['longitude'],
-                        'geometry': boundary['geometry'],
-                        'area': (boundary['geometry'].area) * 12309
-                    })
-
-        df = pd.DataFrame(output)
+        population = zonal_population(boundaries['geometry'], path_raster)
+
+        #Calculate the central coordinates of each of the polygons
+        geometries = np.asarray(boundaries['geometry'])
+        centroids = shapely.centroid(geometries)
+        gid = 'GID_2' if 'GID_2' in boundaries.columns else 'GID_1'
+
+        df = pd.DataFrame({
+            'iso3': boundaries['GID_0'],
+            'region': boundaries['NAME_1'],
+            'GID_1': boundaries[gid],
+            'population': population['sum'].values,
+            'latitude': shapely.get_y(centroids),
+            'longitude': shapely.get_x(centroids),
+            'geometry': geometries,
+            'area': shapely.area(geometries) * 12309
+        })
+        output = df.to_dict('records')
+
         df.dropna(subset = ['population'], inplace = True)
         df['population'] = df['population'].astype(int)
         df[['latitude', 'longitude']] = df[['latitude', 'longitude']].round(4)
@@ -458,16 +959,34 @@ class ProcessPopulation:
         return output
 
 
-    def process_sub_regional_pop_tiff(self):
+    def process_sub_regional_pop_tiff(self, workers = None, 
+                                      write_tiffs = True):
         """
         This function creates a regional composite population .tiff 
         using regional boundary files created in 
         process_regional_boundary function and national
         population files created in process_national_population
         function.
+
+        The national population raster is opened read-only, only the window 
+        of each region is read, and the regions are clipped concurrently.
+
+        Parameters
+        ----------
+        workers : int
+            Number of threads clipping regions at the same time.
+        write_tiffs : bool
+            If False, the clips are only returned instead of being written 
+            as one .tiff per region.
+
+        Returns
+        -------
+        clips : dict
+            Clipped population array and its transform of each region.
         """
         countries = pd.read_csv(self.csv_country, encoding = 'utf-8-sig')
         print('Working on {}'.format(self.country_iso3))
+        clips = {}
         
         for idx, country in countries.iterrows():
 
@@ -498,124 +1017,91 @@ class ProcessPopulation:
 
                 regions = gpd.read_file(region_path_2)
                 gid = 'GID_1'
-            
-            for idx, region in regions.iterrows():
-
-                #get our gid id for this region 
-                #(which depends on the country-specific gid level)
-                gid_id = region[gid]
-
-                filename = 'ppp_2020_1km_Aggregated.tif'
-                folder = os.path.join('results', 'processed', iso3, 'population', 'national')
-                path_pop = os.path.join(folder, filename)
-                hazard = rasterio.open(path_pop, 'r+')
-                hazard.nodata = 255                      
-                hazard.crs.from_epsg(4326)                
 
-                geo = gpd.GeoDataFrame(gpd.GeoSeries(region.geometry))
+            filename = 'ppp_2020_1km_Aggregated.tif'
+            folder = os.path.join('results', 'processed', iso3, 'population', 'national')
+            path_pop = os.path.join(folder, filename)
 
-                geo = geo.rename(columns = {0:'geometry'}).set_geometry('geometry')
+            #get our gid id for each region 
+            #(which depends on the country-specific gid level)
+            geometries = dict(zip(regions[gid], regions['geometry']))
+            clips = clip_regions(path_pop, geometries, workers)
 
+            if write_tiffs:
 
-                coords = [json.loads(geo.to_json())['features'][0]['geometry']] 
+                with rasterio.open(path_pop) as src:
 
-                out_img, out_transform = mask(hazard, coords, crop = True)
+                    meta = src.meta.copy()
 
-                out_meta = hazard.meta.copy()
-
-                out_meta.update({'driver': 'GTiff', 'height': out_img.shape[1],
-                                'width': out_img.shape[2], 'transform': out_transform,
-                                'crs': 'epsg:4326'})
-
-                filename_out = '{}.tif'.format(gid_id) 
                 folder_out = os.path.join('results', 'processed', self.country_iso3, 'population', 'tiffs')
 
                 if not os.path.exists(folder_out):
 
                     os.makedirs(folder_out)
 
-                path_out = os.path.join(folder_out, filename_out)
+                for gid_id, (out_img, out_transform) in clips.items():
+
+                    out_meta = meta.copy()
+                    out_meta.update({'driver': 'GTiff', 'height': out_img.shape[1],
+                                    'width': out_img.shape[2], 'transform': out_transform,
+                                    'crs': 'epsg:4326', 'nodata': 255})
+
+                    filename_out = '{}.tif'.format(gid_id) 
+                    path_out = os.path.join(folder_out, filename_out)
 
-                with rasterio.open(path_out, 'w', **out_meta) as dest:
+                    with rasterio.open(path_out, 'w', **out_meta) as dest:
 
-                    dest.write(out_img)
+                        dest.write(out_img)
             
             print('Processing complete for {}'.format(iso3))
 
+        return clips
 
-    def pop_process_shapefiles(self):
+
+    def pop_process_shapefiles(self, clips = None):
 
         """
         This function process each of the population 
         raster layers to vector shapefiles
+
+        Parameters
+        ----------
+        clips : dict
+            Population array and transform of each region, such as returned 
+            by process_sub_regional_pop_tiff. The region .tif files are read 
+            if not given.
         """
         folder = os.path.join('results', 'processed', self.country_iso3, 'population', 'tiffs')
+        folder_out = os.path.join('results', 'processed', 
+                     self.country_iso3, 'population', 'shapefiles')
 
-        for tifs in tqdm(os.listdir(folder), 
-                         desc = 'Processing sub-regional population shapefiles for {}...'.format(
-                        self.country_iso3)):
-            try:
-
-                if tifs.endswith('.tif'):
-
-                    tifs = os.path.splitext(tifs)[0]
-
-                    folder = os.path.join('results', 'processed', 
-                             self.country_iso3, 'population', 'tiffs')
-                    filename = tifs + '.tif'
-                    gid_name = os.path.basename(filename)
-                    gid_name = gid_name.rsplit(".", 1)[0]
-                    
-                    path_in = os.path.join(folder, filename)
-
-                    folder = os.path.join('results', 'processed', 
-                             self.country_iso3, 'population', 'shapefiles')
-                    
-                    if not os.path.exists(folder):
-
-                        os.mkdir(folder)
-                        
-                    filename = tifs + '.shp'
-                    path_out = os.path.join(folder, filename)
-
-                    with rasterio.open(path_in) as src:
-
-                        affine = src.transform
-                        array = src.read(1)
-
-                        output = []
-
-                        for vec in rasterio.features.shapes(array):
-
-                            if vec[1] > 0 and not vec[1] == 255:
+        if clips is None:
 
-                                coordinates = [i for i in vec[0]['coordinates'][0]]
+            items = read_clips(folder)
+            total = len([tif for tif in os.listdir(folder) 
+                         if tif.endswith('.tif')])
 
-                                coords = []
-
-                                for i in coordinates:
+        else:
 
-                                    x = i[0]
-                                    y = i[1]
+            items = clips.items()
+            total = len(clips)
 
-                                    x2, y2 = src.transform * (x, y)
+        for gid_name, (array, transform) in tqdm(items, total = total,
+                         desc = 'Processing sub-regional population shapefiles for {}...'.format(
+                        self.country_iso3)):
+            try:
 
-                                    coords.append((x2, y2))
+                if not os.path.exists(folder_out):
 
-                                output.append({
-                                    'type': vec[0]['type'],
-                                    'geometry': {
-                                        'type': 'Polygon',
-                                        'coordinates': [coords],
-                                    },
-                                    'properties': {
-                                        'GID_1': gid_name,
-                                        'value': vec[1],
-                                    }
-                                })
+                    os.makedirs(folder_out)
+                    
+                path_out = os.path.join(folder_out, gid_name + '.shp')
 
-                    output = gpd.GeoDataFrame.from_features(output, crs = 'epsg:4326')
-                    output.to_file(path_out, driver = 'ESRI Shapefile')
+                output = population_polygons(array.reshape(array.shape[-2:]), 
+                                             transform)
+                output.insert(0, 'GID_1', gid_name)
+                output = output[['geometry', 'GID_1', 'value']]
+                output.to_file(path_out, driver = 'ESRI Shapefile')
 
             except:
 
@@ -4,6 +4,7 @@ import pandas as pd
 import geopandas as gpd
 import configparser
 import warnings
+from geosafi_consav.preprocessing import unconnected_population
 pd.options.mode.chained_assignment = None
 warnings.filterwarnings('ignore')
 
@@ -79,11 +80,30 @@ def generate_unconnected_csv(intersect_folder, iso3):
             merged_shapefile = pd.concat([merged_shapefile, shapefile], 
                                          ignore_index = True)  
     
+    renamed_columns = {'value': 'pop_unconnected'}
+    merged_shapefile.rename(columns = renamed_columns, inplace = True)
+    write_unconnected_csv(merged_shapefile, iso3)
+
+
+    return None
+
+
+def write_unconnected_csv(unconnected, iso3):
+    """
+    This function writes the unconnected population of each region and 
+    technology, and its national total by technology.
+
+    Parameters
+    ----------
+    unconnected : pandas.DataFrame
+        Unconnected population (pop_unconnected) by iso3, GID_1 and 
+        technology.
+    iso3 : string
+        Country ISO3 code
+    """
     fileout = '{}_unconnected_mapping_results.csv'.format(iso3)
     fileout_1 = '{}_unconnected_by_tech.csv'.format(iso3)
     folder_out = os.path.join(DATA_RESULTS, iso3, 'csv_files')
-    renamed_columns = {'value': 'pop_unconnected'}
-    merged_shapefile.rename(columns = renamed_columns, inplace = True)
     
     if not os.path.exists(folder_out):
 
@@ -92,15 +112,13 @@ def generate_unconnected_csv(intersect_folder, iso3):
     path_out = os.path.join(folder_out, fileout)
     path_out_1 = os.path.join(folder_out, fileout_1)
 
-    map_unconnected = merged_shapefile.groupby(['iso3', 'GID_1', 'technology']
-                                               )['pop_unconnected'].sum()
+    map_unconnected = unconnected.groupby(['iso3', 'GID_1', 'technology']
+                                          )['pop_unconnected'].sum()
 
     population_data = os.path.join(DATA_RESULTS, iso3, 'population', 
                                    '{}_population_results.csv'.format(iso3))
     population = pd.read_csv(population_data)
-    merged_shapefile = merged_shapefile.groupby(['iso3', 'GID_1', 'technology']
-                                                )['pop_unconnected'].sum()
-    aggregated_df = merged_shapefile.reset_index()
+    aggregated_df = map_unconnected.reset_index()
     df = population.merge(aggregated_df, on = 'GID_1', how = 'outer'
                           ).reset_index(drop = True)
 
@@ -119,6 +137,68 @@ def generate_unconnected_csv(intersect_folder, iso3):
     return None
 
 
+def generate_unconnected_raster_csv(iso3):
+    """
+    This function approximates the unconnected population csv files of 
+    generate_unconnected_csv directly from the national population raster 
+    and coverage shapefiles, without polygonizing the population or 
+    overlaying the uncovered areas.
+
+    The outputs differ from the vector chain in three ways:
+
+    - the national coverage shapefiles are used instead of the regional 
+      layers in the uncovered folders;
+    - a pixel is counted when its center lies in the region and outside 
+      the coverage, whereas the vector chain counts the full value of every 
+      population polygon intersecting the uncovered area;
+    - regions with no uncovered population get 0 instead of being left out 
+      of the outer merge.
+    
+    Parameters
+    ----------
+    iso3 : string
+        Country ISO3 code
+    """
+    print('processing unconnected cellphone {} csv'.format(iso3))
+
+    folder = os.path.join(DATA_PROCESSED, iso3, 'regions')
+    region_path = os.path.join(folder, 'regions_2_{}.shp'.format(iso3))
+
+    if os.path.exists(region_path):
+
+        regions = gpd.read_file(region_path)
+        gid = 'GID_2'
+
+    else:
+
+        regions = gpd.read_file(os.path.join(folder, 
+                                'regions_1_{}.shp'.format(iso3)))
+        gid = 'GID_1'
+
+    coverage = {}
+
+    for technology in ['GSM', '3G', '4G']:
+
+        path_cov = os.path.join(DATA_PROCESSED, iso3, 'coverage', 'national', 
+                                'coverage_{}.shp'.format(technology))
+        coverage[technology] = (list(gpd.read_file(path_cov).geometry) if 
+                                os.path.exists(path_cov) else None)
+
+    path_raster = os.path.join(DATA_PROCESSED, iso3, 'population', 'national', 
+                               'ppp_2020_1km_Aggregated.tif')
+    population = unconnected_population(path_raster, list(regions.geometry), 
+                                        coverage)
+    population['GID_1'] = regions[gid].values
+    population['iso3'] = iso3
+
+    unconnected = population.melt(id_vars = ['iso3', 'GID_1'], var_name = 
+                  'technology', value_name = 'pop_unconnected')
+    write_unconnected_csv(unconnected, iso3)
+
+
+    return None
+
+
 def generate_poverty_csv(iso3):
     """
     This function generate a single csv file of the people living below the 
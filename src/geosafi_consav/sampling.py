@@ -0,0 +1,473 @@
+"""
+Array-based sampling of the uncertainty quantification (UQ) inputs of the
+mobile broadband model.
+
+Developed by Bonface Osoro and Ed Oughton.
+
+September 2024
+
+"""
+import math
+import warnings
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+
+DECILES = ['Decile 1', 'Decile 2', 'Decile 3', 'Decile 4', 'Decile 5',
+           'Decile 6', 'Decile 7', 'Decile 8', 'Decile 9', 'Decile 10']
+DESIGNS = ['random', 'lhs', 'sobol']
+
+
+def parameter_range(mobile_params, column, low_key, high_key, integer = True):
+    """
+    This is a helper function returning the sampling range of one UQ input.
+
+    Parameters
+    ----------
+    mobile_params : dict
+        Dictionary containing mobile engineering details.
+    column : string
+        Name of the UQ input column.
+    low_key, high_key : string
+        Keys of the lower and upper values in mobile_params.
+    integer : bool
+        Whether whole numbers are drawn, including the upper value.
+
+    Returns
+    -------
+    parameter_range : tuple
+        Column name, lower value, upper value and the integer flag.
+
+    """
+
+    return (column, mobile_params[low_key], mobile_params[high_key], integer)
+
+
+def capacity_ranges(mobile_params):
+    """
+    Sampling ranges of the UQ capacity inputs.
+    """
+    grid_length = mobile_params['grid_length']
+    ranges = [
+        ('transmitter_x', 0, grid_length, False),
+        ('transmitter_y', 0, grid_length, False),
+        ('receiver_x', 0, grid_length + 5, False),
+        ('receiver_y', 0, grid_length + 5, False),
+        ('interference_x', 0, grid_length, False),
+        ('interference_y', 0, grid_length, False),
+    ]
+
+    for column, unit in [('transmitter_height', '_m'),
+                         ('user_antenna_height', '_m'),
+                         ('transmitter_power', '_dbm'),
+                         ('trans_antenna_gain', '_dbi'),
+                         ('user_antenna_gain', '_dbi'),
+                         ('user_antenna_loss', '_db')]:
+
+        ranges.append(parameter_range(mobile_params, column + unit,
+            column + '_low' + unit, column + '_high' + unit))
+
+
+    return ranges
+
+
+def capacity_constants(mobile_params):
+    """
+    Fixed UQ capacity inputs.
+    """
+    keys = ['mu', 'sigma', 'seed_value', 'draws', 'shadow_fading_db',
+            'building_penetration_loss_db', 'antenna_sectors',
+            'system_temperature_k']
+
+
+    return {key: mobile_params[key] for key in keys}
+
+
+def capacity_axes(mobile_params):
+    """
+    Scenario values of the UQ capacity inputs, besides the decile.
+    """
+
+    return {'mean_monthly_demand_GB': mobile_params['mean_monthly_demand_GB']}
+
+
+def cost_ranges(mobile_params):
+    """
+    Sampling ranges of the UQ cost inputs.
+    """
+    ranges = [parameter_range(mobile_params, item + '_usd', item + '_low',
+              item + '_high') for item in ['sector_antenna',
+              'remote_radio_unit', 'io_fronthaul', 'control_unit',
+              'cooling_fans', 'power_supply', 'battery_power', 'bbu_cabinet',
+              'tower', 'civil_materials', 'transportation', 'installation',
+              'site_rental', 'router', 'fiber_link', 'staff_costs']]
+
+    # The base station energy cost is drawn from the power supply cost range
+    ranges.append(parameter_range(mobile_params, 'base_station_energy_usd',
+                  'power_supply_low', 'power_supply_high'))
+
+
+    return ranges
+
+
+def cost_constants(mobile_params):
+    """
+    Fixed UQ cost inputs.
+    """
+    constants = {key: mobile_params[key] for key in ['mu', 'sigma',
+                 'seed_value', 'draws', 'discount_rate']}
+    constants['assessment_years'] = mobile_params['assessment_period']
+
+
+    return constants
+
+
+def cost_axes(mobile_params):
+    """
+    Scenario values of the UQ cost inputs, besides the decile.
+    """
+
+    return {'mhz_per_pop_usd': mobile_params['usd_per_mhz_pop'],
+            'frequency_mhz': mobile_params['frequencies_mhz']}
+
+
+def emission_ranges(mobile_params):
+    """
+    Sampling ranges of the UQ emission inputs.
+    """
+    ranges = [parameter_range(mobile_params, item + '_kg', item + '_low_kg',
+              item + '_high_kg') for item in ['bbu_rru_pcb',
+              'bbu_rru_aluminium', 'copper_antenna', 'aluminium_antenna',
+              'pvc_antenna', 'iron_antenna', 'steel_antenna', 'steel_tower',
+              'aluminium_frame', 'steel_pole', 'machine_concrete',
+              'machine_steel', 'basic_aluminium_device', 'smartphone']]
+
+    ranges += [parameter_range(mobile_params, item + '_kg', item + '_low_kg',
+               item + '_high_kg', False) for item in ['ict_equipment',
+               'power_supply', 'lithium_battery']]
+
+    ranges += [
+        parameter_range(mobile_params, 'consumption_lt_per_km',
+            'consumption_low_lt_per_km', 'consumption_high_lt_per_km', False),
+        parameter_range(mobile_params, 'machine_fuel_eff_lt_per_hr',
+            'machine_fuel_eff_low_lt_per_hr', 'machine_fuel_eff_high_lt_per_hr'),
+        parameter_range(mobile_params, 'machine_operation_hrs',
+            'machine_operation_low_hrs', 'machine_operation_high_hrs'),
+    ]
+
+    ranges += [parameter_range(mobile_params, item + '_kwh', item + '_low_kwh',
+               item + '_high_kwh', False) for item in ['cpe', 'smartphone',
+               'ict', 'base_band_unit', 'base_station_power',
+               'radio_frequency', 'epc_center']]
+
+
+    return ranges
+
+
+def emission_constants(mobile_params):
+    """
+    Fixed UQ emission inputs.
+    """
+    constants = {key: mobile_params[key] for key in ['pcb_kg_co2e',
+                 'aluminium_kg_co2e', 'copper_kg_co2e', 'pvc_kg_co2e',
+                 'iron_kg_co2e', 'steel_kg_co2e', 'concrete_kg_co2e',
+                 'olnu_kg_co2e', 'electricity_kg_co2e', 'diesel_factor_kgco2e',
+                 'container_ship_kgco2e', 'assessment_period',
+                 'social_carbon_cost_usd']}
+    constants['plastics_factor_kgco2e'] = mobile_params['plastics_factor_kgco2']
+    constants['metals_factor_kgco2e'] = mobile_params['metals_factor_kgco2']
+
+
+    return constants
+
+
+def emission_axes(mobile_params):
+    """
+    Scenario values of the UQ emission inputs, besides the decile.
+    """
+
+    return {}
+
+
+def scenario_grid(iterations, axes):
+    """
+    This function lists every combination of iteration and scenario values,
+    with the iteration varying slowest.
+
+    Parameters
+    ----------
+    iterations : int
+        Number of iterations.
+    axes : dict
+        Scenario values of each column, in nesting order.
+
+    Returns
+    -------
+    grid : pandas.DataFrame
+        One row per iteration and scenario.
+
+    """
+    index = pd.MultiIndex.from_product([range(iterations)] +
+        list(axes.values()), names = ['iteration'] + list(axes.keys()))
+
+
+    return index.to_frame(index = False)
+
+
+def unit_design(iterations, scenarios, dimensions, design = 'random',
+                rng = None):
+    """
+    This function draws the unit hypercube samples of every iteration and
+    scenario.
+
+    With the 'lhs' and 'sobol' designs each scenario gets its own Latin
+    hypercube or scrambled Sobol design over the iterations, so every decile
+    and scenario covers the parameter ranges evenly. Sobol designs are only
+    balanced when the number of iterations is a power of two. Other numbers
+    of iterations are kept, as they index the fading variates of each row,
+    and take the first points of the next power of two with a warning.
+
+    Parameters
+    ----------
+    iterations : int
+        Number of iterations.
+    scenarios : int
+        Number of scenarios in each iteration.
+    dimensions : int
+        Number of sampled parameters.
+    design : string
+        One of 'random', 'lhs' or 'sobol'.
+    rng : numpy.random.Generator
+        Random generator of the draws and scrambling.
+
+    Returns
+    -------
+    unit : numpy.ndarray
+        Samples in [0, 1) with one row per iteration and scenario, the
+        iteration varying slowest.
+
+    """
+    rng = np.random.default_rng(rng)
+    shape = (iterations * scenarios, dimensions)
+
+    if design == 'random':
+
+        return rng.random(shape)
+
+    if design == 'lhs':
+
+        sampler = qmc.LatinHypercube(scenarios * dimensions, seed = rng)
+
+    elif design == 'sobol':
+
+        sampler = qmc.Sobol(scenarios * dimensions, scramble = True, 
+                            seed = rng)
+
+    else:
+
+        raise ValueError('Unknown design: {}. Choose from {}'.format(
+            design, DESIGNS))
+
+    # One design point per iteration, with a block of dimensions per scenario
+    if design == 'sobol':
+
+        m = max(math.ceil(math.log2(max(iterations, 1))), 0)
+
+        if 2 ** m != iterations:
+
+            warnings.warn('Sobol design of {} iterations is not balanced, '
+                'use a power of two such as {}'.format(iterations, 2 ** m))
+
+        unit = sampler.random_base2(m)[:iterations]
+
+    else:
+
+        unit = sampler.random(iterations)
+
+
+    return unit.reshape(shape)
+
+
+def scale_unit_samples(unit, ranges):
+    """
+    This function maps samples on the unit hypercube onto the parameter
+    ranges. Integer inputs take every whole number between the lower and
+    upper value with equal probability.
+
+    Parameters
+    ----------
+    unit : numpy.ndarray
+        Samples in [0, 1) with one column per parameter range.
+    ranges : list
+        Column name, lower value, upper value and integer flag of each input.
+
+    Returns
+    -------
+    samples : dict
+        Sampled values of each column.
+
+    """
+    samples = {}
+
+    for j, (column, low, high, integer) in enumerate(ranges):
+
+        if integer:
+
+            values = low + np.floor(unit[:, j] * (high - low + 1))
+            samples[column] = np.minimum(values, high).astype(np.int64)
+
+        else:
+
+            samples[column] = low + unit[:, j] * (high - low)
+
+
+    return samples
+
+
+def sample_uq_inputs(ranges, constants, axes, iterations, seed = None,
+                     design = 'random'):
+    """
+    This function draws the UQ inputs of all iterations and scenarios in one
+    call.
+
+    Parameters
+    ----------
+    ranges : list
+        Column name, lower value, upper value and integer flag of each
+        sampled input.
+    constants : dict
+        Fixed inputs.
+    axes : dict
+        Scenario values of each column, in nesting order.
+    iterations : int
+        Number of iterations.
+    seed : int or numpy.random.Generator
+        Seed or generator of the random draws.
+    design : string
+        Experimental design, one of 'random', 'lhs' or 'sobol'.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        One row per iteration and scenario.
+
+    """
+    grid = scenario_grid(iterations, axes)
+    unit = unit_design(iterations, len(grid) // max(iterations, 1), 
+                       len(ranges), design, seed)
+
+    data = {'iteration': grid['iteration'].to_numpy()}
+    data.update(scale_unit_samples(unit, ranges))
+
+    for column, value in constants.items():
+
+        data[column] = np.full(len(grid), value)
+
+    for column in axes:
+
+        data[column] = grid[column].to_numpy()
+
+
+    return pd.DataFrame(data)
+
+
+def uq_capacity_inputs(mobile_params, deciles = DECILES, iterations = None,
+                       seed = None, design = 'random'):
+    """
+    This function draws the UQ capacity inputs for every iteration, decile
+    and monthly demand.
+
+    Parameters
+    ----------
+    mobile_params : dict
+        Dictionary containing mobile engineering details.
+    deciles : list
+        Deciles to sample.
+    iterations : int
+        Number of iterations. Defaults to the iterations in mobile_params.
+    seed : int or numpy.random.Generator
+        Seed or generator of the random draws.
+    design : string
+        Experimental design, one of 'random', 'lhs' or 'sobol'.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        UQ capacity inputs.
+
+    """
+    axes = {'decile': deciles}
+    axes.update(capacity_axes(mobile_params))
+
+
+    return sample_uq_inputs(capacity_ranges(mobile_params),
+        capacity_constants(mobile_params), axes,
+        iterations or mobile_params['iterations'], seed, design)
+
+
+def uq_cost_inputs(mobile_params, deciles = DECILES, iterations = None,
+                   seed = None, design = 'random'):
+    """
+    This function draws the UQ cost inputs for every iteration, decile,
+    spectrum price and frequency.
+
+    Parameters
+    ----------
+    mobile_params : dict
+        Dictionary containing mobile engineering details.
+    deciles : list
+        Deciles to sample.
+    iterations : int
+        Number of iterations. Defaults to the iterations in mobile_params.
+    seed : int or numpy.random.Generator
+        Seed or generator of the random draws.
+    design : string
+        Experimental design, one of 'random', 'lhs' or 'sobol'.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        UQ cost inputs.
+
+    """
+    axes = {'decile': deciles}
+    axes.update(cost_axes(mobile_params))
+
+
+    return sample_uq_inputs(cost_ranges(mobile_params),
+        cost_constants(mobile_params), axes,
+        iterations or mobile_params['iterations'], seed, design)
+
+
+def uq_emission_inputs(mobile_params, deciles = DECILES, iterations = None,
+                       seed = None, design = 'random'):
+    """
+    This function draws the UQ emission inputs for every iteration and
+    decile.
+
+    Parameters
+    ----------
+    mobile_params : dict
+        Dictionary containing mobile engineering details.
+    deciles : list
+        Deciles to sample.
+    iterations : int
+        Number of iterations. Defaults to the iterations in mobile_params.
+    seed : int or numpy.random.Generator
+        Seed or generator of the random draws.
+    design : string
+        Experimental design, one of 'random', 'lhs' or 'sobol'.
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        UQ emission inputs.
+
+    """
+    axes = {'decile': deciles}
+    axes.update(emission_axes(mobile_params))
+
+
+    return sample_uq_inputs(emission_ranges(mobile_params),
+        emission_constants(mobile_params), axes,
+        iterations or mobile_params['iterations'], seed, design)
@@ -0,0 +1,126 @@
+"""
+Variance-based (Sobol) global sensitivity analysis of the mobile broadband
+model.
+
+Developed by Bonface Osoro and Ed Oughton.
+
+September 2024
+
+"""
+import numpy as np
+import pandas as pd
+from geosafi_consav.sampling import unit_design
+
+
+def saltelli_design(n, dimensions, design = 'sobol', rng = None):
+    """
+    This function builds the Saltelli sample matrices on the unit hypercube.
+
+    Two independent matrices A and B of n rows are drawn, and for every
+    parameter i a matrix AB_i equal to A with column i taken from B. The
+    matrices are stacked as A, B, AB_1, ..., AB_k, giving n * (k + 2) rows.
+
+    Parameters
+    ----------
+    n : int
+        Number of base samples. Powers of two balance Sobol designs best.
+    dimensions : int
+        Number of uncertain parameters k.
+    design : string
+        Design of the base samples, one of 'random', 'lhs' or 'sobol'.
+    rng : numpy.random.Generator
+        Random generator of the draws and scrambling.
+
+    Returns
+    -------
+    unit : numpy.ndarray
+        Stacked sample matrices in [0, 1) with one column per parameter.
+
+    """
+    base = unit_design(n, 1, 2 * dimensions, design, rng)
+    a = base[:, :dimensions]
+    b = base[:, dimensions:]
+
+    ab = np.repeat(a[np.newaxis], dimensions, axis = 0)
+    columns = np.arange(dimensions)
+    ab[columns, :, columns] = b[:, columns].T
+
+
+    return np.concatenate([a, b, ab.reshape(-1, dimensions)])
+
+
+def sobol_indices(outputs, n, parameters, bootstrap = 200, confidence = 0.95,
+                  rng = None):
+    """
+    This function estimates the first-order and total-order Sobol indices of
+    every parameter from model outputs on the Saltelli sample matrices, with
+    bootstrap confidence intervals.
+
+    The first-order index uses the estimator of Saltelli et al. (2010) and
+    the total-order index that of Jansen (1999).
+
+    Parameters
+    ----------
+    outputs : numpy.ndarray
+        Model outputs of the stacked A, B and AB_i matrices.
+    n : int
+        Number of base samples.
+    parameters : list
+        Names of the parameters, in column order.
+    bootstrap : int
+        Number of bootstrap resamples.
+    confidence : float
+        Confidence level of the intervals.
+    rng : numpy.random.Generator
+        Random generator of the resamples.
+
+    Returns
+    -------
+    indices : pandas.DataFrame
+        First-order and total-order index of each parameter with the lower
+        and upper confidence bounds.
+
+    """
+    rng = np.random.default_rng(rng)
+    dimensions = len(parameters)
+    outputs = np.asarray(outputs, dtype = float)
+
+    f_a = outputs[:n]
+    f_b = outputs[n:2 * n]
+    f_ab = outputs[2 * n:].reshape(dimensions, n)
+
+    def estimate(rows):
+
+        a = f_a[..., rows]
+        b = f_b[..., rows]
+        ab = f_ab[:, rows] if rows.ndim == 1 else f_ab[:, rows].swapaxes(0, 1)
+        variance = np.var(np.concatenate([a, b], axis = -1), axis = -1)
+        variance = variance[..., np.newaxis]
+        first = np.mean(b[..., np.newaxis, :] * (ab - a[..., np.newaxis, :]),
+                        axis = -1) / variance
+        total = 0.5 * np.mean((a[..., np.newaxis, :] - ab) ** 2,
+                              axis = -1) / variance
+
+        return first, total
+
+    first, total = estimate(np.arange(n))
+
+    resamples = rng.integers(0, n, (bootstrap, n))
+    first_boot, total_boot = estimate(resamples)
+
+    tail = (1 - confidence) / 2 * 100
+    first_low, first_high = np.percentile(first_boot, [tail, 100 - tail],
+                                          axis = 0)
+    total_low, total_high = np.percentile(total_boot, [tail, 100 - tail],
+                                          axis = 0)
+
+
+    return pd.DataFrame({
+        'parameter' : parameters,
+        'first_order' : first,
+        'first_order_low' : first_low,
+        'first_order_high' : first_high,
+        'total_order' : total,
+        'total_order_low' : total_low,
+        'total_order_high' : total_high
+    })
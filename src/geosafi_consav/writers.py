@@ -0,0 +1,214 @@
+"""
+Streaming writers for the mobile broadband model results.
+
+Developed by Bonface Osoro and Ed Oughton.
+
+September 2024
+
+"""
+import os
+import pandas as pd
+
+
+class ResultWriter:
+
+    """
+    This class appends chunks of model results to a CSV or Parquet file as
+    they are produced, so the full result set never has to be held in memory.
+    Chunks are buffered until the buffer reaches the memory ceiling, then
+    written as one CSV block or one Parquet row group. The Parquet schema is
+    fixed by the given dtypes, or else by the first block written.
+    """
+
+
+    def __init__(self, path, max_buffer_mb = 256, file_format = None,
+                 dtypes = None):
+        """
+        A class constructor
+
+        Arguments
+        ---------
+        path : string
+            Path of the output file. Any existing file is replaced.
+        max_buffer_mb : float
+            Memory ceiling of the buffered results in megabytes.
+        file_format : string
+            Either 'csv' or 'parquet'. Inferred from the file extension if not
+            given.
+        dtypes : dict
+            Data types every chunk is converted to before writing, keyed by
+            column. Columns whose type can change between chunks, such as
+            integers that may turn into floats, should be listed here.
+        """
+        if file_format is None:
+
+            file_format = os.path.splitext(path)[1].lstrip('.').lower()
+
+        if file_format not in ['csv', 'parquet']:
+
+            raise ValueError('Unsupported results format: {}'.format(
+                file_format))
+
+        self.path = path
+        self.file_format = file_format
+        self.dtypes = dtypes
+        self.max_buffer_bytes = max_buffer_mb * 1e6
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.columns = None
+        self.parquet_writer = None
+        self.rows_written = 0
+
+        folder = os.path.dirname(path)
+
+        if folder and not os.path.exists(folder):
+
+            os.makedirs(folder)
+
+        if os.path.exists(path):
+
+            os.remove(path)
+
+
+    def write(self, df):
+        """
+        Function for adding a chunk of results to the output.
+
+        Arguments
+        ---------
+        df : pandas.DataFrame
+            Chunk of results.
+        """
+        if len(df) == 0:
+
+            return
+
+        if self.columns is None:
+
+            self.columns = list(df.columns)
+
+        self.buffer.append(df)
+        self.buffer_bytes += df.memory_usage(index = False, deep = True).sum()
+
+        if self.buffer_bytes >= self.max_buffer_bytes:
+
+            self.flush()
+
+
+    def flush(self):
+        """
+        Function for writing the buffered results to the output file.
+        """
+        if not self.buffer:
+
+            return
+
+        df = pd.concat(self.buffer, ignore_index = True)[self.columns]
+
+        if self.dtypes:
+
+            df = df.astype(self.dtypes)
+
+        self.buffer = []
+        self.buffer_bytes = 0
+
+        if self.file_format == 'csv':
+
+            df.to_csv(self.path, mode = 'a', index = False,
+                      header = self.rows_written == 0)
+
+        else:
+
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index = False)
+
+            if self.parquet_writer is None:
+
+                self.parquet_writer = pq.ParquetWriter(self.path,
+                                                       table.schema)
+
+            schema = self.parquet_writer.schema
+
+            if not table.schema.equals(schema):
+
+                try:
+
+                    # Only lossless casts are allowed
+                    table = table.cast(schema, safe = True)
+
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+
+                    changed = ['{} ({} to {})'.format(name,
+                               schema.field(name).type,
+                               table.schema.field(name).type)
+                               for name in schema.names if
+                               table.schema.field(name).type !=
+                               schema.field(name).type]
+
+                    raise ValueError('Column types changed between chunks of '
+                        '{}: {}. Pass dtypes to fix the results schema'.format(
+                        self.path, ', '.join(changed)))
+
+            self.parquet_writer.write_table(table)
+
+        self.rows_written += len(df)
+
+
+    def close(self):
+        """
+        Function for writing any remaining results and closing the file.
+        """
+        self.flush()
+
+        if self.parquet_writer is not None:
+
+            self.parquet_writer.close()
+            self.parquet_writer = None
+
+
+    def __enter__(self):
+
+        return self
+
+
+    def __exit__(self, *args):
+
+        self.close()
+
+
+def write_chunks(chunks, path, max_buffer_mb = 256, file_format = None,
+                 dtypes = None):
+    """
+    This function streams an iterable of result chunks into a file.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Dataframes of results.
+    path : string
+        Path of the output file.
+    max_buffer_mb : float
+        Memory ceiling of the buffered results in megabytes.
+    file_format : string
+        Either 'csv' or 'parquet'. Inferred from the file extension if not
+        given.
+    dtypes : dict
+        Data types every chunk is converted to before writing, keyed by
+        column.
+
+    Returns
+    -------
+    rows_written : int
+        Number of rows written.
+
+    """
+    with ResultWriter(path, max_buffer_mb, file_format, dtypes) as writer:
+
+        for chunk in chunks:
+
+            writer.write(chunk)
+
+
+    return writer.rows_written
@@ -0,0 +1,44 @@
+"""
+Tests of the content-addressed result cache.
+
+"""
+import copy
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+import run_mobile as rm
+
+
+def test_stage_key_changes_with_lut(monkeypatch):
+
+    key = rm.stage_key('capacity', 'digest')
+    lut = list(rm.lut)
+    lut[0] = lut[0][:5] + (lut[0][5] + 0.1,) + lut[0][6:]
+    monkeypatch.setattr(rm, 'lut', lut)
+
+    assert rm.stage_key('capacity', 'digest') != key
+
+
+def test_stage_key_changes_with_parameters(monkeypatch):
+
+    key = rm.stage_key('emission', 'digest')
+    parameters = copy.deepcopy(rm.parameters)
+    parameters['4G']['electricity_kg_co2e'] += 0.01
+    monkeypatch.setattr(rm, 'parameters', parameters)
+
+    assert rm.stage_key('emission', 'digest') != key
+
+
+def test_cache_round_trip(tmp_path):
+
+    source = tmp_path / 'results.csv'
+    source.write_text('a,b\n1,2\n')
+    cache = rm.ResultCache(str(tmp_path / 'cache'))
+    key = cache.key('stage', 'digest')
+
+    assert not cache.fetch(key, str(tmp_path / 'out.csv'))
+
+    cache.store(key, str(source))
+
+    assert cache.fetch(key, str(tmp_path / 'out.csv'))
+    assert (tmp_path / 'out.csv').read_text() == 'a,b\n1,2\n'
@@ -0,0 +1,287 @@
+"""
+Tests of the batched capacity, cost and emission engines against the scalar
+model functions chained row by row.
+
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from geosafi_consav import mobile as mb
+from geosafi_consav import sampling
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+from mobile_inputs import lut, parameters
+
+DECILES = ['Decile 1', 'Decile 5', 'Decile 10']
+
+
+def scalar_capacity(item):
+    """
+    Capacity model of one row, chaining the scalar functions.
+    """
+    random_variation = mb.generate_log_normal_dist_value(
+        item['frequency_MHz'], item['mu'], item['sigma'],
+        item['seed_value'], item['draws'])
+
+    intersite_distance_km = mb.calc_signal_path(item['transmitter_x'],
+        item['transmitter_y'], item['receiver_x'], item['receiver_y'])
+    interference_signal_path_km = mb.calc_signal_path(item['interference_x'],
+        item['interference_y'], item['receiver_x'], item['receiver_y'])
+
+    path_loss_db = mb.hk_path_loss_model(item['frequency_MHz'],
+            item['transmitter_height_m'], item['user_antenna_height_m'],
+            intersite_distance_km, item['iteration'], random_variation)
+    int_path_loss_db = mb.hk_path_loss_model(item['frequency_MHz'],
+            item['transmitter_height_m'], item['user_antenna_height_m'],
+            interference_signal_path_km, item['iteration'], random_variation)
+
+    received_power_db = mb.calc_power_received(item['transmitter_power_dbm'],
+                    item['trans_antenna_gain_dbi'], path_loss_db,
+                    item['shadow_fading_db'],
+                    item['building_penetration_loss_db'])
+    int_received_power_db = mb.calc_power_received(
+                    item['transmitter_power_dbm'],
+                    item['trans_antenna_gain_dbi'], int_path_loss_db,
+                    item['shadow_fading_db'],
+                    item['building_penetration_loss_db'])
+
+    cell_generation = mb.system_type(item['frequency_MHz'])
+    channel_bandwidth_mhz = mb.bandwidth(cell_generation)
+    noise_db = mb.calc_noise(item['frequency_MHz'], channel_bandwidth_mhz)
+
+    interference_db = mb.calc_interference(int_received_power_db, noise_db,
+                item['user_antenna_gain_dbi'], item['user_antenna_loss_db'])
+    sinr_db = mb.calc_sinr(received_power_db, noise_db,
+                           item['user_antenna_gain_dbi'],
+                           item['user_antenna_loss_db'], interference_db)
+
+    spectral_efficiency_bpshz = mb.get_spectral_efficiency(lut,
+                                    cell_generation, sinr_db)
+    capacity_mbps = mb.calc_capacity(spectral_efficiency_bpshz,
+                channel_bandwidth_mhz, item['antenna_sectors']) * 3
+    site_area_sqkm = mb.calc_site_area(intersite_distance_km)
+
+    return {
+        'cell_generation' : cell_generation,
+        'intersite_distance_km' : intersite_distance_km,
+        'interference_signal_path_km' : interference_signal_path_km,
+        'hk_rural_correction_db' : mb.hk_rural_correction_model(
+                                       item['frequency_MHz']),
+        'hk_city_correction_db' : mb.hk_city_correction_model(
+            item['frequency_MHz'], item['user_antenna_height_m']),
+        'path_loss_db' : path_loss_db,
+        'int_path_loss_db' : int_path_loss_db,
+        'received_power_db' : received_power_db,
+        'noise_db' : noise_db,
+        'interference_db' : interference_db,
+        'sinr_db' : sinr_db,
+        'spectral_efficiency_bpshz' : spectral_efficiency_bpshz,
+        'capacity_mbps' : capacity_mbps,
+        'site_area_sqkm' : site_area_sqkm,
+        'capacity_mbps_km2' : mb.calc_area_capacity(capacity_mbps,
+                                                    site_area_sqkm),
+        'channel_bandwidth_mhz' : channel_bandwidth_mhz
+    }
+
+
+def scalar_cost(item):
+    """
+    Cost model of one row, chaining the scalar functions.
+    """
+    equipment_cost_usd = mb.equipment_cost(item['sector_antenna_usd'],
+            item['remote_radio_unit_usd'], item['io_fronthaul_usd'],
+            item['control_unit_usd'], item['cooling_fans_usd'],
+            item['battery_power_usd'], item['bbu_cabinet_usd'],
+            item['tower_usd'], item['civil_materials_usd'],
+            item['router_usd'])
+    spectrum_cost_usd = mb.spectrum_cost(item['channel_bandwidth_mhz'],
+            item['mean_poor_connected'], item['mhz_per_pop_usd'])
+    capex_cost_usd = mb.capex_cost(equipment_cost_usd, spectrum_cost_usd,
+            item['installation_usd'], item['transportation_usd'])
+    opex_cost_usd = mb.opex_cost(item['site_rental_usd'],
+            item['base_station_energy_usd'], item['staff_costs_usd'],
+            item['sector_antenna_usd'], item['remote_radio_unit_usd'],
+            item['bbu_cabinet_usd'], item['router_usd'],
+            item['fiber_link_usd'])
+    total_cost_ownership = mb.total_cost_ownership(capex_cost_usd,
+            opex_cost_usd, item['discount_rate'], item['assessment_years'])
+
+    return {
+        'equipment_cost_usd' : equipment_cost_usd,
+        'spectrum_cost_usd' : spectrum_cost_usd,
+        'capex_cost_usd' : capex_cost_usd,
+        'opex_cost_usd' : opex_cost_usd,
+        'total_base_station_tco_usd' : total_cost_ownership,
+        'total_decile_tco_usd' : (total_cost_ownership
+                                  * item['no_of_required_sites'])
+    }
+
+
+def scalar_emission(item):
+    """
+    Emission model of one row, chaining the scalar functions.
+    """
+    sites = item['no_of_required_sites']
+    generation = item['cell_generation']
+
+    lca_mfg = mb.lca_manufacturing(item['bbu_rru_pcb_kg'],
+                item['bbu_rru_aluminium_kg'], item['copper_antenna_kg'],
+                item['aluminium_antenna_kg'], item['pvc_antenna_kg'],
+                item['iron_antenna_kg'], item['steel_antenna_kg'],
+                item['steel_tower_kg'], item['aluminium_frame_kg'],
+                item['steel_pole_kg'], item['machine_concrete_kg'],
+                item['machine_steel_kg'], item['basic_aluminium_device_kg'],
+                item['pcb_kg_co2e'], item['aluminium_kg_co2e'],
+                item['copper_kg_co2e'], item['pvc_kg_co2e'],
+                item['iron_kg_co2e'], item['steel_kg_co2e'],
+                item['concrete_kg_co2e'], item['smartphone_kg'],
+                item['ict_equipment_kg'], item['power_supply_kg'],
+                item['lithium_battery_kg'], item['mean_poor_connected'])
+    total_mfg_ghg = mb.phase_emission_ghg(generation,
+        lca_mfg['aluminium_ghg'] + lca_mfg['steel_iron_ghg']
+        + lca_mfg['concrete_ghg'] + lca_mfg['plastics_ghg']
+        + lca_mfg['other_metals_ghg'], sites)
+
+    lca_trans = mb.lca_transportation(item['mean_distance_km'],
+                                      item['consumption_lt_per_km'],
+                                      item['diesel_factor_kgco2e'],
+                                      item['maritime_km'],
+                                      item['container_ship_kgco2e'])
+    total_trans_ghg_kg = mb.phase_emission_ghg(generation,
+                             lca_trans['trans_ghg_kg'], sites)
+
+    lca_constr = mb.lca_construction(item['machine_fuel_eff_lt_per_hr'],
+                                     item['machine_operation_hrs'],
+                                     item['diesel_factor_kgco2e'])
+    total_construction_ghg = mb.phase_emission_ghg(generation,
+                                 lca_constr['construction_ghg'], sites)
+
+    lca_ops = mb.lca_operations(item['smartphone_kwh'], item['ict_kwh'],
+                                item['base_band_unit_kwh'],
+                                item['mean_poor_connected'],
+                                item['radio_frequency_kwh'],
+                                item['epc_center_kwh'],
+                                item['number_epc_centers'],
+                                item['electricity_kg_co2e'], sites)
+    total_operations_ghg = mb.phase_emission_ghg(generation,
+                               lca_ops['operations_ghg'], sites)
+
+    lca_eolts = mb.lca_eolt(item['bbu_rru_pcb_kg'],
+                            item['bbu_rru_aluminium_kg'],
+                            item['copper_antenna_kg'],
+                            item['aluminium_antenna_kg'],
+                            item['pvc_antenna_kg'], item['iron_antenna_kg'],
+                            item['steel_antenna_kg'], item['steel_tower_kg'],
+                            item['aluminium_frame_kg'], item['steel_pole_kg'],
+                            item['machine_steel_kg'],
+                            item['basic_aluminium_device_kg'],
+                            item['metals_factor_kgco2e'],
+                            item['plastics_factor_kgco2e'])
+    total_eolt_ghg = mb.phase_emission_ghg(generation,
+        lca_eolts['aluminium_ghg'] + lca_eolts['steel_iron_ghg']
+        + lca_eolts['plastics_ghg'] + lca_eolts['other_metals_ghg'], sites)
+
+    return {
+        'aluminium_mfg_ghg_kg' : lca_mfg['aluminium_ghg'],
+        'steel_iron_mfg_ghg_kg' : lca_mfg['steel_iron_ghg'],
+        'concrete_mfg_ghg_kg' : lca_mfg['concrete_ghg'],
+        'plastics_mfg_ghg_kg' : lca_mfg['plastics_ghg'],
+        'other_metals_mfg_ghg_kg' : lca_mfg['other_metals_ghg'],
+        'aluminium_eolt_ghg' : lca_eolts['aluminium_ghg'],
+        'steel_iron_eolt_ghg' : lca_eolts['steel_iron_ghg'],
+        'plastics_eolt_ghg' : lca_eolts['plastics_ghg'],
+        'other_metals_eolt_ghg' : lca_eolts['other_metals_ghg'],
+        'total_mfg_ghg' : total_mfg_ghg,
+        'total_trans_ghg_kg' : total_trans_ghg_kg,
+        'total_construction_ghg_kg' : total_construction_ghg,
+        'total_operations_ghg_kg' : total_operations_ghg,
+        'total_eolt_ghg_kg' : total_eolt_ghg,
+        'total_emissions_ghg_kg' : (total_mfg_ghg + total_trans_ghg_kg
+            + total_construction_ghg + total_operations_ghg + total_eolt_ghg)
+    }
+
+
+def decile_columns(df, rng):
+    """
+    Add the decile statistics merged into the UQ inputs by mobi_preprocess.
+    """
+    df['cell_generation'] = rng.choice(['4G', '5G'], len(df))
+    df['no_of_required_sites'] = rng.integers(1, 500, len(df))
+    df['mean_poor_connected'] = rng.uniform(1e3, 1e5, len(df))
+    df['total_poor_unconnected'] = rng.uniform(1e5, 1e7, len(df))
+    df['total_population'] = rng.uniform(1e6, 1e8, len(df))
+
+
+    return df
+
+
+def assert_rows_match(batch, expected):
+    """
+    Compare batch results with the scalar results of each row.
+    """
+    expected = pd.DataFrame(expected)
+
+    for column in expected:
+
+        if pd.api.types.is_numeric_dtype(expected[column]):
+
+            np.testing.assert_allclose(batch[column], expected[column],
+                                       rtol = 1e-12, err_msg = column)
+
+        else:
+
+            assert (batch[column].to_numpy() == expected[column]).all()
+
+
+@pytest.mark.parametrize('generation', ['4G', '5G'])
+def test_capacity_batch_matches_scalar_model(generation):
+
+    mobile_params = parameters[generation]
+    df = sampling.uq_capacity_inputs(mobile_params, DECILES, 20, 1)
+    rng = np.random.default_rng(2)
+    df['frequency_MHz'] = rng.choice(mobile_params['frequencies_mhz'],
+                                     len(df))
+    df['traffic_busy_hour'] = rng.uniform(5, 20, len(df))
+    df['smartphone_penetration'] = rng.uniform(20, 80, len(df))
+
+    batch = mb.capacity_batch(df, lut)
+    expected = [scalar_capacity(item) for item in df.to_dict('records')]
+
+    assert_rows_match(batch, expected)
+
+
+@pytest.mark.parametrize('generation', ['4G', '5G'])
+def test_cost_batch_matches_scalar_model(generation):
+
+    df = sampling.uq_cost_inputs(parameters[generation], DECILES, 20, 1)
+    rng = np.random.default_rng(3)
+    df = decile_columns(df, rng)
+    df['channel_bandwidth_mhz'] = rng.choice([10, 20, 100], len(df))
+
+    for column in ['mean_area_sqkm', 'total_area_sqkm', 'cost_per_1GB_usd',
+                   'monthly_income_usd', 'cost_per_month_usd', 'arpu_usd',
+                   'adoption_rate', 'existing_tower_no']:
+
+        df[column] = rng.uniform(1, 100, len(df))
+
+    batch = mb.cost_batch(df)
+    expected = [scalar_cost(item) for item in df.to_dict('records')]
+
+    assert_rows_match(batch, expected)
+
+
+@pytest.mark.parametrize('generation', ['4G', '5G'])
+def test_emission_batch_matches_scalar_model(generation):
+
+    df = sampling.uq_emission_inputs(parameters[generation], DECILES, 20, 1)
+    rng = np.random.default_rng(4)
+    df = decile_columns(df, rng)
+    df['mean_distance_km'] = rng.uniform(10, 500, len(df))
+    df['maritime_km'] = rng.uniform(8000, 15000, len(df))
+    df['number_epc_centers'] = df['mean_poor_connected'] / 150280
+
+    batch = mb.emission_batch(df)
+    expected = [scalar_emission(item) for item in df.to_dict('records')]
+
+    assert_rows_match(batch, expected)
@@ -0,0 +1,154 @@
+"""
+Tests of the mobile broadband simulation model.
+
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+from geosafi_consav import mobile as mb
+from geosafi_consav import sampling
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+from mobile_inputs import lut
+
+LUT = [
+    ('4G', '2x2', 1, 'QPSK', 78, 0.3, -6.7),
+    ('4G', '2x2', 4, 'QPSK', 308, 1.2, 0.2),
+    ('4G', '2x2', 7, '16QAM', 378, 2.8, 5.9),
+    ('4G', '2x2', 10, '64QAM', 466, 5.4, 11.7),
+    ('4G', '2x2', 15, '64QAM', 948, 11.4, 22.7),
+]
+
+
+def capacity_rows(grid_length = 100, rows = 500, seed = 1):
+    """
+    UQ capacity rows drawn in the km frame of the model.
+    """
+    mobile_params = {
+        'grid_length' : grid_length,
+        'transmitter_height_low_m' : 20, 'transmitter_height_high_m' : 40,
+        'user_antenna_height_low_m' : 1, 'user_antenna_height_high_m' : 3,
+        'transmitter_power_low_dbm' : 40, 'transmitter_power_high_dbm' : 50,
+        'trans_antenna_gain_low_dbi' : 15, 'trans_antenna_gain_high_dbi' : 18,
+        'user_antenna_gain_low_dbi' : 0, 'user_antenna_gain_high_dbi' : 2,
+        'user_antenna_loss_low_db' : 3, 'user_antenna_loss_high_db' : 5,
+        'mu' : 2, 'sigma' : 10, 'seed_value' : 42, 'draws' : rows,
+        'shadow_fading_db' : 5, 'building_penetration_loss_db' : 20,
+        'antenna_sectors' : 3, 'system_temperature_k' : 290,
+        'mean_monthly_demand_GB' : [10], 'iterations' : rows
+    }
+    df = sampling.uq_capacity_inputs(mobile_params, ['Decile 1'], rows,
+                                     np.random.default_rng(seed))
+    df['frequency_MHz'] = 800
+    df['traffic_busy_hour'] = 0.1
+    df['smartphone_penetration'] = 0.5
+
+
+    return df
+
+
+def test_hex_site_layout_includes_serving_site():
+
+    site_x, site_y = mb.hex_site_layout(300, 100)
+    distances = np.hypot(site_x, site_y)
+
+    assert np.sum(distances == 0) == 1
+    assert distances.max() <= 300
+    assert np.isclose(np.sort(distances)[1], 100)
+
+
+def test_multi_interferer_sinr_below_single_interferer():
+
+    df = capacity_rows()
+    site_x, site_y = mb.hex_site_layout(300, 100)
+    sites = pd.DataFrame({'site_x' : site_x, 'site_y' : site_y})
+
+    single = mb.capacity_batch(df, LUT, sites = sites, interferers = 1)
+    multi = mb.capacity_batch(df, LUT, sites = sites, interferers = 6)
+
+    assert np.all(multi['sinr_db'] <= single['sinr_db'])
+    assert np.array_equal(multi['interference_signal_path_km'],
+                          single['interference_signal_path_km'])
+
+    # Interferers lie in the km frame of the rows, not millions of km away
+    assert single['interference_signal_path_km'].max() < 300
+    assert abs(np.median(single['sinr_db'])) < 20
+
+
+def test_hk_path_loss_array_matches_scalar_model():
+
+    rng = np.random.default_rng(5)
+    frequency = rng.choice([700, 800, 1800, 2600, 3500], 200).astype(float)
+    height = rng.integers(20, 41, 200).astype(float)
+    user_height = rng.integers(1, 4, 200).astype(float)
+    distance = np.append(rng.uniform(0, 100, 199), 0)
+    variations = rng.normal(0, 2, 200)
+
+    path_loss = mb.hk_path_loss_array(frequency, height, user_height,
+                                      distance, variations)
+    expected = [mb.hk_path_loss_model(*row, i, variations) for i, row in
+                enumerate(zip(frequency, height, user_height, distance))]
+
+    np.testing.assert_allclose(path_loss, expected, rtol = 1e-12)
+
+
+def test_spectral_efficiency_table_matches_scalar_lookup():
+
+    table = mb.SpectralEfficiencyTable(lut)
+
+    for generation in ['4G', '5G']:
+
+        thresholds = [entry[6] for entry in lut if entry[0] == generation]
+        # The scalar lookup returns None exactly at the last threshold
+        sinr = np.concatenate([np.random.default_rng(6).uniform(-20, 40, 500),
+                               thresholds[:-1]])
+
+        expected = [mb.get_spectral_efficiency(lut, generation, value)
+                    for value in sinr]
+
+        np.testing.assert_array_equal(table.lookup_array(generation, sinr),
+                                      expected)
+        np.testing.assert_array_equal(table.lookup(generation, sinr),
+                                      expected)
+        assert [table.lookup(generation, value) for value in sinr] == expected
+
+
+def test_fading_bank_matches_legacy_draws():
+
+    bank = mb.FadingVariateBank()
+
+    for frequency in [700, 1800, 3500]:
+
+        np.testing.assert_array_equal(bank.variations(frequency, 2, 10, 42,
+            100), mb.generate_log_normal_dist_value(frequency, 2, 10, 42, 100))
+
+
+def test_fading_bank_lookup_array_indexes_banks():
+
+    bank = mb.FadingVariateBank()
+    rng = np.random.default_rng(7)
+    frequency = rng.choice([700, 800, 1800], 300).astype(float)
+    iteration = rng.integers(0, 100, 300)
+    ones = np.ones(300)
+
+    variations = bank.lookup_array(frequency, 2 * ones, 10 * ones, 42 * ones,
+                                   100 * ones, iteration)
+    expected = [mb.generate_log_normal_dist_value(f, 2, 10, 42, 100)[i]
+                for f, i in zip(frequency, iteration)]
+
+    np.testing.assert_array_equal(variations, expected)
+
+
+def test_fading_bank_streams_are_reproducible():
+
+    first = mb.FadingVariateBank(legacy_seeding = False)
+    second = mb.FadingVariateBank(legacy_seeding = False, maxsize = 1)
+
+    for frequency in [700, 1800, 700]:
+
+        np.testing.assert_array_equal(first.variations(frequency, 2, 10, 42,
+            100), second.variations(frequency, 2, 10, 42, 100))
+
+    assert len(second.banks) == 1
+    assert not np.array_equal(first.variations(700, 2, 10, 42, 100),
+                              first.variations(1800, 2, 10, 42, 100))
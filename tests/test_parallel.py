@@ -0,0 +1,59 @@
+"""
+Tests of the chunked process-pool execution.
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from geosafi_consav.parallel import map_chunks
+
+
+def double(df):
+    """
+    Double the values of a chunk.
+    """
+    df['value'] = df['value'] * 2
+
+
+    return df
+
+
+def frame():
+    """
+    Inputs with a numeric and a text column.
+    """
+
+    return pd.DataFrame({'value' : np.arange(1000.0), 
+                         'decile' : ['Decile {}'.format(i % 10 + 1) for i in 
+                                     range(1000)]})
+
+
+def run(df):
+    """
+    Combined results of doubling the inputs in two worker processes.
+    """
+
+    return pd.concat(map_chunks(df, double, workers = 2, chunk_size = 100))
+
+
+def test_map_chunks_matches_inputs_in_order():
+
+    df = frame()
+    results = run(df)
+
+    assert results['value'].tolist() == (df['value'] * 2).tolist()
+    assert results['decile'].tolist() == df['decile'].tolist()
+
+
+def test_map_chunks_from_threads():
+
+    df = frame()
+
+    # Stages of a pipeline start their pools from worker threads
+    with ThreadPoolExecutor(max_workers = 2) as executor:
+
+        results = list(executor.map(run, [df, df]))
+
+    for result in results:
+
+        assert result['value'].tolist() == (df['value'] * 2).tolist()
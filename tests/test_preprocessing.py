@@ -0,0 +1,197 @@
+"""
+Tests of the raster preprocessing engines.
+
+"""
+import numpy as np
+import pytest
+import rasterio
+import shapely
+from rasterio.features import shapes
+from rasterio.mask import mask
+from rasterio.transform import Affine, from_origin
+from rasterstats import zonal_stats
+from shapely.geometry import Polygon, box
+from geosafi_consav import preprocessing as pre
+
+TRANSFORM = from_origin(30.0, 5.0, 0.1, 0.1)
+
+REGIONS = [
+    Polygon([(30.02, 4.97), (31.47, 4.92), (30.88, 3.61), (30.07, 3.13)]),
+    Polygon([(31.47, 4.92), (32.38, 4.96), (32.33, 2.04), (30.88, 3.61)]),
+    Polygon([(30.07, 3.13), (30.88, 3.61), (32.33, 2.04), (30.04, 2.03)]),
+]
+
+
+@pytest.fixture
+def raster(tmp_path):
+    """
+    Population raster with negative and nodata pixels, and patches of equal 
+    values that polygonize into groups of pixels.
+    """
+    rng = np.random.default_rng(10)
+    array = rng.integers(0, 6, (32, 25)).astype('float32')
+    array[rng.random(array.shape) < 0.1] = -99999
+    array[rng.random(array.shape) < 0.05] = 255
+    array[:4, :4] = 7
+
+    path = str(tmp_path / 'population.tif')
+
+    with rasterio.open(path, 'w', driver = 'GTiff', height = 32, width = 25, 
+                       count = 1, dtype = 'float32', transform = TRANSFORM, 
+                       crs = 'epsg:4326', nodata = 255) as dst:
+
+        dst.write(array, 1)
+
+
+    return path
+
+
+def pixel_centres(shape, transform):
+    """
+    Points at the centre of every pixel.
+    """
+    rows, cols = np.indices(shape)
+    x, y = (transform * Affine.translation(0.5, 0.5)) * (cols, rows)
+
+
+    return shapely.points(x, y)
+
+
+def test_region_labels_match_pixel_centres(raster):
+
+    with rasterio.open(raster) as src:
+
+        shape = src.shape
+
+    labels = pre.region_labels(REGIONS, shape, TRANSFORM)
+    centres = pixel_centres(shape, TRANSFORM)
+
+    for label, region in enumerate(REGIONS, 1):
+
+        assert np.array_equal(labels == label, shapely.contains(region, 
+                              centres))
+
+
+def test_zonal_population_matches_zonal_stats(raster):
+
+    with rasterio.open(raster) as src:
+
+        array = src.read(1)
+
+    array[array <= 0] = 0
+    expected = zonal_stats(REGIONS, array, affine = TRANSFORM, nodata = 255, 
+                           stats = ['sum', 'count', 'mean', 'max'])
+
+    output = pre.zonal_population(REGIONS, raster, stats = ('sum', 'count', 
+                                  'mean', 'max'))
+
+    for stat in ['sum', 'count', 'mean', 'max']:
+
+        np.testing.assert_allclose(output[stat], [row[stat] for row in 
+                                   expected], rtol = 1e-6)
+
+
+def test_zonal_population_of_empty_region(raster):
+
+    output = pre.zonal_population([box(30.01, 4.99, 30.02, 4.98)], raster, 
+                                  stats = ('sum', 'count'))
+
+    assert output['count'].tolist() == [0]
+    assert np.isnan(output['sum'][0])
+
+
+def test_unconnected_population_matches_pixel_centres(raster):
+
+    coverage = {
+        '3G' : [box(30.0, 3.0, 31.5, 5.0)],
+        '4G' : [box(31.0, 1.0, 33.0, 3.5), None],
+        '5G' : None,
+    }
+
+    output = pre.unconnected_population(raster, REGIONS, coverage)
+
+    with rasterio.open(raster) as src:
+
+        array = src.read(1)
+
+    array[array <= 0] = 0
+    array[array == 255] = 0
+    centres = pixel_centres(array.shape, TRANSFORM)
+
+    for technology, covered in coverage.items():
+
+        covered = shapely.union_all([geometry for geometry in covered or [] 
+                                     if geometry is not None])
+        outside = ~shapely.contains(covered, centres)
+        expected = [array[shapely.contains(region, centres) & outside].sum()
+                    for region in REGIONS]
+
+        np.testing.assert_allclose(output[technology], expected)
+
+
+def test_clip_regions_match_mask(raster):
+
+    clips = pre.clip_regions(raster, dict(enumerate(REGIONS)), workers = 2)
+
+    with rasterio.open(raster) as src:
+
+        for region_id, region in enumerate(REGIONS):
+
+            out_img, out_transform = mask(src, [region], crop = True, 
+                                          nodata = 255)
+
+            assert np.array_equal(clips[region_id][0], out_img)
+            assert clips[region_id][1] == out_transform
+
+
+def test_population_store_clip_matches_mask(raster, tmp_path):
+
+    folder = str(tmp_path / 'store')
+    pre.build_population_store(raster, folder, bounds = (29.0, 1.0, 33.0, 
+                               6.0), block_rows = 5)
+    store = pre.PopulationStore(folder)
+
+    with rasterio.open(raster) as src:
+
+        assert store.bounds == tuple(src.bounds)
+
+        for region in REGIONS:
+
+            out_img, out_transform = mask(src, [region], crop = True, 
+                                          nodata = 255)
+            clip_img, clip_transform = store.clip(region)
+
+            assert np.array_equal(clip_img, out_img)
+            assert clip_transform == out_transform
+
+    with pytest.raises(ValueError, match = 'beyond'):
+
+        store.clip(box(29.0, 1.0, 30.5, 3.0))
+
+
+def test_population_polygons_match_shapes_loop(raster):
+
+    with rasterio.open(raster) as src:
+
+        array = src.read(1)
+
+    output = pre.population_polygons(array, TRANSFORM)
+
+    # Polygonize in pixel space and map each vertex to coordinates
+    expected = []
+
+    for geometry, value in shapes(array):
+
+        if value > 0 and not value == 255:
+
+            ring = [TRANSFORM * vertex for vertex in 
+                    geometry['coordinates'][0]]
+            expected.append((Polygon(ring), value))
+
+    assert len(output) == len(expected)
+    assert output['value'].tolist() == [value for _, value in expected]
+    assert output.crs == 'epsg:4326'
+
+    for polygon, (geometry, _) in zip(output.geometry, expected):
+
+        assert polygon.equals_exact(geometry, 1e-9)
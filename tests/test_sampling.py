@@ -0,0 +1,70 @@
+"""
+Tests of the UQ input designs.
+
+"""
+import warnings
+import numpy as np
+import pytest
+from geosafi_consav import sampling
+
+
+@pytest.mark.parametrize('design', sampling.DESIGNS)
+def test_unit_design_shape_and_range(design):
+
+    with warnings.catch_warnings():
+
+        warnings.simplefilter('error')
+        unit = sampling.unit_design(64, 3, 4, design, 1)
+
+    assert unit.shape == (64 * 3, 4)
+    assert unit.min() >= 0
+    assert unit.max() < 1
+
+
+def test_lhs_design_stratifies_each_scenario():
+
+    iterations = 50
+    unit = sampling.unit_design(iterations, 3, 4, 'lhs', 2)
+
+    # Rows run iteration by iteration, with one block per scenario
+    for scenario in range(3):
+
+        block = unit[scenario::3]
+        strata = np.sort(np.floor(block * iterations), axis = 0)
+
+        assert np.array_equal(strata, np.tile(np.arange(iterations)[:, None],
+                                              (1, 4)))
+
+
+def test_sobol_design_is_balanced_for_powers_of_two():
+
+    unit = sampling.unit_design(64, 1, 2, 'sobol', 3)
+
+    for column in unit.T:
+
+        assert np.array_equal(np.bincount(np.floor(column * 8).astype(int)),
+                              np.full(8, 8))
+
+
+def test_sobol_design_warns_for_other_sizes():
+
+    with pytest.warns(UserWarning, match = '64'):
+
+        unit = sampling.unit_design(50, 2, 3, 'sobol', 4)
+
+    assert unit.shape == (100, 3)
+
+
+def test_unit_design_is_reproducible():
+
+    assert np.array_equal(sampling.unit_design(32, 2, 3, 'sobol', 5),
+                          sampling.unit_design(32, 2, 3, 'sobol', 5))
+    assert np.array_equal(sampling.unit_design(30, 2, 3, 'lhs', 5),
+                          sampling.unit_design(30, 2, 3, 'lhs', 5))
+
+
+def test_unknown_design_raises():
+
+    with pytest.raises(ValueError, match = 'Unknown design'):
+
+        sampling.unit_design(10, 1, 1, 'grid')
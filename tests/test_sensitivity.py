@@ -0,0 +1,49 @@
+"""
+Tests of the Sobol sensitivity analysis.
+
+"""
+import numpy as np
+from geosafi_consav.sensitivity import saltelli_design, sobol_indices
+
+
+def ishigami(x, a = 7, b = 0.1):
+    """
+    Ishigami function of inputs drawn uniformly on [-pi, pi].
+    """
+    return (np.sin(x[:, 0]) + a * np.sin(x[:, 1]) ** 2 +
+            b * x[:, 2] ** 4 * np.sin(x[:, 0]))
+
+
+def ishigami_indices(a = 7, b = 0.1):
+    """
+    Analytic first-order and total-order indices of the Ishigami function.
+    """
+    v1 = 0.5 * (1 + b * np.pi ** 4 / 5) ** 2
+    v2 = a ** 2 / 8
+    v13 = b ** 2 * np.pi ** 8 * (1 / 18 - 1 / 50)
+    variance = v1 + v2 + v13
+
+
+    return (np.array([v1, v2, 0]) / variance,
+            np.array([v1 + v13, v2, v13]) / variance)
+
+
+def test_sobol_indices_match_ishigami():
+
+    n = 4096
+    unit = saltelli_design(n, 3, 'sobol', np.random.default_rng(8))
+    outputs = ishigami(-np.pi + 2 * np.pi * unit)
+
+    indices = sobol_indices(outputs, n, ['x1', 'x2', 'x3'], bootstrap = 100,
+                            rng = np.random.default_rng(9))
+    first, total = ishigami_indices()
+
+    assert unit.shape == (n * 5, 3)
+    assert indices['parameter'].tolist() == ['x1', 'x2', 'x3']
+    np.testing.assert_allclose(indices['first_order'], first, atol = 0.03)
+    np.testing.assert_allclose(indices['total_order'], total, atol = 0.03)
+    for order in ['first_order', 'total_order']:
+
+        width = indices[order + '_high'] - indices[order + '_low']
+
+        assert np.all((width > 0) & (width < 0.1))
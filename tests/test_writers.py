@@ -0,0 +1,56 @@
+"""
+Tests of the streaming result writers.
+
+"""
+import pandas as pd
+import pytest
+from geosafi_consav.writers import write_chunks
+
+
+def chunks():
+    """
+    Result chunks whose column turns from integers into floats.
+    """
+    yield pd.DataFrame({'decile' : ['Decile 1', 'Decile 2'], 'sites' : [1, 2]})
+    yield pd.DataFrame({'decile' : ['Decile 3'], 'sites' : [2.5]})
+
+
+def test_parquet_dtype_change_between_chunks_raises(tmp_path):
+
+    path = str(tmp_path / 'results.parquet')
+
+    with pytest.raises(ValueError, match = 'sites'):
+
+        write_chunks(chunks(), path, max_buffer_mb = 0)
+
+
+def test_parquet_dtypes_fix_schema(tmp_path):
+
+    path = str(tmp_path / 'results.parquet')
+
+    rows = write_chunks(chunks(), path, max_buffer_mb = 0,
+                        dtypes = {'sites' : 'float64'})
+    df = pd.read_parquet(path)
+
+    assert rows == 3
+    assert df['sites'].dtype == 'float64'
+    assert df['sites'].tolist() == [1.0, 2.0, 2.5]
+
+
+def test_parquet_lossless_change_between_chunks(tmp_path):
+
+    path = str(tmp_path / 'results.parquet')
+    frames = [pd.DataFrame({'sites' : [1, 2]}), pd.DataFrame({'sites' : [3.0]})]
+
+    write_chunks(frames, path, max_buffer_mb = 0)
+
+    assert pd.read_parquet(path)['sites'].tolist() == [1, 2, 3]
+
+
+def test_csv_dtype_change_between_chunks(tmp_path):
+
+    path = str(tmp_path / 'results.csv')
+
+    write_chunks(chunks(), path, max_buffer_mb = 0)
+
+    assert pd.read_csv(path)['sites'].tolist() == [1.0, 2.0, 2.5]